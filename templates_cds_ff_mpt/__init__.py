@@ -1,11 +1,26 @@
 # -*- coding: utf-8 -*-
 
 import os
+import hashlib
 import pkg_resources
 
 import yaml
 
+
+class _ConfigLoader(yaml.SafeLoader):
+    """SafeLoader that also builds the !!python/tuple layer/purpose keys of tech_params.yaml."""
+
+
+def _construct_tuple(loader, node):
+    return tuple(loader.construct_sequence(node, deep=True))
+
+
+_ConfigLoader.add_constructor('tag:yaml.org,2002:python/tuple', _construct_tuple)
+
 _yaml_file = pkg_resources.resource_filename(__name__, os.path.join('data', 'tech_params.yaml'))
 
-with open(_yaml_file, 'r') as f:
-    config = yaml.load(f)
+with open(_yaml_file, 'rb') as f:
+    _yaml_content = f.read()
+
+config = yaml.load(_yaml_content, Loader=_ConfigLoader)
+config_hash = hashlib.sha1(_yaml_content).hexdigest()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Tuple, Optional, Sequence
+
+import numpy as np
+
+from .spline import CHAR_AXES, ArrayLike, CubicGridSpline
+from .storage import CharStorage
+
+
+def _invert_rows(x_rows, y_rows, x_grid):
+    # type: (np.ndarray, np.ndarray, np.ndarray) -> np.ndarray
+    """Invert y(x) samples row by row onto a common grid.
+
+    Parameters
+    ----------
+    x_rows : np.ndarray
+        2D array of the function values to invert, one sweep per row.
+    y_rows : np.ndarray
+        2D array of the sweep values.  Must be increasing along each row.
+    x_grid : np.ndarray
+        the grid to resample on.
+
+    Returns
+    -------
+    ans : np.ndarray
+        array of shape (num_rows, len(x_grid)).  Values outside a row's range are clamped.
+    """
+    ans = np.empty((x_rows.shape[0], x_grid.size))
+    for idx in range(x_rows.shape[0]):
+        xvec = x_rows[idx]
+        yvec = y_rows[idx]
+        valid = np.isfinite(xvec)
+        xvec = xvec[valid]
+        yvec = yvec[valid]
+        if xvec.size == 0:
+            ans[idx] = np.nan
+            continue
+        if xvec[0] > xvec[-1]:
+            xvec = xvec[::-1]
+            yvec = yvec[::-1]
+        # force monotonicity to ignore numerical noise in deep subthreshold.
+        ans[idx] = np.interp(x_grid, np.maximum.accumulate(xvec), yvec)
+    return ans
+
+
+def _fill_invalid(table):
+    # type: (np.ndarray) -> np.ndarray
+    """Replace invalid (vbs, vds) rows of an inverse table by the nearest valid row.
+
+    Bias points with no current or no gm, such as vds = 0, invert to all NaN rows.  The
+    spline coefficient solve would spread those NaNs over the whole table, so they are
+    copied from the nearest valid vds row of the same vbs, or failing that, from the
+    nearest vbs with valid rows.
+
+    Parameters
+    ----------
+    table : np.ndarray
+        array of shape (num_vbs, num_vds, num_points).  Modified in place.
+
+    Returns
+    -------
+    table : np.ndarray
+        the filled table.
+
+    Raises
+    ------
+    ValueError
+        if no bias point has a valid row.
+    """
+    valid = np.all(np.isfinite(table), axis=2)
+    if not np.any(valid):
+        raise ValueError('No (vbs, vds) bias point has both nonzero current and gm.')
+    # fill along vds first.
+    for vbs_idx in range(table.shape[0]):
+        good = np.flatnonzero(valid[vbs_idx])
+        if 0 < good.size < table.shape[1]:
+            for vds_idx in np.flatnonzero(~valid[vbs_idx]):
+                table[vbs_idx, vds_idx] = table[vbs_idx, good[np.argmin(np.abs(good - vds_idx))]]
+    # then fill vbs values without any valid row.
+    vbs_valid = np.any(valid, axis=1)
+    good = np.flatnonzero(vbs_valid)
+    for vbs_idx in np.flatnonzero(~vbs_valid):
+        table[vbs_idx] = table[good[np.argmin(np.abs(good - vbs_idx))]]
+    return table
+
+
+class MOSInverseLookup(object):
+    """Precomputed inverse lookups for sizing by vstar or gm/Id.
+
+    For every (vbs, vds) pair, vstar = 2 * Id / gm is tabulated against vgs once and
+    resampled on a uniform vstar grid, giving vgs(vbs, vds, vstar).  Likewise Id / w is
+    resampled on a uniform gm / Id grid.  Both tables are splines over uniform grids, so
+    whole arrays of operating points are resolved in one vectorized call instead of a
+    numerical solve per point.  Requests outside the achievable range of a bias point are
+    clamped to the nearest achievable value.  Bias points without current or gm, such as
+    vds = 0, use the table of the nearest valid bias point.
+
+    Parameters
+    ----------
+    axes : Dict[str, Sequence[float]]
+        the 'vbs', 'vds', and 'vgs' sweep values.
+    ibias : np.ndarray
+        drain current, with shape (len(vbs), len(vds), len(vgs)).
+    gm : np.ndarray
+        transconductance, with the same shape as ibias.
+    w : float
+        the device width the data was characterized at, in number of fins.
+    vstar_range : Tuple[float, float]
+        the vstar grid range, in volts.
+    gmid_range : Tuple[float, float]
+        the gm / Id grid range, in 1/V.
+    num_points : int
+        number of points of the vstar and gm / Id grids.
+    """
+
+    def __init__(self, axes, ibias, gm, w=1.0, vstar_range=(0.04, 0.5), gmid_range=(4.0, 40.0),
+                 num_points=201):
+        # type: (Dict[str, Sequence[float]], np.ndarray, np.ndarray, float, Tuple[float, float], Tuple[float, float], int) -> None
+        vbs_vec, vds_vec, vgs_vec = [np.asarray(axes[key], dtype=float) for key in CHAR_AXES]
+        ibias = np.abs(np.asarray(ibias, dtype=float))
+        gm = np.abs(np.asarray(gm, dtype=float))
+        shape2d = (vbs_vec.size * vds_vec.size, vgs_vec.size)
+        ibias = ibias.reshape(shape2d)
+        gm = gm.reshape(shape2d)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vstar = np.where(gm > 0, 2 * ibias / gm, np.nan)
+        vgs_rows = np.broadcast_to(vgs_vec, shape2d)
+
+        self._vstar = np.linspace(vstar_range[0], vstar_range[1], num_points)
+        self._gmid = np.linspace(gmid_range[0], gmid_range[1], num_points)
+        tab_shape = (vbs_vec.size, vds_vec.size, num_points)
+        out_shape = tab_shape + (1, )
+        vgs_table = _fill_invalid(_invert_rows(vstar, vgs_rows, self._vstar).reshape(tab_shape))
+        # gm / Id decreases with vgs, so invert -gm / Id to get an increasing function.
+        jd_table = _fill_invalid(_invert_rows(-2 / vstar, ibias / w, -self._gmid).reshape(tab_shape))
+        vgs_table = vgs_table.reshape(out_shape)
+        jd_table = jd_table.reshape(out_shape)
+        self._vgs_fun = CubicGridSpline([vbs_vec, vds_vec, self._vstar], vgs_table)
+        self._jd_fun = CubicGridSpline([vbs_vec, vds_vec, self._gmid], jd_table)
+
+    @classmethod
+    def from_storage(cls, storage, env, w, **kwargs):
+        # type: (CharStorage, str, float, **kwargs) -> MOSInverseLookup
+        """Build inverse tables from the 'ibias' and 'gm' data of a characterization database."""
+        data = storage.get_data(env, w, names=['ibias', 'gm'])
+        return cls(storage.axes, data['ibias'], data['gm'], w=w, **kwargs)
+
+    @staticmethod
+    def _get_points(xval, vds, vbs):
+        # type: (ArrayLike, ArrayLike, ArrayLike) -> Tuple[np.ndarray, Tuple[int, ...]]
+        vbs, vds, xval = np.broadcast_arrays(np.asarray(vbs, dtype=float), np.asarray(vds, dtype=float),
+                                             np.asarray(xval, dtype=float))
+        return np.stack((vbs.ravel(), vds.ravel(), xval.ravel()), axis=-1), xval.shape
+
+    def get_vgs(self, vstar, vds, vbs=0.0):
+        # type: (ArrayLike, ArrayLike, ArrayLike) -> np.ndarray
+        """Returns the vgs giving the requested vstar, broadcast over all inputs."""
+        points, shape = self._get_points(vstar, vds, vbs)
+        return self._vgs_fun(points)[:, 0].reshape(shape)
+
+    def get_current_density(self, gm_id, vds, vbs=0.0):
+        # type: (ArrayLike, ArrayLike, ArrayLike) -> np.ndarray
+        """Returns drain current per fin at the requested gm / Id, broadcast over all inputs."""
+        points, shape = self._get_points(gm_id, vds, vbs)
+        return self._jd_fun(points)[:, 0].reshape(shape)
+
+
+def build_inverse_tables(storage, env_list=None, w_list=None, **kwargs):
+    # type: (CharStorage, Optional[Sequence[str]], Optional[Sequence[float]], **kwargs) -> Dict[Tuple[str, float], MOSInverseLookup]
+    """Build inverse tables of a transistor flavor for the given (default all) corners and widths.
+
+    Returns
+    -------
+    table : Dict[Tuple[str, float], MOSInverseLookup]
+        map from (corner, width) to inverse lookup.
+    """
+    env_list = storage.env_list if env_list is None else env_list
+    w_list = storage.w_list if w_list is None else w_list
+    return {(env, float(w)): MOSInverseLookup.from_storage(storage, env, w, **kwargs)
+            for env in env_list for w in w_list}
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, List, Tuple, Optional, Sequence, Union
+
+import time
+import itertools
+
+import numpy as np
+
+# transistor types and threshold flavors of the BAG_prim devices in this technology.
+MOS_TYPES = ('nch', 'pch')
+INTENTS = ('standard', 'svt', 'lvt', 'hvt', 'fast', 'low_power')
+
+# characterization table axes, outermost first.
+CHAR_AXES = ('vbs', 'vds', 'vgs')
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+
+def get_uniform_axis(values, rtol=1e-6):
+    # type: (Sequence[float], float) -> Tuple[float, float, int]
+    """Returns (start, step, num) of a uniformly spaced axis.  Raises ValueError otherwise.
+
+    The step is negative for decreasing axes, such as a vbs sweep from 0 down.
+    """
+    values = np.asarray(values, dtype=float)
+    num = values.size
+    if num == 1:
+        return float(values[0]), 1.0, 1
+    step = (values[-1] - values[0]) / (num - 1)
+    if step == 0 or not np.allclose(np.diff(values), step, rtol=rtol, atol=abs(step) * rtol):
+        raise ValueError('Axis values must be monotonic and uniformly spaced.')
+    return float(values[0]), float(step), num
+
+
+def _get_coef_matrix(num):
+    # type: (int) -> np.ndarray
+    """Returns the matrix that maps samples to natural cubic B-spline coefficients.
+
+    The spline of num samples has num + 2 coefficients, determined by num interpolation
+    conditions and zero second derivative at both ends.
+    """
+    mat = np.zeros((num + 2, num + 2))
+    mat[0, 0:3] = [1, -2, 1]
+    mat[-1, -3:] = [1, -2, 1]
+    for k in range(1, num + 1):
+        mat[k, k - 1:k + 2] = [1 / 6, 4 / 6, 1 / 6]
+    return np.linalg.inv(mat)[:, 1:num + 1]
+
+
+def _get_weights(u):
+    # type: (np.ndarray) -> np.ndarray
+    """Returns the 4 cubic B-spline basis weights at fractional positions u."""
+    u2 = u * u
+    u3 = u2 * u
+    return np.stack(((1 - u) ** 3 / 6,
+                     (3 * u3 - 6 * u2 + 4) / 6,
+                     (-3 * u3 + 3 * u2 + 3 * u + 1) / 6,
+                     u3 / 6), axis=-1)
+
+
+class CubicGridSpline(object):
+    """A tensor product natural cubic spline over a uniform grid.
+
+    Spline coefficients are computed once at construction; evaluation gathers the 4^D
+    neighboring coefficients of every query point with vectorized indexing, so an array
+    of points costs a fixed number of NumPy operations regardless of its size.  Query
+    points outside the grid are clamped to the grid boundary.
+
+    Parameters
+    ----------
+    axes : Sequence[Sequence[float]]
+        the uniformly spaced sample positions of each dimension.
+    values : np.ndarray
+        the sample values, with shape (n_1, ..., n_D, P) for P outputs.
+    """
+
+    def __init__(self, axes, values):
+        # type: (Sequence[Sequence[float]], np.ndarray) -> None
+        values = np.asarray(values, dtype=float)
+        ndim = len(axes)
+        if values.ndim != ndim + 1:
+            raise ValueError('values must have shape (n_1, ..., n_D, P).')
+
+        self._start = np.empty(ndim)
+        self._step = np.empty(ndim)
+        self._num = np.empty(ndim, dtype=int)
+        coef = values
+        for idx, ax_values in enumerate(axes):
+            start, step, num = get_uniform_axis(ax_values)
+            if num != values.shape[idx]:
+                raise ValueError('Axis %d has %d values, but data has %d.' % (idx, num, values.shape[idx]))
+            if num == 1:
+                # a constant dimension; treat as two identical samples.
+                coef = np.repeat(coef, 2, axis=idx)
+                num = 2
+            self._start[idx] = start
+            self._step[idx] = step
+            self._num[idx] = num
+            coef = np.moveaxis(np.tensordot(_get_coef_matrix(num), coef, axes=([1], [idx])), 0, idx)
+
+        self._coef_shape = coef.shape[:-1]
+        self._coef = coef.reshape(-1, coef.shape[-1])
+        strides = np.ones(ndim, dtype=np.int64)
+        for idx in range(ndim - 2, -1, -1):
+            strides[idx] = strides[idx + 1] * self._coef_shape[idx + 1]
+        self._strides = strides
+        # flat coefficient offsets of the 4^D neighbors of a grid cell.
+        self._offsets = np.array([np.dot(off, strides) for off in itertools.product(range(4), repeat=ndim)],
+                                 dtype=np.int64)
+        self._block_size = 8192
+
+    @property
+    def ndim(self):
+        # type: () -> int
+        return self._start.size
+
+    @property
+    def num_outputs(self):
+        # type: () -> int
+        return self._coef.shape[1]
+
+    def get_input_range(self, idx):
+        # type: (int) -> Tuple[float, float]
+        """Returns the (min, max) range of the given input dimension."""
+        start = self._start[idx]
+        stop = start + self._step[idx] * (self._num[idx] - 1)
+        return min(start, stop), max(start, stop)
+
+    def __call__(self, points, outputs=None):
+        # type: (np.ndarray, Optional[Sequence[int]]) -> np.ndarray
+        """Evaluate the spline.
+
+        Parameters
+        ----------
+        points : np.ndarray
+            the query points, with shape (N, D).
+        outputs : Optional[Sequence[int]]
+            indices of the outputs to compute.  Defaults to all.
+
+        Returns
+        -------
+        values : np.ndarray
+            the spline values, with shape (N, P).
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        coef = self._coef if outputs is None else self._coef[:, list(outputs)]
+        num_pts = points.shape[0]
+
+        base_idx = np.zeros(num_pts, dtype=np.int64)
+        weights = np.ones((num_pts, 1))
+        for dim in range(self.ndim):
+            num = self._num[dim]
+            t = np.clip((points[:, dim] - self._start[dim]) / self._step[dim], 0, num - 1)
+            i = np.minimum(np.floor(t).astype(np.int64), num - 2)
+            base_idx += i * self._strides[dim]
+            # outer product of per-dimension weights, in the same order as self._offsets
+            weights = (weights[:, :, np.newaxis] * _get_weights(t - i)[:, np.newaxis, :]).reshape(num_pts, -1)
+
+        ans = np.empty((num_pts, coef.shape[1]))
+        # process in blocks to bound the size of the gathered coefficient array.
+        for start in range(0, num_pts, self._block_size):
+            stop = min(start + self._block_size, num_pts)
+            flat_idx = base_idx[start:stop, np.newaxis] + self._offsets
+            ans[start:stop] = np.einsum('nk,nkp->np', weights[start:stop], coef[flat_idx])
+        return ans
+
+
+class MOSCharLookup(object):
+    """Batched small signal parameter lookup for one transistor flavor and corner.
+
+    Parameters
+    ----------
+    mos_type : str
+        the transistor type, 'nch' or 'pch'.
+    intent : str
+        the threshold flavor.
+    env : str
+        the process corner.
+    axes : Dict[str, Sequence[float]]
+        the uniformly spaced 'vbs', 'vds', and 'vgs' sweep values.
+    data : Dict[str, np.ndarray]
+        map from parameter name (e.g. 'ibias', 'gm', 'gds', 'cgg') to characterization
+        data, with shape (len(vbs), len(vds), len(vgs)).
+    """
+
+    def __init__(self, mos_type, intent, env, axes, data):
+        # type: (str, str, str, Dict[str, Sequence[float]], Dict[str, np.ndarray]) -> None
+        if mos_type not in MOS_TYPES:
+            raise ValueError('Unknown transistor type: %s' % mos_type)
+        if intent not in INTENTS:
+            raise ValueError('Unknown threshold flavor: %s' % intent)
+        self._mos_type = mos_type
+        self._intent = intent
+        self._env = env
+        self._axes = {key: np.asarray(axes[key], dtype=float) for key in CHAR_AXES}
+        self._names = sorted(data.keys())
+        self._name_idx = {name: idx for idx, name in enumerate(self._names)}
+        values = np.stack([np.asarray(data[name], dtype=float) for name in self._names], axis=-1)
+        self._spline = CubicGridSpline([self._axes[key] for key in CHAR_AXES], values)
+
+    @property
+    def key(self):
+        # type: () -> Tuple[str, str, str]
+        return self._mos_type, self._intent, self._env
+
+    @property
+    def names(self):
+        # type: () -> List[str]
+        return list(self._names)
+
+    def get_axis(self, name):
+        # type: (str) -> np.ndarray
+        return self._axes[name]
+
+    def query(self, vgs, vds, vbs=0.0, names=None):
+        # type: (ArrayLike, ArrayLike, ArrayLike, Optional[Sequence[str]]) -> Dict[str, np.ndarray]
+        """Look up small signal parameters.
+
+        Parameters
+        ----------
+        vgs : ArrayLike
+            gate-source voltages.
+        vds : ArrayLike
+            drain-source voltages.
+        vbs : ArrayLike
+            body-source voltages.
+        names : Optional[Sequence[str]]
+            the parameters to compute.  Defaults to all.
+
+        Returns
+        -------
+        results : Dict[str, np.ndarray]
+            map from parameter name to values, with the broadcast shape of the bias arrays.
+        """
+        vbs, vds, vgs = np.broadcast_arrays(np.asarray(vbs, dtype=float), np.asarray(vds, dtype=float),
+                                            np.asarray(vgs, dtype=float))
+        shape = vgs.shape
+        points = np.stack((vbs.ravel(), vds.ravel(), vgs.ravel()), axis=-1)
+        if names is None:
+            names = self._names
+        values = self._spline(points, outputs=[self._name_idx[name] for name in names])
+        return {name: values[:, idx].reshape(shape) for idx, name in enumerate(names)}
+
+    def query_grid(self, vgs, vds, vbs=0.0, names=None):
+        # type: (ArrayLike, ArrayLike, ArrayLike, Optional[Sequence[str]]) -> Dict[str, np.ndarray]
+        """Look up parameters over the full grid of the given 1D bias vectors.
+
+        Results have shape (len(vbs), len(vds), len(vgs)).
+        """
+        vbs, vds, vgs = np.meshgrid(np.atleast_1d(vbs), np.atleast_1d(vds), np.atleast_1d(vgs),
+                                    indexing='ij')
+        return self.query(vgs, vds, vbs=vbs, names=names)
+
+
+def benchmark_lookup(lookup, num_points=10000, seed=0):
+    # type: (MOSCharLookup, int, int) -> Dict[str, float]
+    """Compare per-point and batched lookup time over random bias points.
+
+    Returns
+    -------
+    results : Dict[str, float]
+        per point and batched runtimes in seconds, and the speedup.
+    """
+    rand = np.random.RandomState(seed)
+    bias = {}
+    for key in CHAR_AXES:
+        vec = lookup.get_axis(key)
+        bias[key] = rand.uniform(vec[0], vec[-1], size=num_points)
+
+    t0 = time.time()
+    for idx in range(num_points):
+        lookup.query(bias['vgs'][idx], bias['vds'][idx], vbs=bias['vbs'][idx])
+    t_point = time.time() - t0
+
+    t0 = time.time()
+    lookup.query(bias['vgs'], bias['vds'], vbs=bias['vbs'])
+    t_batch = time.time() - t0
+    return dict(per_point=t_point, batch=t_batch, speedup=t_point / t_batch if t_batch > 0 else float('inf'))
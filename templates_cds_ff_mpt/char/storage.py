@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, List, Any, Optional, Sequence
+
+import os
+import json
+
+import numpy as np
+
+from .spline import MOS_TYPES, INTENTS, CHAR_AXES, MOSCharLookup
+
+_INDEX_FILE = 'index.json'
+
+
+def _get_db_dir(root_dir, mos_type, intent):
+    # type: (str, str, str) -> str
+    if mos_type not in MOS_TYPES:
+        raise ValueError('Unknown transistor type: %s' % mos_type)
+    if intent not in INTENTS:
+        raise ValueError('Unknown threshold flavor: %s' % intent)
+    return os.path.join(os.path.abspath(os.path.expandvars(root_dir)), '%s_%s' % (mos_type, intent))
+
+
+class CharStorageWriter(object):
+    """Writes characterization data of one transistor flavor in the chunked on-disk format.
+
+    The database is a directory with an index.json file describing the sweep axes, and
+    one .npy file per corner holding a (w, vbs, vds, vgs, parameter) array.  Width is the
+    outermost dimension, so the data of one corner and width is a contiguous slice.
+
+    Parameters
+    ----------
+    root_dir : str
+        the root directory of all characterization databases.
+    mos_type : str
+        the transistor type.
+    intent : str
+        the threshold flavor.
+    axes : Dict[str, Sequence[float]]
+        the 'vbs', 'vds', and 'vgs' sweep values.
+    w_list : Sequence[float]
+        the characterized widths, in number of fins.
+    names : Sequence[str]
+        the parameter names.
+    dtype : str
+        the on-disk data type.
+    """
+
+    def __init__(self, root_dir, mos_type, intent, axes, w_list, names, dtype='float64'):
+        # type: (str, str, str, Dict[str, Sequence[float]], Sequence[float], Sequence[str], str) -> None
+        self._db_dir = _get_db_dir(root_dir, mos_type, intent)
+        self._shape = (len(w_list),) + tuple(len(axes[key]) for key in CHAR_AXES) + (len(names),)
+        self._names = list(names)
+        self._dtype = np.dtype(dtype)
+        self._index = dict(
+            mos_type=mos_type,
+            intent=intent,
+            axes={key: [float(v) for v in axes[key]] for key in CHAR_AXES},
+            w_list=[float(w) for w in w_list],
+            names=self._names,
+            dtype=self._dtype.str,
+            env_list=[],
+        )
+        os.makedirs(self._db_dir, exist_ok=True)
+        index_file = os.path.join(self._db_dir, _INDEX_FILE)
+        if os.path.isfile(index_file):
+            with open(index_file, 'r') as f:
+                old_index = json.load(f)
+            old_envs = old_index.pop('env_list')
+            cur_envs = self._index.pop('env_list')
+            if old_index == self._index:
+                # same sweep setup, keep existing corners.
+                cur_envs = old_envs
+            self._index['env_list'] = cur_envs
+
+    def write_env(self, env, data):
+        # type: (str, Dict[str, np.ndarray]) -> None
+        """Write the data of one corner.
+
+        Parameters
+        ----------
+        env : str
+            the corner name.
+        data : Dict[str, np.ndarray]
+            map from parameter name to data, with shape (len(w_list), len(vbs), len(vds), len(vgs)).
+        """
+        fname = os.path.join(self._db_dir, '%s.npy' % env)
+        tmp_name = fname + '.tmp'
+        arr = np.lib.format.open_memmap(tmp_name, mode='w+', dtype=self._dtype, shape=self._shape)
+        for idx, name in enumerate(self._names):
+            arr[..., idx] = data[name]
+        arr.flush()
+        del arr
+        os.replace(tmp_name, fname)
+
+        env_list = self._index['env_list']
+        if env not in env_list:
+            env_list.append(env)
+        index_file = os.path.join(self._db_dir, _INDEX_FILE)
+        with open(index_file + '.tmp', 'w') as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(index_file + '.tmp', index_file)
+
+
+class CharStorage(object):
+    """Read-only, memory mapped access to the characterization data of one transistor flavor.
+
+    Corner files are memory mapped on first use, so the OS shares their pages between all
+    processes reading the same database, and only the slices a query touches are read
+    from disk.
+
+    Parameters
+    ----------
+    root_dir : str
+        the root directory of all characterization databases.
+    mos_type : str
+        the transistor type.
+    intent : str
+        the threshold flavor.
+    """
+
+    def __init__(self, root_dir, mos_type, intent):
+        # type: (str, str, str) -> None
+        self._db_dir = _get_db_dir(root_dir, mos_type, intent)
+        with open(os.path.join(self._db_dir, _INDEX_FILE), 'r') as f:
+            self._index = json.load(f)  # type: Dict[str, Any]
+        self._mos_type = mos_type
+        self._intent = intent
+        self._name_idx = {name: idx for idx, name in enumerate(self._index['names'])}
+        self._w_idx = {w: idx for idx, w in enumerate(self._index['w_list'])}
+        self._env_data = {}  # type: Dict[str, np.ndarray]
+        self._lookup_cache = {}  # type: Dict[Any, MOSCharLookup]
+
+    @property
+    def env_list(self):
+        # type: () -> List[str]
+        return list(self._index['env_list'])
+
+    @property
+    def w_list(self):
+        # type: () -> List[float]
+        return list(self._index['w_list'])
+
+    @property
+    def names(self):
+        # type: () -> List[str]
+        return list(self._index['names'])
+
+    @property
+    def axes(self):
+        # type: () -> Dict[str, np.ndarray]
+        return {key: np.array(val) for key, val in self._index['axes'].items()}
+
+    def _get_env_data(self, env):
+        # type: (str) -> np.ndarray
+        arr = self._env_data.get(env, None)
+        if arr is None:
+            if env not in self._index['env_list']:
+                raise ValueError('Corner %s is not characterized.' % env)
+            arr = np.load(os.path.join(self._db_dir, '%s.npy' % env), mmap_mode='r')
+            self._env_data[env] = arr
+        return arr
+
+    def get_data(self, env, w, names=None):
+        # type: (str, float, Optional[Sequence[str]]) -> Dict[str, np.ndarray]
+        """Returns read-only views of the (vbs, vds, vgs) tables of the given corner and width."""
+        try:
+            w_idx = self._w_idx[float(w)]
+        except KeyError:
+            raise ValueError('Width %s is not characterized.' % w)
+        arr = self._get_env_data(env)[w_idx]
+        if names is None:
+            names = self._index['names']
+        return {name: arr[..., self._name_idx[name]] for name in names}
+
+    def get_lookup(self, env, w, names=None):
+        # type: (str, float, Optional[Sequence[str]]) -> MOSCharLookup
+        """Returns a cached spline lookup of the given corner and width."""
+        key = (env, float(w), None if names is None else tuple(names))
+        lookup = self._lookup_cache.get(key, None)
+        if lookup is None:
+            lookup = MOSCharLookup(self._mos_type, self._intent, env, self._index['axes'],
+                                   self.get_data(env, w, names=names))
+            self._lookup_cache[key] = lookup
+        return lookup
+
+    def close(self):
+        # type: () -> None
+        """Release all memory maps and cached lookups."""
+        self._env_data.clear()
+        self._lookup_cache.clear()
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, List, Tuple, Optional
+
+import numpy as np
+
+from .. import config as _config
+from ..rules import DRCRuleTables
+from .index import find_close_pairs, get_gaps
+from .shapes import ShapeSet
+
+
+class DRCViolation(object):
+    """A DRC-lite rule violation.
+
+    Parameters
+    ----------
+    rule : str
+        the rule name, such as 'sp_min' or 'via.top_enc'.
+    layer : Tuple[str, str]
+        the layer/purpose pair, or via ID and '' for via rules.
+    bbox : Tuple[int, int, int, int]
+        the marker box, in resolution units.
+    value : float
+        the measured value.  0 for via.dim and via enclosure violations.
+    required : float
+        the rule value.  0 for via.dim and via enclosure violations.
+    """
+
+    __slots__ = ('rule', 'layer', 'bbox', 'value', 'required')
+
+    def __init__(self, rule, layer, bbox, value, required):
+        # type: (str, Tuple[str, str], Tuple[int, int, int, int], float, float) -> None
+        self.rule = rule
+        self.layer = layer
+        self.bbox = bbox
+        self.value = value
+        self.required = required
+
+    def __repr__(self):
+        return '%s(%r, %r, %r, value=%r, required=%r)' % (self.__class__.__name__, self.rule, self.layer,
+                                                          self.bbox, self.value, self.required)
+
+
+def _get_lch_value(table, lch_unit):
+    # type: (Dict[str, List[Any]], Optional[int]) -> int
+    if lch_unit is None:
+        return table['val'][-1]
+    for lch_max, val in zip(table['lch'], table['val']):
+        if lch_unit <= lch_max:
+            return val
+    raise ValueError('Channel length %d exceeds the rule table.' % lch_unit)
+
+
+def _gap_boxes(boxes, idx0, idx1):
+    # type: (np.ndarray, np.ndarray, np.ndarray) -> np.ndarray
+    """Returns the boxes spanning the gaps between the given box pairs."""
+    b0 = boxes[idx0]
+    b1 = boxes[idx1]
+    x0 = np.minimum(b0[:, 2], b1[:, 2])
+    x1 = np.maximum(b0[:, 0], b1[:, 0])
+    y0 = np.minimum(b0[:, 3], b1[:, 3])
+    y1 = np.maximum(b0[:, 1], b1[:, 1])
+    return np.stack((np.minimum(x0, x1), np.minimum(y0, y1), np.maximum(x0, x1), np.maximum(y0, y1)), axis=1)
+
+
+def _get_spacing(gap_x, gap_y):
+    # type: (np.ndarray, np.ndarray) -> Tuple[np.ndarray, np.ndarray]
+    """Returns (separated, spacing) of box pairs, using Euclidean distance for corners."""
+    sep = (gap_x > 0) | (gap_y > 0)
+    dist = np.hypot(np.maximum(gap_x, 0), np.maximum(gap_y, 0))
+    return sep, dist
+
+
+class DRCLiteChecker(object):
+    """A fast checker for the subset of design rules encoded in tech_params.yaml.
+
+    Checks metal spacing (sp_min, with sp_le_min between line ends), minimum length
+    (len_min) of isolated metal rectangles, via cut dimensions, spacing and top/bottom
+    enclosure from the via table, and the od_spy, md_spy, and mp_spy vertical spacing
+    of transistor layers.  Nearby shape pairs are found with a uniform grid spatial
+    index, so runtime grows with the number of shapes rather than its square.  This is
+    a pre-LVS gate, not a signoff DRC; shapes of different nets are not distinguished.
+    Metal rules only check the drawing purpose.  BAG draws a drawing rectangle under
+    every pin by default, so pin purpose shapes are not checked separately.
+
+    Parameters
+    ----------
+    config : Optional[Dict[str, Any]]
+        the technology parameters dictionary.  Defaults to tech_params.yaml.
+    lch_unit : Optional[int]
+        channel length in resolution units, used for channel length dependent rules.
+        Defaults to the largest channel length bucket.
+    """
+
+    def __init__(self, config=None, lch_unit=None):
+        # type: (Optional[Dict[str, Any]], Optional[int]) -> None
+        self._config = config = _config if config is None else config
+        self._rules = DRCRuleTables(config)
+
+        self._metal_layers = []  # type: List[Tuple[Tuple[str, str], str]]
+        lay_id_table = {}
+        for lay_id, lay_name in config['layer_name'].items():
+            lay_id_table[lay_name] = lay_id
+            lay_type = config['layer_type'][lay_name]
+            if lay_type in config['sp_min']:
+                self._metal_layers.append(((lay_name, 'drawing'), lay_type))
+
+        # via ID to via name, for the via rule table.
+        self._via_names = {}  # type: Dict[str, str]
+        for (bot_lay, _), via_id in config['via_id'].items():
+            bot_id = lay_id_table[bot_lay] if isinstance(bot_lay, str) else 0
+            self._via_names[via_id] = config['via_name'][bot_id]
+
+        mos_config = config['mos']
+        lay_table = config['mos_layer_table']
+        self._spy_rules = [
+            ('od_spy', lay_table['OD'][0], mos_config['od_spy']),
+            ('md_spy', lay_table['MD'][0], _get_lch_value(mos_config['md_spy'], lch_unit)),
+            ('mp_spy', lay_table['MP'][0], mos_config['mp_spy']),
+        ]
+
+    def check(self, shapes):
+        # type: (ShapeSet) -> List[DRCViolation]
+        """Check the given shapes and return all violations."""
+        results = []  # type: List[DRCViolation]
+        for layer, lay_type in self._metal_layers:
+            self._check_metal(shapes.get_rects(layer), layer, lay_type, results)
+        for rule, lay_name, spy in self._spy_rules:
+            self._check_spy(shapes.get_layer_rects(lay_name), rule, lay_name, spy, results)
+        for via_id, vias in shapes.get_vias().items():
+            self._check_vias(via_id, vias, results)
+        cut_layers = {}  # type: Dict[Tuple[str, str], int]
+        for via_id, cut_lay in self._config.get('via_cut_layer', {}).items():
+            if via_id in self._via_names:
+                sp = min(self._config['via'][self._via_names[via_id]]['square']['sp'])
+                cut_lay = (cut_lay[0], cut_lay[1])
+                cut_layers[cut_lay] = min(sp, cut_layers.get(cut_lay, sp))
+        for cut_lay, sp in cut_layers.items():
+            self._check_cut_spacing(shapes.get_rects(cut_lay), cut_lay, sp, results)
+        return results
+
+    @staticmethod
+    def _add_results(results, rule, layer, boxes, value, required):
+        # type: (List[DRCViolation], str, Tuple[str, str], np.ndarray, np.ndarray, np.ndarray) -> None
+        for box, val, req in zip(boxes.tolist(), np.broadcast_to(value, boxes.shape[:1]).tolist(),
+                                 np.broadcast_to(required, boxes.shape[:1]).tolist()):
+            results.append(DRCViolation(rule, layer, tuple(box), val, req))
+
+    def _check_metal(self, boxes, layer, lay_type, results):
+        # type: (np.ndarray, Tuple[str, str], str, List[DRCViolation]) -> None
+        if boxes.shape[0] == 0:
+            return
+        rules = self._rules
+        config = self._config
+        dx = boxes[:, 2] - boxes[:, 0]
+        dy = boxes[:, 3] - boxes[:, 1]
+        width = np.minimum(dx, dy)
+        is_horz = dx >= dy
+
+        max_sp = max(config['sp_min'][lay_type]['sp_list'])
+        if lay_type in config['sp_le_min']:
+            max_sp = max(max_sp, max(config['sp_le_min'][lay_type]['sp_list']))
+        idx0, idx1 = find_close_pairs(boxes, max_sp)
+        gap_x, gap_y = get_gaps(boxes, idx0, idx1)
+        sep, dist = _get_spacing(gap_x, gap_y)
+
+        w_max = np.maximum(width[idx0], width[idx1])
+        req = rules.get_min_space_array(lay_type, w_max)
+        if lay_type in config['sp_le_min']:
+            # line end to line end: gap along the length of both wires.
+            le_x = (gap_y < 0) & is_horz[idx0] & is_horz[idx1]
+            le_y = (gap_x < 0) & ~is_horz[idx0] & ~is_horz[idx1]
+            req_le = rules.get_min_line_end_space_array(lay_type, w_max)
+            req = np.where(le_x | le_y, req_le, req)
+        bad = sep & (dist < req)
+        if np.any(bad):
+            self._add_results(results, 'sp_min', layer, _gap_boxes(boxes, idx0[bad], idx1[bad]),
+                              dist[bad], req[bad])
+
+        # minimum length only applies to rectangles not connected to any other rectangle.
+        connected = np.zeros(boxes.shape[0], dtype=bool)
+        connected[idx0[~sep]] = True
+        connected[idx1[~sep]] = True
+        iso = np.flatnonzero(~connected)
+        if iso.size > 0:
+            length = np.maximum(dx[iso], dy[iso])
+            len_req = rules.get_min_length_array(lay_type, width[iso])
+            bad = length < len_req
+            if np.any(bad):
+                self._add_results(results, 'len_min', layer, boxes[iso[bad]], length[bad], len_req[bad])
+
+    def _check_spy(self, boxes, rule, lay_name, spy, results):
+        # type: (np.ndarray, str, str, int, List[DRCViolation]) -> None
+        if boxes.shape[0] == 0 or spy <= 0:
+            return
+        idx0, idx1 = find_close_pairs(boxes, spy)
+        gap_x, gap_y = get_gaps(boxes, idx0, idx1)
+        bad = (gap_x < 0) & (gap_y > 0) & (gap_y < spy)
+        if np.any(bad):
+            self._add_results(results, rule, (lay_name, ''), _gap_boxes(boxes, idx0[bad], idx1[bad]),
+                              gap_y[bad], spy)
+
+    def _check_cut_spacing(self, boxes, layer, sp, results):
+        # type: (np.ndarray, Tuple[str, str], int, List[DRCViolation]) -> None
+        if boxes.shape[0] == 0:
+            return
+        idx0, idx1 = find_close_pairs(boxes, sp)
+        gap_x, gap_y = get_gaps(boxes, idx0, idx1)
+        sep, dist = _get_spacing(gap_x, gap_y)
+        bad = sep & (dist < sp)
+        if np.any(bad):
+            self._add_results(results, 'via.sp', layer, _gap_boxes(boxes, idx0[bad], idx1[bad]),
+                              dist[bad], sp)
+
+    def _check_vias(self, via_id, vias, results):
+        # type: (str, np.ndarray, List[DRCViolation]) -> None
+        via_config = self._config['via'][self._via_names[via_id]]
+        layer = (via_id, '')
+        cut_w, cut_h, nrow, ncol, sp_rows, sp_cols = vias[:, 2:8].T
+        enc1 = vias[:, 8:12]
+        enc2 = vias[:, 12:16]
+        arr_w = ncol * cut_w + (ncol - 1) * sp_cols
+        arr_h = nrow * cut_h + (nrow - 1) * sp_rows
+        marker = np.stack((vias[:, 0] - arr_w // 2, vias[:, 1] - arr_h // 2,
+                           vias[:, 0] - arr_w // 2 + arr_w, vias[:, 1] - arr_h // 2 + arr_h), axis=1)
+
+        matched = np.zeros(vias.shape[0], dtype=bool)
+        for vtype, type_config in via_config.items():
+            w, h = type_config['dim']
+            sel = ~matched & (((cut_w == w) & (cut_h == h)) | ((cut_w == h) & (cut_h == w)))
+            if not np.any(sel):
+                continue
+            matched |= sel
+            rot = sel & (cut_w == h) & (cut_h == w) & (w != h)
+            spx, spy = type_config['sp']
+            req_x = np.where(rot, spy, spx)
+            req_y = np.where(rot, spx, spy)
+            bad_x = sel & (ncol > 1) & (sp_cols < req_x)
+            bad_y = sel & (nrow > 1) & (sp_rows < req_y)
+            # report the failing spacing and its rule; X first if both fail.
+            value = np.where(bad_x, sp_cols, sp_rows)
+            req = np.where(bad_x, req_x, req_y)
+            bad = bad_x | bad_y
+            for key, min_num in (('sp2', 2), ('sp3', 3)):
+                arr_sel = sel & (nrow >= min_num) & (ncol >= min_num)
+                if np.any(arr_sel) and type_config.get(key):
+                    ok = np.zeros(vias.shape[0], dtype=bool)
+                    for sx, sy in type_config[key]:
+                        ok |= ((sp_cols >= np.where(rot, sy, sx)) & (sp_rows >= np.where(rot, sx, sy)))
+                    new_bad = arr_sel & ~ok & ~bad
+                    if np.any(new_bad):
+                        # no spacing option is met; report against the first option.
+                        sx, sy = type_config[key][0]
+                        arr_x = np.where(rot, sy, sx)
+                        arr_y = np.where(rot, sx, sy)
+                        use_x = sp_cols < arr_x
+                        value = np.where(new_bad, np.where(use_x, sp_cols, sp_rows), value)
+                        req = np.where(new_bad, np.where(use_x, arr_x, arr_y), req)
+                        bad |= new_bad
+            if np.any(bad):
+                self._add_results(results, 'via.sp', layer, marker[bad], value[bad], req[bad])
+
+            for key, enc in (('bot_enc', enc1), ('top_enc', enc2)):
+                enc_config = type_config.get(key)
+                if enc_config:
+                    bad = sel & ~self._check_enc(enc_config, enc, arr_w, arr_h)
+                    if np.any(bad):
+                        self._add_results(results, 'via.' + key, layer, marker[bad], 0, 0)
+
+        if not np.all(matched):
+            self._add_results(results, 'via.dim', layer, marker[~matched], 0, 0)
+
+    @staticmethod
+    def _check_enc(enc_config, enc, arr_w, arr_h):
+        # type: (Dict[str, Any], np.ndarray, np.ndarray, np.ndarray) -> np.ndarray
+        """Returns True for vias whose metal enclosure satisfies one of the allowed options."""
+        enc_x = np.minimum(enc[:, 0], enc[:, 1])
+        enc_y = np.minimum(enc[:, 2], enc[:, 3])
+        met_w = np.minimum(arr_w + enc[:, 0] + enc[:, 1], arr_h + enc[:, 2] + enc[:, 3])
+        bucket = np.searchsorted(np.asarray(enc_config['w_list'], dtype=float), met_w, side='left')
+        ok = np.zeros(enc.shape[0], dtype=bool)
+        for idx, opt_list in enumerate(enc_config['enc_list']):
+            in_bucket = bucket == idx
+            if not np.any(in_bucket):
+                continue
+            for ex, ey in opt_list:
+                ok |= in_bucket & (((enc_x >= ex) & (enc_y >= ey)) | ((enc_x >= ey) & (enc_y >= ex)))
+        return ok
+
+
+def summarize(violations):
+    # type: (List[DRCViolation]) -> Dict[Tuple[str, Tuple[str, str]], int]
+    """Returns violation counts per (rule, layer)."""
+    ans = {}  # type: Dict[Tuple[str, Tuple[str, str]], int]
+    for v in violations:
+        key = (v.rule, v.layer)
+        ans[key] = ans.get(key, 0) + 1
+    return ans
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, List, Optional, Set
+
+from collections import deque
+
+import numpy as np
+
+from .. import config as _config
+from ..rules import DRCRuleTables
+from .index import find_close_pairs, get_gaps
+from .shapes import ShapeSet
+
+
+def get_mpt_layers(config=None):
+    # type: (Optional[Dict[str, Any]]) -> Dict[str, str]
+    """Returns map from metal layer name to layer type for multi-patterned layers.
+
+    A layer is multi-patterned if its same-color spacing table sp_sc_min differs from
+    its sp_min table.
+    """
+    if config is None:
+        config = _config
+    ans = {}
+    for lay_name in config['layer_name'].values():
+        lay_type = config['layer_type'][lay_name]
+        sp = config['sp_min'].get(lay_type)
+        sp_sc = config['sp_sc_min'].get(lay_type)
+        if sp is not None and sp_sc is not None and sp != sp_sc:
+            ans[lay_name] = lay_type
+    return ans
+
+
+class LayerColoring(object):
+    """Incremental two-color mask assignment of one multi-patterned layer.
+
+    Rectangles that touch or overlap form one polygon and always get the same color.
+    Polygons closer than the same-color spacing sp_sc_min get different colors.  Shapes
+    are added in batches; new polygons are colored to agree with their colored
+    neighbors, and a conflict graph component is only recolored when that is impossible.
+    Odd cycles, which cannot be two-colored, are reported with the shapes that form them.
+
+    Parameters
+    ----------
+    lay_type : str
+        the layer type.
+    rules : DRCRuleTables
+        the compiled rule tables.
+    """
+
+    def __init__(self, lay_type, rules):
+        # type: (str, DRCRuleTables) -> None
+        self._lay_type = lay_type
+        self._rules = rules
+        self._max_sp = int(rules.get_min_space_array(lay_type, [1 << 40], same_color=True)[0])
+        self._boxes = np.empty((0, 4), dtype=np.int64)
+        self._parent = []  # type: List[int]
+        self._members = {}  # type: Dict[int, List[int]]
+        self._adj = {}  # type: Dict[int, Set[int]]
+        self._color = {}  # type: Dict[int, int]
+        # odd cycles keyed by polygon, and polygons closer than same-color spacing to themselves.
+        self._cycles = {}  # type: Dict[int, List[int]]
+        self._self_conflicts = {}  # type: Dict[int, List[int]]
+        self._num_flips = 0
+
+    @property
+    def num_shapes(self):
+        # type: () -> int
+        return self._boxes.shape[0]
+
+    @property
+    def num_flips(self):
+        # type: () -> int
+        """Total number of previously colored polygons whose color changed."""
+        return self._num_flips
+
+    def _find(self, idx):
+        # type: (int) -> int
+        parent = self._parent
+        root = idx
+        while parent[root] != root:
+            root = parent[root]
+        while parent[idx] != root:
+            parent[idx], idx = root, parent[idx]
+        return root
+
+    def _union(self, a, b):
+        # type: (int, int) -> int
+        ra, rb = self._find(a), self._find(b)
+        if ra == rb:
+            return ra
+        if len(self._members[ra]) < len(self._members[rb]):
+            ra, rb = rb, ra
+        self._parent[rb] = ra
+        self._members[ra].extend(self._members.pop(rb))
+        adj_b = self._adj.pop(rb)
+        adj_a = self._adj[ra]
+        for nb in adj_b:
+            nb_adj = self._adj[nb]
+            nb_adj.discard(rb)
+            nb_adj.add(ra)
+            adj_a.add(nb)
+        color_b = self._color.pop(rb, None)
+        if ra not in self._color and color_b is not None:
+            self._color[ra] = color_b
+        self._cycles.pop(ra, None)
+        self._cycles.pop(rb, None)
+        conflict_b = self._self_conflicts.pop(rb, None)
+        if conflict_b is not None:
+            self._self_conflicts.setdefault(ra, conflict_b)
+        if ra in adj_a:
+            adj_a.discard(ra)
+            self._self_conflicts.setdefault(ra, [self._members[ra][0]])
+        return ra
+
+    def add_shapes(self, boxes):
+        # type: (np.ndarray) -> np.ndarray
+        """Add rectangles and update the coloring.
+
+        Parameters
+        ----------
+        boxes : np.ndarray
+            (N, 4) [xl, yb, xr, yt] array in resolution units.
+
+        Returns
+        -------
+        index : np.ndarray
+            the shape indices assigned to the new rectangles.
+        """
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        start = self._boxes.shape[0]
+        num_new = boxes.shape[0]
+        if num_new == 0:
+            return np.empty(0, dtype=np.int64)
+        self._boxes = all_boxes = np.concatenate((self._boxes, boxes), axis=0)
+        for idx in range(start, start + num_new):
+            self._parent.append(idx)
+            self._members[idx] = [idx]
+            self._adj[idx] = set()
+
+        # only existing shapes near the new batch can interact with it.
+        sp = self._max_sp
+        cand = np.arange(start, start + num_new)
+        if start > 0:
+            old_boxes = all_boxes[:start]
+            near = ((old_boxes[:, 0] < boxes[:, 2].max() + sp) & (old_boxes[:, 2] > boxes[:, 0].min() - sp) &
+                    (old_boxes[:, 1] < boxes[:, 3].max() + sp) & (old_boxes[:, 3] > boxes[:, 1].min() - sp))
+            cand = np.concatenate((np.flatnonzero(near), cand))
+        idx0, idx1 = find_close_pairs(all_boxes[cand], sp)
+        idx0, idx1 = cand[idx0], cand[idx1]
+        keep = idx1 >= start
+        idx0, idx1 = idx0[keep], idx1[keep]
+        gap_x, gap_y = get_gaps(all_boxes, idx0, idx1)
+        sep = (gap_x > 0) | (gap_y > 0)
+        dist = np.hypot(np.maximum(gap_x, 0), np.maximum(gap_y, 0))
+        width = np.minimum(all_boxes[:, 2] - all_boxes[:, 0], all_boxes[:, 3] - all_boxes[:, 1])
+        req = self._rules.get_min_space_array(self._lay_type, np.maximum(width[idx0], width[idx1]),
+                                              same_color=True)
+        conflict = sep & (dist < req)
+
+        dirty = set()
+        for a, b in zip(idx0[~sep].tolist(), idx1[~sep].tolist()):
+            dirty.add(self._union(a, b))
+        for a, b in zip(idx0[conflict].tolist(), idx1[conflict].tolist()):
+            ra, rb = self._find(a), self._find(b)
+            if ra == rb:
+                self._self_conflicts.setdefault(ra, [a, b])
+            else:
+                self._adj[ra].add(rb)
+                self._adj[rb].add(ra)
+                dirty.add(ra)
+        dirty.update(self._find(idx) for idx in range(start, start + num_new))
+        self._recolor({self._find(r) for r in dirty})
+        return np.arange(start, start + num_new)
+
+    def _recolor(self, dirty):
+        # type: (Set[int]) -> None
+        """Color new polygons, recoloring whole components only when forced to.
+
+        Uncolored polygons reachable from a dirty polygon are two-colored relative to each
+        other, then the parity is chosen to agree with their colored neighbors.  If no
+        parity agrees, or a colored polygon conflicts with a neighbor, the whole conflict
+        graph component is recolored.
+        """
+        color = self._color
+        adj = self._adj
+        done = set()
+        for seed in dirty:
+            if seed in done:
+                continue
+            if seed in color:
+                done.add(seed)
+                cur = color[seed]
+                if any(color.get(nb, -1) == cur for nb in adj[seed]):
+                    self._recolor_component(seed, done)
+                continue
+
+            parity = {seed: 0}
+            queue = deque([seed])
+            need = set()
+            consistent = True
+            while queue:
+                node = queue.popleft()
+                cur = parity[node]
+                for nb in adj[node]:
+                    if nb in color:
+                        # seed color such that this node differs from its colored neighbor.
+                        need.add(color[nb] ^ 1 ^ cur)
+                    elif nb not in parity:
+                        parity[nb] = 1 - cur
+                        queue.append(nb)
+                    elif parity[nb] == cur:
+                        consistent = False
+            done.update(parity)
+            if consistent and len(need) <= 1:
+                seed_color = need.pop() if need else 0
+                for node, val in parity.items():
+                    color[node] = seed_color ^ val
+            else:
+                self._recolor_component(seed, done)
+
+    def _recolor_component(self, seed, done):
+        # type: (int, Set[int]) -> None
+        """Recolor the conflict graph component of seed, recording odd cycles."""
+        color = self._color
+        adj = self._adj
+        comp = [seed]
+        visited = {seed}
+        queue = deque([seed])
+        while queue:
+            node = queue.popleft()
+            for nb in adj[node]:
+                if nb not in visited:
+                    visited.add(nb)
+                    comp.append(nb)
+                    queue.append(nb)
+        done.update(visited)
+
+        # start from the largest colored polygon to keep most existing colors.
+        colored = [node for node in comp if node in color]
+        if colored:
+            start = max(colored, key=lambda r: len(self._members[r]))
+        else:
+            start = min(comp)
+        old_color = {node: color[node] for node in colored}
+        for node in comp:
+            self._cycles.pop(node, None)
+        new_color = {start: old_color.get(start, 0)}
+        parent = {start: -1}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            cur = new_color[node]
+            for nb in adj[node]:
+                if nb not in new_color:
+                    new_color[nb] = 1 - cur
+                    parent[nb] = node
+                    queue.append(nb)
+                elif new_color[nb] == cur and node < nb:
+                    self._cycles[node] = self._get_cycle(parent, node, nb)
+        for node, val in new_color.items():
+            if node in old_color and old_color[node] != val:
+                self._num_flips += 1
+            color[node] = val
+
+    def _get_cycle(self, parent, a, b):
+        # type: (Dict[int, int], int, int) -> List[int]
+        """Returns representative shapes of the odd cycle closed by the edge (a, b)."""
+        path_a = [a]
+        while parent[path_a[-1]] != -1:
+            path_a.append(parent[path_a[-1]])
+        anc_a = {node: idx for idx, node in enumerate(path_a)}
+        path_b = [b]
+        while path_b[-1] not in anc_a:
+            path_b.append(parent[path_b[-1]])
+        lca_idx = anc_a[path_b[-1]]
+        cycle = path_a[:lca_idx + 1] + path_b[-2::-1]
+        return [self._members[node][0] for node in cycle]
+
+    def get_colors(self):
+        # type: () -> np.ndarray
+        """Returns the mask color (0 or 1) of every shape, in insertion order."""
+        return np.array([self._color[self._find(idx)] for idx in range(self.num_shapes)], dtype=np.int8)
+
+    def get_odd_cycles(self):
+        # type: () -> List[List[int]]
+        """Returns the shape indices forming each remaining odd cycle.
+
+        A polygon that violates same-color spacing with itself is reported as a cycle of
+        the offending shapes.
+        """
+        return list(self._cycles.values()) + list(self._self_conflicts.values())
+
+
+class MPTColorEngine(object):
+    """Mask color assignment for all multi-patterned metal layers of a layout.
+
+    Parameters
+    ----------
+    config : Optional[Dict[str, Any]]
+        the technology parameters dictionary.  Defaults to tech_params.yaml.
+    """
+
+    def __init__(self, config=None):
+        # type: (Optional[Dict[str, Any]]) -> None
+        self._config = _config if config is None else config
+        self._rules = DRCRuleTables(self._config)
+        self._layers = {lay_name: LayerColoring(lay_type, self._rules)
+                        for lay_name, lay_type in get_mpt_layers(self._config).items()}
+
+    @property
+    def layers(self):
+        # type: () -> List[str]
+        return sorted(self._layers.keys())
+
+    def get_layer(self, lay_name):
+        # type: (str) -> LayerColoring
+        return self._layers[lay_name]
+
+    def add_shapes(self, shapes):
+        # type: (ShapeSet) -> Dict[str, np.ndarray]
+        """Add the drawing shapes of all multi-patterned layers.  Returns new shape indices per layer."""
+        return {lay_name: coloring.add_shapes(shapes.get_rects((lay_name, 'drawing')))
+                for lay_name, coloring in self._layers.items()}
+
+    def get_odd_cycles(self):
+        # type: () -> Dict[str, List[List[int]]]
+        return {lay_name: coloring.get_odd_cycles() for lay_name, coloring in self._layers.items()
+                if coloring.get_odd_cycles()}
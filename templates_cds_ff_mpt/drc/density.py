@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, List, Tuple, Optional
+
+import numpy as np
+
+from .. import config as _config
+from .checker import DRCViolation
+from .merge import get_union_rects
+from .shapes import ShapeSet
+
+
+def _split_span(lo, hi, pixel):
+    # type: (np.ndarray, np.ndarray, int) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+    """Split [lo, hi) spans into first partial pixel, full pixels, and last partial pixel.
+
+    Returns a list of (start index, stop index, covered length per pixel) pieces.
+    """
+    i0 = lo // pixel
+    i1 = (hi - 1) // pixel
+    single = i0 == i1
+    first_len = np.where(single, hi - lo, (i0 + 1) * pixel - lo)
+    last_len = hi - i1 * pixel
+    return [
+        (i0, i0 + 1, first_len),
+        (i0 + 1, i1, np.where(single, 0, pixel)),
+        (i1, i1 + 1, np.where(single, 0, last_len)),
+    ]
+
+
+def _get_window_starts(num, win, step):
+    # type: (int, int, int) -> np.ndarray
+    """Returns window start indices stepped over num pixels, always including the window aligned to the end."""
+    ans = np.arange(0, num - win + 1, step)
+    if ans[-1] != num - win:
+        ans = np.append(ans, num - win)
+    return ans
+
+
+class DensityMap(object):
+    """Pixel coverage and integral image of one layer over a region.
+
+    Each rectangle is added as up to nine constant blocks (partial/full pixels along X
+    times partial/full pixels along Y) into a 2D difference array, so rasterization is
+    vectorized and exact for non-overlapping shapes.  Overlapping shapes are counted
+    twice within a pixel, and each pixel is only clipped at full coverage, so pass
+    disjoint rectangles, such as from get_union_rects(), for exact coverage.  The
+    integral image then gives the covered area of any pixel aligned window in constant
+    time.
+
+    Parameters
+    ----------
+    boxes : np.ndarray
+        (N, 4) [xl, yb, xr, yt] array, in resolution units.
+    bbox : Tuple[int, int, int, int]
+        the region, in resolution units.
+    pixel : int
+        the pixel size, in resolution units.
+    """
+
+    def __init__(self, boxes, bbox, pixel):
+        # type: (np.ndarray, Tuple[int, int, int, int], int) -> None
+        self._x0, self._y0 = bbox[0], bbox[1]
+        self._pixel = pixel
+        self._nx = max(1, -(-(bbox[2] - bbox[0]) // pixel))
+        self._ny = max(1, -(-(bbox[3] - bbox[1]) // pixel))
+
+        # corners of all constant blocks are accumulated into a 2D difference array.
+        ncol = self._nx + 1
+        flat_list = []
+        val_list = []
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        if boxes.shape[0] > 0:
+            xl = np.clip(boxes[:, 0] - self._x0, 0, self._nx * pixel)
+            xr = np.clip(boxes[:, 2] - self._x0, 0, self._nx * pixel)
+            yb = np.clip(boxes[:, 1] - self._y0, 0, self._ny * pixel)
+            yt = np.clip(boxes[:, 3] - self._y0, 0, self._ny * pixel)
+            keep = (xr > xl) & (yt > yb)
+            x_pieces = _split_span(xl[keep], xr[keep], pixel)
+            y_pieces = _split_span(yb[keep], yt[keep], pixel)
+            for xi0, xi1, wx in x_pieces:
+                for yi0, yi1, wy in y_pieces:
+                    val = (wx * wy).astype(float)
+                    ok = (xi1 > xi0) & (yi1 > yi0) & (val > 0)
+                    val = val[ok]
+                    xi0_ok, xi1_ok, yi0_ok, yi1_ok = xi0[ok], xi1[ok], yi0[ok], yi1[ok]
+                    flat_list.extend((yi0_ok * ncol + xi0_ok, yi0_ok * ncol + xi1_ok,
+                                      yi1_ok * ncol + xi0_ok, yi1_ok * ncol + xi1_ok))
+                    val_list.extend((val, -val, -val, val))
+        size = (self._ny + 1) * ncol
+        if flat_list:
+            cov = np.bincount(np.concatenate(flat_list), weights=np.concatenate(val_list), minlength=size)
+        else:
+            cov = np.zeros(size)
+        cov = cov.reshape(self._ny + 1, ncol)
+        cov = np.cumsum(np.cumsum(cov, axis=0), axis=1)[:-1, :-1]
+        self._cov = np.minimum(cov, pixel * pixel)
+
+        integ = np.zeros((self._ny + 1, self._nx + 1))
+        integ[1:, 1:] = np.cumsum(np.cumsum(self._cov, axis=0), axis=1)
+        self._integ = integ
+
+    @property
+    def shape(self):
+        # type: () -> Tuple[int, int]
+        """The (ny, nx) pixel grid shape."""
+        return self._ny, self._nx
+
+    @property
+    def pixel(self):
+        # type: () -> int
+        return self._pixel
+
+    @property
+    def coverage(self):
+        # type: () -> np.ndarray
+        """Covered area of each pixel, with shape (ny, nx)."""
+        return self._cov
+
+    def get_area(self, ix0, iy0, ix1, iy1):
+        # type: (np.ndarray, np.ndarray, np.ndarray, np.ndarray) -> np.ndarray
+        """Returns the covered area of windows given in pixel indices, [ix0, ix1) x [iy0, iy1)."""
+        integ = self._integ
+        return integ[iy1, ix1] - integ[iy0, ix1] - integ[iy1, ix0] + integ[iy0, ix0]
+
+    def get_window_density(self, window, step):
+        # type: (int, int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]
+        """Compute the density of all square windows stepped over the region.
+
+        Window size and step are rounded to whole pixels.  If the region is smaller
+        than the window, a single window covering the region is used along that axis.
+        A window aligned to the right and top edges of the region is always included, so
+        the last windows may be less than a step apart.
+
+        Returns
+        -------
+        xl : np.ndarray
+            window left edges, in resolution units.
+        yb : np.ndarray
+            window bottom edges, in resolution units.
+        density : np.ndarray
+            density of each window, with shape (len(yb), len(xl)).
+        """
+        pixel = self._pixel
+        nwin = max(1, int(round(window / pixel)))
+        nstep = max(1, int(round(step / pixel)))
+        wx = min(nwin, self._nx)
+        wy = min(nwin, self._ny)
+        ix0 = _get_window_starts(self._nx, wx, nstep)
+        iy0 = _get_window_starts(self._ny, wy, nstep)
+        gx0, gy0 = np.meshgrid(ix0, iy0)
+        area = self.get_area(gx0, gy0, gx0 + wx, gy0 + wy)
+        density = area / float(wx * wy * pixel * pixel)
+        return self._x0 + ix0 * pixel, self._y0 + iy0 * pixel, density
+
+
+class DensityRule(object):
+    """A windowed density rule.
+
+    Parameters
+    ----------
+    name : str
+        the rule name.
+    lay_name : str
+        the layer name; shapes of all purposes are included.
+    window : int
+        the window size, in resolution units.
+    step : int
+        the window step, in resolution units.
+    min_density : float
+        the minimum density.
+    max_density : float
+        the maximum density.
+    """
+
+    __slots__ = ('name', 'lay_name', 'window', 'step', 'min_density', 'max_density')
+
+    def __init__(self, name, lay_name, window, step, min_density=0.0, max_density=1.0):
+        # type: (str, str, int, int, float, float) -> None
+        self.name = name
+        self.lay_name = lay_name
+        self.window = window
+        self.step = step
+        self.min_density = min_density
+        self.max_density = max_density
+
+
+def get_density_rules(config=None, window=20000, step=10000):
+    # type: (Optional[Dict[str, Any]], int, int) -> List[DensityRule]
+    """Returns the density rules defined in the technology parameters.
+
+    The OD minimum density and PO maximum density are checked over windows of the given
+    size.  The M1 fill maximum spacing m1_sp_max is checked as a minimum nonzero density
+    over windows of that size.
+    """
+    if config is None:
+        config = _config
+    lay_table = config['mos_layer_table']
+    res_config = config['resistor']
+    od_lay = lay_table['OD'][0]
+    po_lay = lay_table['PO'][0]
+    m1_lay = config['layer_name'][1]
+    m1_sp_max = res_config['m1_sp_max']
+    return [
+        DensityRule('od_min_density', od_lay, window, step, min_density=config['mos']['od_min_density']),
+        DensityRule('po_max_density', po_lay, window, step, max_density=res_config['po_max_density']),
+        DensityRule('m1_sp_max', m1_lay, m1_sp_max, max(1, m1_sp_max // 4), min_density=1e-9),
+    ]
+
+
+class DensityChecker(object):
+    """Checks windowed density rules on a shape set.
+
+    Parameters
+    ----------
+    rules : Optional[List[DensityRule]]
+        the density rules.  Defaults to get_density_rules().
+    pixel : int
+        the raster pixel size, in resolution units.
+    """
+
+    def __init__(self, rules=None, pixel=100):
+        # type: (Optional[List[DensityRule]], int) -> None
+        self._rules = get_density_rules() if rules is None else rules
+        self._pixel = pixel
+
+    def get_map(self, shapes, lay_name, bbox):
+        # type: (ShapeSet, str, Tuple[int, int, int, int]) -> DensityMap
+        """Returns the density map of a layer.  Overlapping shapes are merged first, so area is counted once."""
+        return DensityMap(get_union_rects(shapes.get_layer_rects(lay_name)), bbox, self._pixel)
+
+    def check(self, shapes, bbox):
+        # type: (ShapeSet, Tuple[int, int, int, int]) -> List[DRCViolation]
+        """Returns a violation for each window that fails a density rule.
+
+        Parameters
+        ----------
+        shapes : ShapeSet
+            the shapes to check.
+        bbox : Tuple[int, int, int, int]
+            the cell boundary, in resolution units.
+        """
+        results = []
+        maps = {}  # type: Dict[str, DensityMap]
+        for rule in self._rules:
+            dmap = maps.get(rule.lay_name, None)
+            if dmap is None:
+                dmap = maps[rule.lay_name] = self.get_map(shapes, rule.lay_name, bbox)
+            xl, yb, density = dmap.get_window_density(rule.window, rule.step)
+            win_w = min(rule.window, bbox[2] - bbox[0])
+            win_h = min(rule.window, bbox[3] - bbox[1])
+            bad = (density < rule.min_density) | (density > rule.max_density)
+            req = rule.min_density if rule.min_density > 0 else rule.max_density
+            for iy, ix in zip(*np.nonzero(bad)):
+                x, y = int(xl[ix]), int(yb[iy])
+                results.append(DRCViolation(rule.name, (rule.lay_name, ''), (x, y, x + win_w, y + win_h),
+                                            float(density[iy, ix]), req))
+        return results
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, List, Tuple, Optional
+
+import numpy as np
+
+from .. import config as _config
+from .density import DensityMap
+from .shapes import ShapeSet
+
+
+def _get_free_regions(free):
+    # type: (np.ndarray) -> np.ndarray
+    """Decompose a free pixel mask into rectangles.
+
+    Free runs of each pixel row are found with a difference, and runs with the same X
+    span in consecutive rows are merged.  Work is proportional to the number of runs.
+
+    Returns
+    -------
+    regions : np.ndarray
+        (N, 4) [ix0, iy0, ix1, iy1] array of half-open pixel index ranges.
+    """
+    ny, nx = free.shape
+    pad = np.zeros((ny, nx + 2), dtype=np.int8)
+    pad[:, 1:-1] = free
+    delta = np.diff(pad, axis=1)
+    ys, xs0 = np.nonzero(delta == 1)
+    _, xs1 = np.nonzero(delta == -1)
+    if ys.size == 0:
+        return np.empty((0, 4), dtype=np.int64)
+
+    order = np.lexsort((ys, xs1, xs0))
+    ys, xs0, xs1 = ys[order], xs0[order], xs1[order]
+    start = np.ones(ys.size, dtype=bool)
+    start[1:] = (xs0[1:] != xs0[:-1]) | (xs1[1:] != xs1[:-1]) | (ys[1:] != ys[:-1] + 1)
+    first = np.flatnonzero(start)
+    last = np.append(first[1:], ys.size) - 1
+    return np.stack((xs0[first], ys[first], xs1[first], ys[last] + 1), axis=1).astype(np.int64)
+
+
+def _expand_array(arr):
+    # type: (Dict[str, Any]) -> np.ndarray
+    """Returns the (N, 4) boxes of a rectangle array dictionary."""
+    (xl, yb), (xr, yt) = arr['bbox']
+    dx = np.arange(arr['arr_nx']) * arr['arr_spx']
+    dy = np.arange(arr['arr_ny']) * arr['arr_spy']
+    gx, gy = np.meshgrid(dx, dy)
+    gx = gx.ravel()
+    gy = gy.ravel()
+    return np.stack((xl + gx, yb + gy, xr + gx, yt + gy), axis=1).astype(np.int64)
+
+
+class FillSpec(object):
+    """Dummy shape array parameters of one fill layer.
+
+    Parameters
+    ----------
+    layer : Tuple[str, str]
+        the fill layer/purpose pair.
+    w : int
+        the fill shape width.
+    w_min : int
+        the minimum fill shape width, used in narrow regions.
+    h : int
+        the fill shape height.
+    spx : int
+        the minimum horizontal space between fill shapes.
+    spy : int
+        the minimum vertical space between fill shapes.
+    sp_other : int
+        the minimum space from other shapes that block fill.
+    target : float
+        the window density to reach.
+    y_grid : int
+        fill shapes bottom edges are placed on y_grid * k + y_off.
+    y_off : int
+        the Y grid offset.
+    """
+
+    __slots__ = ('layer', 'w', 'w_min', 'h', 'spx', 'spy', 'sp_other', 'target', 'y_grid', 'y_off')
+
+    def __init__(self, layer, w, w_min, h, spx, spy, sp_other, target, y_grid=1, y_off=0):
+        # type: (Tuple[str, str], int, int, int, int, int, int, float, int, int) -> None
+        self.layer = layer
+        self.w = w
+        self.w_min = w_min
+        self.h = h
+        self.spx = spx
+        self.spy = spy
+        self.sp_other = sp_other
+        self.target = target
+        self.y_grid = y_grid
+        self.y_off = y_off
+
+    @property
+    def max_density(self):
+        # type: () -> float
+        """The density of the tightest fill array."""
+        pitch_y = -(-(self.h + self.spy) // self.y_grid) * self.y_grid
+        return self.w * self.h / float((self.w + self.spx) * pitch_y)
+
+
+def get_od_fill_spec(config=None, nfin=None, target=None):
+    # type: (Optional[Dict[str, Any]], Optional[int], Optional[float]) -> FillSpec
+    """Returns the dummy OD fill parameters from the technology parameters.
+
+    Parameters
+    ----------
+    config : Optional[Dict[str, Any]]
+        the technology parameters dictionary.  Defaults to tech_params.yaml.
+    nfin : Optional[int]
+        dummy OD height in number of fins.  Defaults to the largest height allowed by
+        od_fill_h and the resistor od_dim_max.
+    target : Optional[float]
+        the OD density target.  Defaults to od_min_density.
+    """
+    if config is None:
+        config = _config
+    mos_config = config['mos']
+    res_config = config['resistor']
+    fin_h = mos_config['fin_h']
+    fin_p = mos_config['mos_pitch']
+    c0, c1, c2 = mos_config['od_fin_exty_constants']
+    exty = c0 + c1 * fin_h + c2 * fin_p
+    w_min, h_min = res_config['od_dim_min']
+    w_max, h_max = res_config['od_dim_max']
+    if mos_config['od_fill_w_max'] is not None:
+        w_max = min(w_max, mos_config['od_fill_w_max'])
+
+    nfin_min, nfin_max = mos_config['od_fill_h']
+    if nfin is None:
+        nfin = nfin_max
+        while nfin > nfin_min and (nfin - 1) * fin_p + fin_h + 2 * exty > h_max:
+            nfin -= 1
+    od_h = max((nfin - 1) * fin_p + fin_h + 2 * exty, h_min)
+    if target is None:
+        target = max(mos_config['od_min_density'], res_config['od_min_density'])
+    return FillSpec(config['mos_layer_table']['OD_dummy'], max(w_max, w_min), w_min, od_h,
+                    max(res_config['od_sp'], mos_config['od_spx']),
+                    max(res_config['od_sp'], mos_config['od_spy']),
+                    max(res_config['od_sp'], res_config['po_od_sp']), target,
+                    y_grid=fin_p, y_off=(fin_p - fin_h) // 2 - exty)
+
+
+def get_po_fill_spec(config=None, w=None, h=None, target=None):
+    # type: (Optional[Dict[str, Any]], Optional[int], Optional[int], Optional[float]) -> FillSpec
+    """Returns the dummy PO fill parameters from the technology parameters.
+
+    Dummy PO defaults to dpo_dim_min sized shapes, and its density target is capped
+    below the resistor po_max_density.
+    """
+    if config is None:
+        config = _config
+    res_config = config['resistor']
+    w_min, h_min = res_config['dpo_dim_min']
+    w = w_min if w is None else max(w, w_min)
+    h = h_min if h is None else max(h, h_min)
+    max_density = res_config['po_max_density']
+    target = max_density / 2 if target is None else min(target, max_density)
+    po_sp = res_config['po_sp']
+    return FillSpec(config['mos_layer_table']['PO_dummy'], w, w_min, h, po_sp, po_sp,
+                    res_config['po_od_sp'], target)
+
+
+class FillGenerator(object):
+    """Places dummy OD and PO arrays to reach window density targets.
+
+    The area blocked by existing shapes is rasterized, free space is decomposed into
+    rectangular regions, and only regions under windows below the density target are
+    filled.  Each region gets one fill array whose pitch is stretched so the window
+    reaches the target with as few shapes as possible.  Work is proportional to the
+    number of free regions, not to the region area.
+
+    Parameters
+    ----------
+    spec_list : Optional[List[FillSpec]]
+        the fill layers, filled in order.  Defaults to dummy OD only.
+    blocked_layers : Optional[List[str]]
+        layers whose shapes block fill.  Defaults to the OD and PO layers.
+    window : int
+        the density window size, in resolution units.
+    step : int
+        the density window step, in resolution units.
+    pixel : int
+        the raster pixel size, in resolution units.
+    margin : float
+        fill aims this much above the density target, to absorb window quantization.
+    max_iter : int
+        maximum number of fill passes per layer.
+    config : Optional[Dict[str, Any]]
+        the technology parameters dictionary.  Defaults to tech_params.yaml.
+    """
+
+    def __init__(self, spec_list=None, blocked_layers=None, window=20000, step=10000, pixel=100,
+                 margin=0.02, max_iter=4, config=None):
+        # type: (Optional[List[FillSpec]], Optional[List[str]], int, int, int, float, int, Optional[Dict[str, Any]]) -> None
+        if config is None:
+            config = _config
+        if spec_list is None:
+            spec_list = [get_od_fill_spec(config)]
+        if blocked_layers is None:
+            lay_table = config['mos_layer_table']
+            blocked_layers = [lay_table['OD'][0], lay_table['PO'][0]]
+        self._spec_list = spec_list
+        self._blocked_layers = blocked_layers
+        self._window = window
+        self._step = step
+        self._pixel = pixel
+        self._margin = margin
+        self._max_iter = max_iter
+
+    def get_free_regions(self, shapes, bbox, spec):
+        # type: (ShapeSet, Tuple[int, int, int, int], FillSpec) -> np.ndarray
+        """Returns the (N, 4) free regions of the given fill layer, in resolution units."""
+        pixel = self._pixel
+        blk_list = [shapes.get_layer_rects(lay_name) for lay_name in self._blocked_layers]
+        blk = np.concatenate(blk_list, axis=0)
+        sp = spec.sp_other
+        blk = blk + np.array([-sp, -sp, sp, sp], dtype=np.int64)
+        dmap = DensityMap(blk, bbox, pixel)
+        free = dmap.coverage <= 0
+        # pixels sticking out of bbox are never free.
+        ny, nx = dmap.shape
+        if bbox[2] - bbox[0] < nx * pixel:
+            free[:, -1] = False
+        if bbox[3] - bbox[1] < ny * pixel:
+            free[-1, :] = False
+        regions = _get_free_regions(free) * pixel
+        regions[:, 0::2] += bbox[0]
+        regions[:, 1::2] += bbox[1]
+        return regions
+
+    @staticmethod
+    def _get_usable_regions(spec, regions):
+        # type: (FillSpec, np.ndarray) -> np.ndarray
+        """Shrink free regions to the area fill shapes can occupy, dropping regions that are too small.
+
+        Half the fill spacing is kept on each side, so arrays in adjacent regions are
+        legal, and the bottom edge is snapped to the fill Y grid.
+        """
+        hsp = np.array([-(-spec.spx // 2), -(-spec.spy // 2), -(-spec.spx // 2), -(-spec.spy // 2)])
+        ans = regions + hsp * np.array([1, 1, -1, -1])
+        grid = spec.y_grid
+        ans[:, 1] = -(-(ans[:, 1] - spec.y_off) // grid) * grid + spec.y_off
+        keep = (ans[:, 2] - ans[:, 0] >= spec.w_min) & (ans[:, 3] - ans[:, 1] >= spec.h)
+        return ans[keep]
+
+    def _get_region_targets(self, boxes, bbox, spec, regions):
+        # type: (np.ndarray, Tuple[int, int, int, int], FillSpec, np.ndarray) -> np.ndarray
+        """Returns the extra fill density needed in each region, 0 if none is needed.
+
+        For each window below target, the deficit area is spread over the usable area of
+        the window, and a region takes the largest requirement of the windows overlapping it.
+        """
+        pixel = self._pixel
+        cur_map = DensityMap(boxes, bbox, pixel)
+        free_map = DensityMap(regions, bbox, pixel)
+        xl, yb, density = cur_map.get_window_density(self._window, self._step)
+        _, _, free_density = free_map.get_window_density(self._window, self._step)
+        target = spec.target + self._margin
+        with np.errstate(divide='ignore', invalid='ignore'):
+            need = np.where((free_density > 0) & (density < spec.target),
+                            (target - density) / free_density, 0)
+
+        win_w = min(self._window, bbox[2] - bbox[0])
+        win_h = min(self._window, bbox[3] - bbox[1])
+        # window index ranges overlapping each region.
+        ix0 = np.searchsorted(xl + win_w, regions[:, 0], side='right')
+        ix1 = np.searchsorted(xl, regions[:, 2], side='left')
+        iy0 = np.searchsorted(yb + win_h, regions[:, 1], side='right')
+        iy1 = np.searchsorted(yb, regions[:, 3], side='left')
+        ans = np.zeros(regions.shape[0])
+        for idx in range(regions.shape[0]):
+            blk = need[iy0[idx]:iy1[idx], ix0[idx]:ix1[idx]]
+            if blk.size > 0:
+                ans[idx] = blk.max()
+        return ans
+
+    @staticmethod
+    def _get_array(spec, region, density):
+        # type: (FillSpec, np.ndarray, float) -> Dict[str, Any]
+        """Returns the smallest fill array that covers the given fraction of a usable region.
+
+        The array is spread over the whole region, with the vertical pitch kept on the
+        fill Y grid.
+        """
+        xl, yb, xr, yt = (int(v) for v in region)
+        grid = spec.y_grid
+        w, h = min(spec.w, xr - xl), spec.h
+        pitch_x = w + spec.spx
+        pitch_y = -(-(h + spec.spy) // grid) * grid
+        nx_max = (xr - xl - w) // pitch_x + 1
+        ny_max = (yt - yb - h) // pitch_y + 1
+        num = int(np.ceil(density * (xr - xl) * (yt - yb) / (w * h)))
+        ny = max(1, min(ny_max, num))
+        nx = max(1, min(nx_max, -(-num // ny)))
+        if nx > 1:
+            pitch_x = (xr - xl - w) // (nx - 1)
+            x0 = xl
+        else:
+            x0 = xl + (xr - xl - w) // 2
+        if ny > 1:
+            pitch_y = (yt - yb - h) // (ny - 1) // grid * grid
+        return dict(
+            layer=spec.layer,
+            bbox=[[x0, yb], [x0 + w, yb + h]],
+            arr_nx=nx,
+            arr_ny=ny,
+            arr_spx=pitch_x if nx > 1 else 0,
+            arr_spy=pitch_y if ny > 1 else 0,
+        )
+
+    def fill(self, shapes, bbox):
+        # type: (ShapeSet, Tuple[int, int, int, int]) -> List[Dict[str, Any]]
+        """Generate fill arrays for the given cell.
+
+        Parameters
+        ----------
+        shapes : ShapeSet
+            the cell shapes.  Generated fill is added to it, so later fill layers avoid it.
+        bbox : Tuple[int, int, int, int]
+            the cell boundary, in resolution units.
+
+        Returns
+        -------
+        rect_list : List[Dict[str, Any]]
+            the fill rectangle arrays, in layout content format with resolution units.
+        """
+        rect_list = []
+        for spec in self._spec_list:
+            regions = self._get_usable_regions(spec, self.get_free_regions(shapes, bbox, spec))
+            if regions.shape[0] == 0:
+                continue
+            # arrays fall short of the requested density by quantization, so regions under
+            # windows still below target are refilled denser.
+            cur_boxes = shapes.get_layer_rects(spec.layer[0])
+            density = np.zeros(regions.shape[0])
+            arr_table = {}  # type: Dict[int, Dict[str, Any]]
+            new_boxes = []
+            for _ in range(self._max_iter):
+                extra = self._get_region_targets(np.concatenate([cur_boxes] + new_boxes, axis=0),
+                                                 bbox, spec, regions)
+                if not np.any(extra > 0):
+                    break
+                for idx in np.flatnonzero(extra > 0):
+                    density[idx] = min(1.0, density[idx] + extra[idx])
+                    arr_table[idx] = self._get_array(spec, regions[idx], density[idx])
+                new_boxes = [_expand_array(arr) for arr in arr_table.values()]
+            rect_list.extend(arr_table[idx] for idx in sorted(arr_table.keys()))
+            if new_boxes:
+                shapes.add_rects(spec.layer, np.concatenate(new_boxes, axis=0))
+        return rect_list
+
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+from typing import Tuple, Optional
+
+import numpy as np
+
+
+def get_gaps(boxes, idx0, idx1):
+    # type: (np.ndarray, np.ndarray, np.ndarray) -> Tuple[np.ndarray, np.ndarray]
+    """Returns the X and Y gaps between the given box pairs.  Negative gaps are overlaps."""
+    b0 = boxes[idx0]
+    b1 = boxes[idx1]
+    gap_x = np.maximum(b1[:, 0] - b0[:, 2], b0[:, 0] - b1[:, 2])
+    gap_y = np.maximum(b1[:, 1] - b0[:, 3], b0[:, 1] - b1[:, 3])
+    return gap_x, gap_y
+
+
+def find_close_pairs(boxes, dist, cell_size=None, max_entries=50000000):
+    # type: (np.ndarray, int, Optional[int], int) -> Tuple[np.ndarray, np.ndarray]
+    """Find all pairs of boxes whose X and Y gaps are both less than dist.
+
+    Boxes are binned into a uniform grid, with each box extended by dist on its upper
+    sides, and candidate pairs are only formed within grid cells.  A pair sharing more
+    than one cell is only reported by the cell containing the lower left corner of the
+    overlap of the extended boxes, so no deduplication pass is needed.  Work is
+    proportional to the number of shapes plus the number of nearby pairs.
+
+    Parameters
+    ----------
+    boxes : np.ndarray
+        (N, 4) integer [xl, yb, xr, yt] array.
+    dist : int
+        the interaction distance.  Must be positive.
+    cell_size : Optional[int]
+        the grid cell size.  Defaults to a value derived from the median box size.
+    max_entries : int
+        the grid cell size is doubled until the number of (cell, box) entries is below
+        this number.
+
+    Returns
+    -------
+    idx0 : np.ndarray
+        first box index of each pair.
+    idx1 : np.ndarray
+        second box index of each pair, always greater than idx0.
+    """
+    num = boxes.shape[0]
+    empty = np.empty(0, dtype=np.int64)
+    if num < 2:
+        return empty, empty
+    boxes = np.asarray(boxes, dtype=np.int64)
+    ext = boxes.copy()
+    ext[:, 2:] += dist
+
+    if cell_size is None:
+        med_size = np.median(np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]))
+        cell_size = int(max(2 * dist, 2 * med_size, 1))
+    while True:
+        cxl = ext[:, 0] // cell_size
+        cyb = ext[:, 1] // cell_size
+        # extended boxes are half-open, so the last covered cell uses (xr - 1).
+        ncx = (ext[:, 2] - 1) // cell_size - cxl + 1
+        ncy = (ext[:, 3] - 1) // cell_size - cyb + 1
+        counts = ncx * ncy
+        if counts.sum() <= max_entries:
+            break
+        cell_size *= 2
+
+    # expand each box into its grid cell entries.
+    box_idx = np.repeat(np.arange(num), counts)
+    local = np.arange(box_idx.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    cx = cxl[box_idx] + local % ncx[box_idx]
+    cy = cyb[box_idx] + local // ncx[box_idx]
+    order = np.lexsort((box_idx, cy, cx))
+    box_idx = box_idx[order]
+    cx = cx[order]
+    cy = cy[order]
+
+    idx0_list = []
+    idx1_list = []
+    # compare each entry with the entries following it in the same cell.
+    alive = np.arange(box_idx.size - 1)
+    offset = 1
+    while alive.size > 0:
+        nxt = alive + offset
+        valid = nxt < box_idx.size
+        alive = alive[valid]
+        nxt = nxt[valid]
+        same = (cx[nxt] == cx[alive]) & (cy[nxt] == cy[alive])
+        alive = alive[same]
+        nxt = nxt[same]
+        if alive.size == 0:
+            break
+        i0 = box_idx[alive]
+        i1 = box_idx[nxt]
+        # overlap of the extended boxes and its lower left corner cell.
+        ovl_xl = np.maximum(ext[i0, 0], ext[i1, 0])
+        ovl_yb = np.maximum(ext[i0, 1], ext[i1, 1])
+        hit = ((ovl_xl < np.minimum(ext[i0, 2], ext[i1, 2])) &
+               (ovl_yb < np.minimum(ext[i0, 3], ext[i1, 3])) &
+               (ovl_xl // cell_size == cx[alive]) & (ovl_yb // cell_size == cy[alive]))
+        idx0_list.append(i0[hit])
+        idx1_list.append(i1[hit])
+        offset += 1
+
+    if not idx0_list:
+        return empty, empty
+    return np.concatenate(idx0_list), np.concatenate(idx1_list)
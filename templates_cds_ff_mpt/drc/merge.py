@@ -0,0 +1,653 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, List, Tuple, Optional, Set, Iterable
+
+import numpy as np
+
+from .. import config as _config
+from .index import find_close_pairs
+from .shapes import _get_lay_purp, _transform_boxes
+
+Interval = Tuple[int, int]
+Point = Tuple[int, int]
+LayPurp = Tuple[str, str]
+BoxTable = Dict[LayPurp, np.ndarray]
+Content = Tuple[Any, ...]
+Box = Tuple[int, int, int, int]
+Merged = Tuple[List[Box], List[List[Point]]]
+
+# GDSII XY records hold at most 8191 points, including the repeated first point.
+MAX_POLYGON_POINTS = 8190
+
+
+def get_merge_layers(config=None):
+    # type: (Optional[Dict[str, Any]]) -> Set[Tuple[str, str]]
+    """Returns the implant and threshold layer/purpose pairs of transistors and resistors."""
+    if config is None:
+        config = _config
+    mos_config = config['mos']
+    lay_set = set()
+    for imp_table in mos_config['imp_layers'].values():
+        lay_set.update(imp_table.keys())
+    for thres_table in mos_config['thres_layers'].values():
+        for lay_table in thres_table.values():
+            lay_set.update(lay_table.keys())
+    for imp_table in config['resistor']['imp_layers'].values():
+        lay_set.update(imp_table.keys())
+    return lay_set
+
+
+def _merge_intervals(ivals):
+    # type: (Iterable[Interval]) -> List[Interval]
+    """Returns the sorted union of the given intervals.  Touching intervals are merged."""
+    ans = []  # type: List[List[int]]
+    for a, b in sorted(ivals):
+        if ans and a <= ans[-1][1]:
+            if b > ans[-1][1]:
+                ans[-1][1] = b
+        else:
+            ans.append([a, b])
+    return [(a, b) for a, b in ans]
+
+
+def _diff_intervals(ivals1, ivals2):
+    # type: (List[Interval], List[Interval]) -> List[Interval]
+    """Returns the parts of sorted disjoint intervals ivals1 not covered by ivals2."""
+    ans = []
+    idx2 = 0
+    num2 = len(ivals2)
+    for a, b in ivals1:
+        while idx2 < num2 and ivals2[idx2][1] <= a:
+            idx2 += 1
+        cur = a
+        jdx = idx2
+        while jdx < num2 and ivals2[jdx][0] < b:
+            if ivals2[jdx][0] > cur:
+                ans.append((cur, ivals2[jdx][0]))
+            cur = max(cur, ivals2[jdx][1])
+            jdx += 1
+        if cur < b:
+            ans.append((cur, b))
+    return ans
+
+
+def _get_slabs(boxes):
+    # type: (np.ndarray) -> Tuple[List[int], List[List[Interval]]]
+    """Sweep a horizontal scanline over the boxes and return the union as horizontal slabs.
+
+    Returns
+    -------
+    ys : List[int]
+        the slab boundaries.  Adjacent slabs always differ.
+    slabs : List[List[Interval]]
+        the union X intervals of each slab [ys[k], ys[k + 1]).
+    """
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    boxes = boxes[(boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])]
+    if boxes.shape[0] == 0:
+        return [], []
+    ys_all = np.unique(boxes[:, 1::2]).tolist()
+    box_list = boxes.tolist()
+    add_order = np.argsort(boxes[:, 1], kind='stable').tolist()
+    del_order = np.argsort(boxes[:, 3], kind='stable').tolist()
+    num = len(box_list)
+
+    ys = []  # type: List[int]
+    slabs = []  # type: List[List[Interval]]
+    active = {}  # type: Dict[int, Interval]
+    add_idx = del_idx = 0
+    for y in ys_all[:-1]:
+        while del_idx < num and box_list[del_order[del_idx]][3] <= y:
+            active.pop(del_order[del_idx], None)
+            del_idx += 1
+        while add_idx < num and box_list[add_order[add_idx]][1] <= y:
+            idx = add_order[add_idx]
+            if box_list[idx][3] > y:
+                active[idx] = (box_list[idx][0], box_list[idx][2])
+            add_idx += 1
+        ivals = _merge_intervals(active.values())
+        if not slabs or ivals != slabs[-1]:
+            ys.append(y)
+            slabs.append(ivals)
+    ys.append(ys_all[-1])
+    return ys, slabs
+
+
+def _get_components(slabs):
+    # type: (List[List[Interval]]) -> List[Dict[int, List[Interval]]]
+    """Group slab intervals into connected components.
+
+    Intervals of adjacent slabs are connected if they overlap with positive length, so
+    shapes touching only at a corner are separate components.
+    """
+    offsets = np.cumsum([0] + [len(ivals) for ivals in slabs]).tolist()
+    parent = list(range(offsets[-1]))
+
+    def find(idx):
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    for k in range(len(slabs) - 1):
+        lower, upper = slabs[k], slabs[k + 1]
+        idx0 = idx1 = 0
+        while idx0 < len(lower) and idx1 < len(upper):
+            (a0, b0), (a1, b1) = lower[idx0], upper[idx1]
+            if min(b0, b1) > max(a0, a1):
+                r0, r1 = find(offsets[k] + idx0), find(offsets[k + 1] + idx1)
+                if r0 != r1:
+                    parent[r1] = r0
+            if b0 < b1:
+                idx0 += 1
+            else:
+                idx1 += 1
+
+    comp_table = {}  # type: Dict[int, Dict[int, List[Interval]]]
+    for k, ivals in enumerate(slabs):
+        for idx, ival in enumerate(ivals):
+            comp = comp_table.setdefault(find(offsets[k] + idx), {})
+            comp.setdefault(k, []).append(ival)
+    return list(comp_table.values())
+
+
+def _get_loops(comp, ys):
+    # type: (Dict[int, List[Interval]], List[int]) -> List[List[Point]]
+    """Trace the boundary loops of a component, counterclockwise around the interior.
+
+    At vertices where two loops touch, the left turn is taken, so touching corners are
+    never crossed.
+    """
+    out_table = {}  # type: Dict[Point, List[Point]]
+    for k, ivals in comp.items():
+        y0, y1 = ys[k], ys[k + 1]
+        for a, b in ivals:
+            out_table.setdefault((a, y1), []).append((a, y0))
+            out_table.setdefault((b, y0), []).append((b, y1))
+    bnd_set = set(comp.keys())
+    bnd_set.update(k + 1 for k in comp.keys())
+    for k in bnd_set:
+        below = comp.get(k - 1, [])
+        above = comp.get(k, [])
+        y = ys[k]
+        for a, b in _diff_intervals(above, below):
+            out_table.setdefault((a, y), []).append((b, y))
+        for a, b in _diff_intervals(below, above):
+            out_table.setdefault((b, y), []).append((a, y))
+
+    loops = []
+    while out_table:
+        # start from a vertex with a single outgoing edge when possible.
+        start = next((p for p, q_list in out_table.items() if len(q_list) == 1), next(iter(out_table)))
+        pts = [start]
+        prev = start
+        while True:
+            q_list = out_table[prev]
+            if len(q_list) == 1 or len(pts) == 1:
+                nxt = q_list.pop()
+            else:
+                dx, dy = prev[0] - pts[-2][0], prev[1] - pts[-2][1]
+                # pick the left-most turn using the cross product with the incoming direction.
+                sel = max(range(len(q_list)), key=lambda i: (dx * (q_list[i][1] - prev[1]) -
+                                                             dy * (q_list[i][0] - prev[0])))
+                nxt = q_list.pop(sel)
+            if not q_list:
+                del out_table[prev]
+            if nxt == start:
+                break
+            pts.append(nxt)
+            prev = nxt
+        loops.append(_remove_collinear(pts))
+    return loops
+
+
+def _remove_collinear(pts):
+    # type: (List[Point]) -> List[Point]
+    num = len(pts)
+    ans = []
+    for idx in range(num):
+        p0, p1, p2 = pts[idx - 1], pts[idx], pts[(idx + 1) % num]
+        if not ((p0[0] == p1[0] == p2[0]) or (p0[1] == p1[1] == p2[1])):
+            ans.append(p1)
+    return ans
+
+
+def _get_slab_rects(comp, ys):
+    # type: (Dict[int, List[Interval]], List[int]) -> List[Tuple[int, int, int, int]]
+    """Returns rectangles covering a component, merging identical intervals of adjacent slabs."""
+    ans = []
+    open_table = {}  # type: Dict[Interval, int]
+    last_k = None
+    for k in sorted(comp.keys()):
+        cur = set(comp[k])
+        for ival in list(open_table.keys()):
+            if last_k != k - 1 or ival not in cur:
+                ans.append((ival[0], open_table.pop(ival), ival[1], ys[last_k + 1]))
+        for ival in comp[k]:
+            if ival not in open_table:
+                open_table[ival] = ys[k]
+        last_k = k
+    for ival, yb in open_table.items():
+        ans.append((ival[0], yb, ival[1], ys[last_k + 1]))
+    return ans
+
+
+def get_union_rects(boxes):
+    # type: (np.ndarray) -> np.ndarray
+    """Returns disjoint rectangles covering the union of the given boxes, as an (N, 4) array.
+
+    Each X interval of each scanline slab becomes one rectangle, so no area is covered twice.
+    """
+    ys, slabs = _get_slabs(boxes)
+    rect_list = [(xl, ys[idx], xr, ys[idx + 1]) for idx, ivals in enumerate(slabs) for xl, xr in ivals]
+    return np.array(rect_list, dtype=np.int64).reshape(-1, 4)
+
+
+def merge_rects(boxes, max_points=MAX_POLYGON_POINTS):
+    # type: (np.ndarray, int) -> Tuple[List[Tuple[int, int, int, int]], List[List[Point]]]
+    """Merge touching and overlapping rectangles into rectilinear polygons.
+
+    A horizontal scanline computes the union as slabs of X intervals, slab intervals are
+    grouped into connected components, and the boundary of each component is traced.
+    Components that are rectangles are returned as rectangles.  Components with holes
+    cannot be drawn as a single simple polygon, and components with more than max_points
+    vertices cannot be written to GDS, so both are returned as rectangles merged across
+    slabs.
+
+    Parameters
+    ----------
+    boxes : np.ndarray
+        (N, 4) [xl, yb, xr, yt] array.
+    max_points : int
+        the maximum number of polygon vertices.
+
+    Returns
+    -------
+    rect_list : List[Tuple[int, int, int, int]]
+        the merged rectangles.
+    poly_list : List[List[Point]]
+        the merged polygons, as counterclockwise point lists.
+    """
+    ys, slabs = _get_slabs(boxes)
+    rect_list = []
+    poly_list = []
+    for comp in _get_components(slabs):
+        loops = _get_loops(comp, ys)
+        if len(loops) != 1 or len(loops[0]) > max_points:
+            rect_list.extend(_get_slab_rects(comp, ys))
+        elif len(loops[0]) == 4:
+            xs = [p[0] for p in loops[0]]
+            ys_loop = [p[1] for p in loops[0]]
+            rect_list.append((min(xs), min(ys_loop), max(xs), max(ys_loop)))
+        else:
+            poly_list.append(loops[0])
+    return rect_list, poly_list
+
+
+def _get_winding_slabs(poly_list, ys):
+    # type: (List[List[Point]], List[int]) -> Optional[List[List[Interval]]]
+    """Returns the covered X intervals of each slab [ys[k], ys[k + 1]) of the given polygons.
+
+    Returns None if any point is covered with a winding number other than 0 or 1, which
+    means the polygons overlap or are not counterclockwise.
+    """
+    edge_list = []  # type: List[Tuple[int, int, int, int]]
+    for pts in poly_list:
+        num = len(pts)
+        for idx in range(num):
+            (x0, y0), (x1, y1) = pts[idx], pts[(idx + 1) % num]
+            if x0 == x1 and y0 != y1:
+                # downward edges are left boundaries of counterclockwise polygons.
+                edge_list.append((x0, min(y0, y1), max(y0, y1), 1 if y1 < y0 else -1))
+    edge_list.sort(key=lambda e: e[1])
+    num = len(edge_list)
+    active = {}  # type: Dict[int, Tuple[int, int, int, int]]
+    add_idx = 0
+    ans = []
+    for k in range(len(ys) - 1):
+        y0 = ys[k]
+        while add_idx < num and edge_list[add_idx][1] <= y0:
+            active[add_idx] = edge_list[add_idx]
+            add_idx += 1
+        for idx in [idx for idx, edge in active.items() if edge[2] <= y0]:
+            del active[idx]
+        ivals = []
+        wind = start = 0
+        for x, _, _, sgn in sorted(active.values()):
+            if wind == 0 and sgn > 0:
+                start = x
+            wind += sgn
+            if wind not in (0, 1):
+                return None
+            if wind == 0 and sgn < 0:
+                ivals.append((start, x))
+        ans.append(_merge_intervals(ivals))
+    return ans
+
+
+def check_merge(boxes, rect_list, poly_list):
+    # type: (np.ndarray, List[Tuple[int, int, int, int]], List[List[Point]]) -> bool
+    """Returns True if the merged shapes cover exactly the same area as the original boxes.
+
+    Both are swept with a horizontal scanline over the union of their Y coordinates.  The
+    merged shapes must also not overlap each other.
+    """
+    rect_polys = [[(xl, yb), (xr, yb), (xr, yt), (xl, yt)] for xl, yb, xr, yt in rect_list]
+    all_polys = rect_polys + list(poly_list)
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    ys_set = set(np.unique(boxes[:, 1::2]).tolist())
+    for pts in all_polys:
+        ys_set.update(p[1] for p in pts)
+    ys = sorted(ys_set)
+
+    poly_slabs = _get_winding_slabs(all_polys, ys)
+    if poly_slabs is None:
+        return False
+    box_ys, box_slabs = _get_slabs(boxes)
+    box_idx = 0
+    for k in range(len(ys) - 1):
+        while box_idx < len(box_ys) - 1 and box_ys[box_idx + 1] <= ys[k]:
+            box_idx += 1
+        if box_ys and box_ys[box_idx] <= ys[k] < box_ys[-1]:
+            expect = box_slabs[box_idx]
+        else:
+            expect = []
+        if poly_slabs[k] != expect:
+            return False
+    return True
+
+
+def polygon_to_rects(points):
+    # type: (List[Point]) -> List[Tuple[int, int, int, int]]
+    """Decompose a simple rectilinear polygon into rectangles.
+
+    Raises
+    ------
+    ValueError
+        if the polygon is not rectilinear or not simple.
+    """
+    num = len(points)
+    for idx in range(num):
+        (x0, y0), (x1, y1) = points[idx], points[(idx + 1) % num]
+        if x0 != x1 and y0 != y1:
+            raise ValueError('Polygon is not rectilinear.')
+    area2 = sum(points[idx - 1][0] * points[idx][1] - points[idx][0] * points[idx - 1][1]
+                for idx in range(num))
+    if area2 < 0:
+        points = points[::-1]
+    ys = sorted({p[1] for p in points})
+    slabs = _get_winding_slabs([points], ys)
+    if slabs is None:
+        raise ValueError('Polygon is not simple.')
+    return _get_slab_rects({k: ivals for k, ivals in enumerate(slabs) if ivals}, ys)
+
+
+def _get_content_boxes(rect_list, lay_set, to_unit):
+    # type: (List[Dict[str, Any]], Set[LayPurp], Any) -> Tuple[List[Dict[str, Any]], Dict[LayPurp, list]]
+    """Split rectangles into the ones to keep and merge layer boxes in resolution units."""
+    keep_list = []
+    box_table = {}  # type: Dict[LayPurp, List[List[int]]]
+    for rect in rect_list:
+        lay_purp = _get_lay_purp(rect['layer'])
+        if lay_purp not in lay_set:
+            keep_list.append(rect)
+            continue
+        (xl, yb), (xr, yt) = rect['bbox']
+        xl, yb, xr, yt = to_unit(xl), to_unit(yb), to_unit(xr), to_unit(yt)
+        spx, spy = to_unit(rect.get('arr_spx', 0)), to_unit(rect.get('arr_spy', 0))
+        box_list = box_table.setdefault(lay_purp, [])
+        for xidx in range(rect.get('arr_nx', 1)):
+            for yidx in range(rect.get('arr_ny', 1)):
+                dx, dy = xidx * spx, yidx * spy
+                box_list.append([xl + dx, yb + dy, xr + dx, yt + dy])
+    return keep_list, box_table
+
+
+def _merge_checked(cell_name, lay_purp, boxes, check):
+    # type: (str, LayPurp, np.ndarray, bool) -> Merged
+    """Merge boxes with merge_rects(), verifying the result with check_merge() if check is True."""
+    rect_list, poly_list = merge_rects(boxes)
+    if check and not check_merge(boxes, rect_list, poly_list):
+        raise ValueError('Merged %s shapes of cell %s do not cover the original rectangles.' %
+                         (lay_purp, cell_name))
+    return rect_list, poly_list
+
+
+def merge_content(content, layers=None, config=None, check=True):
+    # type: (Tuple[Any, ...], Optional[Iterable[Tuple[str, str]]], Optional[Dict[str, Any]]) -> Tuple[Any, ...]
+    """Merge rectangles of the given layers in a layout content tuple.
+
+    Rectangles of each merge layer, including rectangle arrays, are replaced by the merged
+    rectangles and polygons.  Polygons are added to the polygon list, the 9th entry of
+    the content tuple, which is created if needed.
+
+    Parameters
+    ----------
+    content : Tuple[Any, ...]
+        the layout content tuple, (cell_name, inst_list, rect_list, via_list, pin_list, ...).
+    layers : Optional[Iterable[Tuple[str, str]]]
+        layer/purpose pairs to merge.  Defaults to get_merge_layers().
+    config : Optional[Dict[str, Any]]
+        the technology parameters dictionary.  Defaults to tech_params.yaml.
+    check : bool
+        True to verify the merged shapes with check_merge().
+
+    Returns
+    -------
+    content : Tuple[Any, ...]
+        the new content tuple.
+
+    Raises
+    ------
+    ValueError
+        if check is True and the merged shapes differ from the original rectangles.
+    """
+    if config is None:
+        config = _config
+    lay_set = get_merge_layers(config) if layers is None else {_get_lay_purp(lay) for lay in layers}
+    res = config['resolution']
+
+    def to_unit(val):
+        return int(round(val / res))
+
+    rect_list, box_table = _get_content_boxes(content[2], lay_set, to_unit)
+    extra = list(content[5:]) + [[] for _ in range(9 - len(content))]
+    poly_list = list(extra[3])
+    for lay_purp in sorted(box_table.keys()):
+        boxes = np.asarray(box_table[lay_purp], dtype=np.int64).reshape(-1, 4)
+        rect_ans, poly_ans = _to_layout(lay_purp, *_merge_checked(content[0], lay_purp, boxes, check), res=res)
+        rect_list.extend(rect_ans)
+        poly_list.extend(poly_ans)
+    extra[3] = poly_list
+    return (content[0], content[1], rect_list, content[3], content[4]) + tuple(extra)
+
+
+def _get_bottom_up_order(content_table):
+    # type: (Dict[str, Content]) -> List[str]
+    """Returns the cell names of content_table with every cell after all its sub-cells."""
+    order = []  # type: List[str]
+    visited = set()  # type: Set[str]
+    for top_name in content_table:
+        stack = [(top_name, False)]
+        while stack:
+            cell_name, done = stack.pop()
+            if done:
+                order.append(cell_name)
+            elif cell_name not in visited:
+                visited.add(cell_name)
+                stack.append((cell_name, True))
+                stack.extend((inst['cell'], False) for inst in content_table[cell_name][1]
+                             if inst['cell'] in content_table and inst['cell'] not in visited)
+    return order
+
+
+def _get_placements(inst, boxes, to_unit):
+    # type: (Dict[str, Any], np.ndarray, Any) -> List[np.ndarray]
+    """Returns the given sub-cell boxes transformed to each element of an instance array."""
+    x0, y0 = to_unit(inst['loc'][0]), to_unit(inst['loc'][1])
+    orient = inst.get('orient', 'R0')
+    spx, spy = to_unit(inst.get('sp_cols', 0)), to_unit(inst.get('sp_rows', 0))
+    return [_transform_boxes(boxes, orient, x0 + cidx * spx, y0 + ridx * spy)
+            for ridx in range(inst.get('num_rows', 1)) for cidx in range(inst.get('num_cols', 1))]
+
+
+def _get_touching_owners(boxes, owners):
+    # type: (np.ndarray, np.ndarray) -> Set[int]
+    """Returns the owners with a box that overlaps or shares an edge with a box of another owner."""
+    idx0, idx1 = find_close_pairs(boxes, 1)
+    b0, b1 = boxes[idx0], boxes[idx1]
+    gap_x = np.maximum(b0[:, 0], b1[:, 0]) - np.minimum(b0[:, 2], b1[:, 2])
+    gap_y = np.maximum(b0[:, 1], b1[:, 1]) - np.minimum(b0[:, 3], b1[:, 3])
+    # boxes touching only at a corner do not merge into a simple polygon.
+    mask = (gap_x <= 0) & (gap_y <= 0) & ((gap_x < 0) | (gap_y < 0)) & (owners[idx0] != owners[idx1])
+    return set(owners[idx0[mask]].tolist()) | set(owners[idx1[mask]].tolist())
+
+
+def _get_hoist_cells(place_table, own_boxes):
+    # type: (Dict[str, List[np.ndarray]], np.ndarray) -> Tuple[List[str], List[np.ndarray]]
+    """Returns the sub-cells whose boxes of one layer should be merged in their parent.
+
+    Parameters
+    ----------
+    place_table : Dict[str, List[np.ndarray]]
+        the placed boxes of every instance array element, per sub-cell instantiated only by the parent.
+    own_boxes : np.ndarray
+        the boxes drawn in the parent itself.
+
+    Returns
+    -------
+    name_list : List[str]
+        the sub-cells whose placements all touch the parent's boxes or placements of other returned sub-cells.
+    box_list : List[np.ndarray]
+        the placed boxes of the returned sub-cells.
+    """
+    place_table = dict(place_table)
+    while place_table:
+        name_list = sorted(place_table.keys())
+        box_list = [own_boxes]
+        owner_list = [np.full(own_boxes.shape[0], -1, dtype=np.int64)]
+        sub_list = []  # type: List[Tuple[str, int]]
+        for sub_name in name_list:
+            for boxes in place_table[sub_name]:
+                owner_list.append(np.full(boxes.shape[0], len(sub_list), dtype=np.int64))
+                box_list.append(boxes)
+                sub_list.append((sub_name, len(sub_list)))
+        touching = _get_touching_owners(np.concatenate(box_list, axis=0), np.concatenate(owner_list))
+        drop_set = {sub_name for sub_name, owner in sub_list if owner not in touching}
+        if not drop_set:
+            return name_list, box_list[1:]
+        for sub_name in drop_set:
+            del place_table[sub_name]
+    return [], []
+
+
+def _to_layout(lay_purp, rect_list, poly_list, res):
+    # type: (LayPurp, List[Box], List[List[Point]], float) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]
+    """Returns rectangle and polygon dictionaries of merged shapes given in resolution units."""
+    rect_ans = [dict(layer=lay_purp, bbox=[[xl * res, yb * res], [xr * res, yt * res]])
+                for xl, yb, xr, yt in rect_list]
+    poly_ans = [dict(layer=lay_purp, points=[(x * res, y * res) for x, y in pts]) for pts in poly_list]
+    return rect_ans, poly_ans
+
+
+def merge_content_list(content_list, layers=None, config=None, check=True):
+    # type: (Iterable[Content], Optional[Iterable[LayPurp]], Optional[Dict[str, Any]], bool) -> List[Content]
+    """Merge rectangles of the given layers in every cell, and across abutting sub-cells.
+
+    Rectangles of each cell are merged within the cell, so the hierarchy is kept and
+    every cell keeps its implant and threshold shapes.  Implant and threshold shapes of
+    abutting sub-cells, such as AnalogBase rows and AnalogMosConn blocks, can only merge
+    in their parent.  They are moved to the parent and merged there only if the sub-cell
+    is instantiated by that parent alone, every placement touches other merged shapes,
+    and the merge stores fewer shapes than leaving them in place.  Sub-cells whose
+    shapes were moved lose those layers, so run LVS on the top cells.  Arrayed or
+    spaced out sub-cells are kept hierarchical.  The total number of stored shapes
+    never increases.
+
+    Parameters
+    ----------
+    content_list : Iterable[Tuple[Any, ...]]
+        the content list passed to TemplateDB.create_masters_in_db().
+    layers : Optional[Iterable[Tuple[str, str]]]
+        layer/purpose pairs to merge.  Defaults to get_merge_layers().
+    config : Optional[Dict[str, Any]]
+        the technology parameters dictionary.  Defaults to tech_params.yaml.
+    check : bool
+        True to verify every merge with check_merge().
+
+    Returns
+    -------
+    content_list : List[Tuple[Any, ...]]
+        the new content list, in the same order.
+
+    Raises
+    ------
+    ValueError
+        if check is True and the merged shapes differ from the original rectangles.
+    """
+    if config is None:
+        config = _config
+    lay_set = get_merge_layers(config) if layers is None else {_get_lay_purp(lay) for lay in layers}
+    res = config['resolution']
+
+    def to_unit(val):
+        return int(round(val / res))
+
+    content_list = list(content_list)
+    content_table = {content[0]: content for content in content_list}
+    parent_table = {}  # type: Dict[str, Set[str]]
+    for content in content_list:
+        for inst in content[1]:
+            if inst['cell'] in content_table:
+                parent_table.setdefault(inst['cell'], set()).add(content[0])
+
+    keep_table = {}  # type: Dict[str, List[Dict[str, Any]]]
+    # per layer, the boxes and merged shapes of each cell, in resolution units.
+    box_table = {}  # type: Dict[LayPurp, Dict[str, np.ndarray]]
+    merge_table = {}  # type: Dict[LayPurp, Dict[str, Merged]]
+    for cell_name in _get_bottom_up_order(content_table):
+        content = content_table[cell_name]
+        keep_list, own_table = _get_content_boxes(content[2], lay_set, to_unit)
+        keep_table[cell_name] = keep_list
+        for lay_purp in sorted(lay_set):
+            lay_boxes = box_table.setdefault(lay_purp, {})
+            lay_merged = merge_table.setdefault(lay_purp, {})
+            own_boxes = np.asarray(own_table.get(lay_purp, []), dtype=np.int64).reshape(-1, 4)
+            if own_boxes.shape[0]:
+                lay_merged[cell_name] = _merge_checked(cell_name, lay_purp, own_boxes, check)
+                lay_boxes[cell_name] = own_boxes
+            place_table = {}  # type: Dict[str, List[np.ndarray]]
+            for inst in content[1]:
+                sub_name = inst['cell']
+                sub_boxes = lay_boxes.get(sub_name, None)
+                if sub_boxes is not None and parent_table[sub_name] == {cell_name}:
+                    place_table.setdefault(sub_name, []).extend(_get_placements(inst, sub_boxes, to_unit))
+            sub_names, sub_boxes = _get_hoist_cells(place_table, own_boxes)
+            if not sub_names:
+                continue
+            all_boxes = np.concatenate([own_boxes] + sub_boxes, axis=0)
+            rect_list, poly_list = _merge_checked(cell_name, lay_purp, all_boxes, check)
+            old_count = sum(len(lay_merged[name][0]) + len(lay_merged[name][1])
+                            for name in sub_names + ([cell_name] if own_boxes.shape[0] else []))
+            if len(rect_list) + len(poly_list) < old_count:
+                for sub_name in sub_names:
+                    del lay_merged[sub_name]
+                    del lay_boxes[sub_name]
+                lay_merged[cell_name] = rect_list, poly_list
+                lay_boxes[cell_name] = all_boxes
+
+    ans = []
+    for content in content_list:
+        cell_name = content[0]
+        rect_list = list(keep_table[cell_name])
+        extra = list(content[5:]) + [[] for _ in range(9 - len(content))]
+        poly_list = list(extra[3])
+        for lay_purp in sorted(lay_set):
+            merged = merge_table[lay_purp].get(cell_name, None)
+            if merged is not None:
+                rect_ans, poly_ans = _to_layout(lay_purp, merged[0], merged[1], res)
+                rect_list.extend(rect_ans)
+                poly_list.extend(poly_ans)
+        extra[3] = poly_list
+        ans.append((cell_name, content[1], rect_list, content[3], content[4]) + tuple(extra))
+    return ans
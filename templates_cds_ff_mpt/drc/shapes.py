@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, List, Tuple, Union, Optional, Iterable
+
+import numpy as np
+
+from .. import config as _config
+
+LayerType = Union[str, Tuple[str, str], List[str]]
+
+# via record columns.  Enclosures are [left, right, top, bottom].
+VIA_FIELDS = ('xc', 'yc', 'cut_w', 'cut_h', 'num_rows', 'num_cols', 'sp_rows', 'sp_cols',
+              'enc1_l', 'enc1_r', 'enc1_t', 'enc1_b', 'enc2_l', 'enc2_r', 'enc2_t', 'enc2_b')
+
+# mapping from orientation to the 2x2 transformation matrix.
+_orient_mat = {
+    'R0': ((1, 0), (0, 1)),
+    'R90': ((0, -1), (1, 0)),
+    'R180': ((-1, 0), (0, -1)),
+    'R270': ((0, 1), (-1, 0)),
+    'MX': ((1, 0), (0, -1)),
+    'MY': ((-1, 0), (0, 1)),
+    'MXR90': ((0, 1), (1, 0)),
+    'MYR90': ((0, -1), (-1, 0)),
+}
+
+# unit vectors of the left, right, top, and bottom enclosure directions.
+_enc_dirs = ((-1, 0), (1, 0), (0, 1), (0, -1))
+
+
+def _get_lay_purp(layer):
+    # type: (LayerType) -> Tuple[str, str]
+    if isinstance(layer, str):
+        return layer, 'drawing'
+    return layer[0], layer[1]
+
+
+def _transform_boxes(boxes, orient, dx, dy):
+    # type: (np.ndarray, str, int, int) -> np.ndarray
+    """Transform (N, 4) [xl, yb, xr, yt] boxes by the given orientation and translation."""
+    (a, b), (c, d) = _orient_mat[orient]
+    x0 = a * boxes[:, 0] + b * boxes[:, 1]
+    y0 = c * boxes[:, 0] + d * boxes[:, 1]
+    x1 = a * boxes[:, 2] + b * boxes[:, 3]
+    y1 = c * boxes[:, 2] + d * boxes[:, 3]
+    return np.stack((np.minimum(x0, x1) + dx, np.minimum(y0, y1) + dy,
+                     np.maximum(x0, x1) + dx, np.maximum(y0, y1) + dy), axis=1)
+
+
+def _transform_vias(vias, orient, dx, dy):
+    # type: (np.ndarray, str, int, int) -> np.ndarray
+    """Transform (N, 16) via records by the given orientation and translation."""
+    (a, b), (c, d) = _orient_mat[orient]
+    ans = vias.copy()
+    ans[:, 0] = a * vias[:, 0] + b * vias[:, 1] + dx
+    ans[:, 1] = c * vias[:, 0] + d * vias[:, 1] + dy
+    if b != 0:
+        # rotated by 90 degrees; swap cut dimensions and array directions.
+        ans[:, [2, 3, 4, 5, 6, 7]] = vias[:, [3, 2, 5, 4, 7, 6]]
+    # each enclosure side moves to the side its direction maps to.
+    for old_idx, (ux, uy) in enumerate(_enc_dirs):
+        new_idx = _enc_dirs.index((a * ux + b * uy, c * ux + d * uy))
+        ans[:, 8 + new_idx] = vias[:, 8 + old_idx]
+        ans[:, 12 + new_idx] = vias[:, 12 + old_idx]
+    return ans
+
+
+class ShapeSet(object):
+    """Flattened rectangles and vias of a layout, in resolution units.
+
+    Rectangles are stored per layer/purpose as (N, 4) [xl, yb, xr, yt] arrays.  Vias
+    are kept both as via records, for via rule checks, and expanded into cut and
+    metal rectangles.
+
+    Parameters
+    ----------
+    config : Optional[Dict[str, Any]]
+        the technology parameters dictionary.  Defaults to tech_params.yaml.
+    """
+
+    def __init__(self, config=None):
+        # type: (Optional[Dict[str, Any]]) -> None
+        self._config = _config if config is None else config
+        self._rect_lists = {}  # type: Dict[Tuple[str, str], List[np.ndarray]]
+        self._via_lists = {}  # type: Dict[str, List[np.ndarray]]
+        self._rects = None  # type: Optional[Dict[Tuple[str, str], np.ndarray]]
+        self._vias = None  # type: Optional[Dict[str, np.ndarray]]
+
+        self._via_layers = {}
+        for (bot_lay, top_lay), via_id in self._config['via_id'].items():
+            self._via_layers[via_id] = (_get_lay_purp(bot_lay), _get_lay_purp(top_lay))
+
+    @property
+    def config(self):
+        # type: () -> Dict[str, Any]
+        return self._config
+
+    @property
+    def layers(self):
+        # type: () -> List[Tuple[str, str]]
+        return list(self._get_rects().keys())
+
+    @property
+    def num_shapes(self):
+        # type: () -> int
+        return sum(arr.shape[0] for arr in self._get_rects().values())
+
+    def _get_rects(self):
+        # type: () -> Dict[Tuple[str, str], np.ndarray]
+        if self._rects is None:
+            self._rects = {lay: np.concatenate(arr_list, axis=0)
+                           for lay, arr_list in self._rect_lists.items()}
+            self._rect_lists = {lay: [arr] for lay, arr in self._rects.items()}
+        return self._rects
+
+    def _get_vias(self):
+        # type: () -> Dict[str, np.ndarray]
+        if self._vias is None:
+            self._vias = {via_id: np.concatenate(arr_list, axis=0)
+                          for via_id, arr_list in self._via_lists.items()}
+            self._via_lists = {via_id: [arr] for via_id, arr in self._vias.items()}
+        return self._vias
+
+    def get_rects(self, layer):
+        # type: (LayerType) -> np.ndarray
+        """Returns the (N, 4) rectangle array of the given layer/purpose."""
+        return self._get_rects().get(_get_lay_purp(layer), np.empty((0, 4), dtype=np.int64))
+
+    def get_layer_rects(self, lay_name):
+        # type: (str) -> np.ndarray
+        """Returns rectangles of the given layer name over all purposes."""
+        arr_list = [arr for (lay, _), arr in self._get_rects().items() if lay == lay_name]
+        if not arr_list:
+            return np.empty((0, 4), dtype=np.int64)
+        return np.concatenate(arr_list, axis=0)
+
+    def get_vias(self):
+        # type: () -> Dict[str, np.ndarray]
+        """Returns map from via ID to (N, 16) via record array; see VIA_FIELDS."""
+        return dict(self._get_vias())
+
+    def add_rects(self, layer, boxes):
+        # type: (LayerType, np.ndarray) -> None
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        if boxes.shape[0] > 0:
+            self._rect_lists.setdefault(_get_lay_purp(layer), []).append(boxes)
+            self._rects = None
+
+    def add_vias(self, via_id, vias):
+        # type: (str, np.ndarray) -> None
+        """Add via records, expanding them into cut and metal rectangles."""
+        vias = np.asarray(vias, dtype=np.int64).reshape(-1, len(VIA_FIELDS))
+        if vias.shape[0] == 0:
+            return
+        self._via_lists.setdefault(via_id, []).append(vias)
+        self._vias = None
+
+        xc, yc, cut_w, cut_h, nrow, ncol, sp_rows, sp_cols = vias[:, :8].T
+        arr_w = ncol * cut_w + (ncol - 1) * sp_cols
+        arr_h = nrow * cut_h + (nrow - 1) * sp_rows
+        arr_xl = xc - arr_w // 2
+        arr_yb = yc - arr_h // 2
+        arr_xr = arr_xl + arr_w
+        arr_yt = arr_yb + arr_h
+        bot_lay, top_lay = self._via_layers[via_id]
+        for lay, off in ((bot_lay, 8), (top_lay, 12)):
+            enc = vias[:, off:off + 4]
+            self.add_rects(lay, np.stack((arr_xl - enc[:, 0], arr_yb - enc[:, 3],
+                                          arr_xr + enc[:, 1], arr_yt + enc[:, 2]), axis=1))
+        cut_lay = self._config.get('via_cut_layer', {}).get(via_id, None)
+        if cut_lay is not None:
+            # expand cut arrays, grouped by array size to stay vectorized.
+            for nr, nc in set(zip(nrow.tolist(), ncol.tolist())):
+                sel = (nrow == nr) & (ncol == nc)
+                ridx, cidx = np.meshgrid(np.arange(nr), np.arange(nc), indexing='ij')
+                ridx = ridx.ravel()
+                cidx = cidx.ravel()
+                cut_xl = (arr_xl[sel, None] + cidx * (cut_w[sel, None] + sp_cols[sel, None])).ravel()
+                cut_yb = (arr_yb[sel, None] + ridx * (cut_h[sel, None] + sp_rows[sel, None])).ravel()
+                cw = np.repeat(cut_w[sel], nr * nc)
+                ch = np.repeat(cut_h[sel], nr * nc)
+                self.add_rects(cut_lay, np.stack((cut_xl, cut_yb, cut_xl + cw, cut_yb + ch), axis=1))
+
+    def add_shape_set(self, other, orient='R0', dx=0, dy=0):
+        # type: (ShapeSet, str, int, int) -> None
+        """Add all shapes of another shape set, transformed."""
+        for lay, boxes in other._get_rects().items():
+            self.add_rects(lay, _transform_boxes(boxes, orient, dx, dy))
+        for via_id, vias in other._get_vias().items():
+            self._via_lists.setdefault(via_id, []).append(_transform_vias(vias, orient, dx, dy))
+            self._vias = None
+
+    @classmethod
+    def from_content_list(cls, content_list, top_cell=None, config=None):
+        # type: (Iterable[Tuple[Any, ...]], Optional[str], Optional[Dict[str, Any]]) -> ShapeSet
+        """Flatten layout content tuples into a shape set.
+
+        Parameters
+        ----------
+        content_list : Iterable[Tuple[Any, ...]]
+            the content list passed to TemplateDB.create_masters_in_db().
+        top_cell : Optional[str]
+            the cell to flatten.  Defaults to the last cell.
+        config : Optional[Dict[str, Any]]
+            the technology parameters dictionary.
+
+        Returns
+        -------
+        shapes : ShapeSet
+            the flattened shapes.  Instances of cells not in content_list are ignored.
+        """
+        content_table = {}
+        for content in content_list:
+            content_table[content[0]] = content
+            if top_cell is None:
+                last_cell = content[0]
+        if top_cell is None:
+            top_cell = last_cell
+        memo = {}  # type: Dict[str, ShapeSet]
+        return cls._flatten(content_table, top_cell, memo, config)
+
+    @classmethod
+    def _flatten(cls, content_table, cell_name, memo, config):
+        # type: (Dict[str, Tuple[Any, ...]], str, Dict[str, ShapeSet], Optional[Dict[str, Any]]) -> ShapeSet
+        ans = memo.get(cell_name, None)
+        if ans is not None:
+            return ans
+        ans = cls(config=config)
+        cell_name, inst_list, rect_list, via_list, pin_list = content_table[cell_name][:5]
+        res = ans._config['resolution']
+
+        def to_unit(val):
+            return int(round(val / res))
+
+        for inst in inst_list:
+            if inst['cell'] not in content_table:
+                continue
+            sub = cls._flatten(content_table, inst['cell'], memo, config)
+            x0, y0 = to_unit(inst['loc'][0]), to_unit(inst['loc'][1])
+            orient = inst.get('orient', 'R0')
+            spx, spy = to_unit(inst.get('sp_cols', 0)), to_unit(inst.get('sp_rows', 0))
+            for ridx in range(inst.get('num_rows', 1)):
+                for cidx in range(inst.get('num_cols', 1)):
+                    ans.add_shape_set(sub, orient=orient, dx=x0 + cidx * spx, dy=y0 + ridx * spy)
+
+        for rect in rect_list:
+            (xl, yb), (xr, yt) = rect['bbox']
+            nx, ny = rect.get('arr_nx', 1), rect.get('arr_ny', 1)
+            spx, spy = to_unit(rect.get('arr_spx', 0)), to_unit(rect.get('arr_spy', 0))
+            dx = np.repeat(np.arange(nx) * spx, ny)
+            dy = np.tile(np.arange(ny) * spy, nx)
+            box = np.array([to_unit(xl), to_unit(yb), to_unit(xr), to_unit(yt)], dtype=np.int64)
+            ans.add_rects(rect['layer'], box[None, :] + np.stack((dx, dy, dx, dy), axis=1))
+        for pin in pin_list:
+            if pin.get('make_rect', True):
+                (xl, yb), (xr, yt) = pin['bbox']
+                ans.add_rects(pin['layer'], [to_unit(xl), to_unit(yb), to_unit(xr), to_unit(yt)])
+
+        via_table = {}  # type: Dict[str, List[List[int]]]
+        for via in via_list:
+            if via.get('orient', 'R0') != 'R0':
+                raise ValueError('Only R0 vias are supported, got %s' % via['orient'])
+            x, y = to_unit(via['loc'][0]), to_unit(via['loc'][1])
+            spx, spy = to_unit(via.get('arr_spx', 0)), to_unit(via.get('arr_spy', 0))
+            rec = [to_unit(via['cut_width']), to_unit(via['cut_height']), via.get('num_rows', 1),
+                   via.get('num_cols', 1), to_unit(via.get('sp_rows', 0)), to_unit(via.get('sp_cols', 0))]
+            rec.extend(to_unit(v) for v in via['enc1'])
+            rec.extend(to_unit(v) for v in via['enc2'])
+            rec_list = via_table.setdefault(via['id'], [])
+            for xidx in range(via.get('arr_nx', 1)):
+                for yidx in range(via.get('arr_ny', 1)):
+                    rec_list.append([x + xidx * spx, y + yidx * spy] + rec)
+        for via_id, rec_list in via_table.items():
+            ans.add_vias(via_id, rec_list)
+
+        memo[cell_name] = ans
+        return ans
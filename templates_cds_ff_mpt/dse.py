@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+
+from typing import TYPE_CHECKING, Dict, Any, List, Tuple, Optional, Type, Iterator, Iterable, Set
+
+import os
+import math
+import time
+import copy
+import random
+import itertools
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from . import sweep as _sweep
+from .sweep import SweepPointResult
+
+if TYPE_CHECKING:
+    from bag.layout.template import TemplateBase
+
+PointType = Tuple[Dict[str, Any], Dict[str, Any]]
+
+# per-process template database, kept across sweep point chunks so masters are reused.
+_worker_db = None
+
+
+class MasterReuseStats(object):
+    """Master reuse statistics of a design-space exploration run.
+
+    Parameters
+    ----------
+    num_new : int
+        number of masters generated.
+    num_reused : int
+        number of master lookups served from the cache.
+    gen_time : float
+        time spent generating masters, in seconds.
+    saved_time : float
+        the generation time of all reused masters, including their sub-masters.
+    num_evicted : int
+        number of masters dropped from the cache to bound memory.
+    """
+
+    __slots__ = ('num_new', 'num_reused', 'gen_time', 'saved_time', 'num_evicted')
+
+    def __init__(self, num_new=0, num_reused=0, gen_time=0.0, saved_time=0.0, num_evicted=0):
+        # type: (int, int, float, float, int) -> None
+        self.num_new = num_new
+        self.num_reused = num_reused
+        self.gen_time = gen_time
+        self.saved_time = saved_time
+        self.num_evicted = num_evicted
+
+    @property
+    def reuse_rate(self):
+        # type: () -> float
+        """Fraction of master lookups served from the cache."""
+        total = self.num_new + self.num_reused
+        return self.num_reused / total if total else 0.0
+
+    def copy(self):
+        # type: () -> MasterReuseStats
+        return MasterReuseStats(self.num_new, self.num_reused, self.gen_time, self.saved_time,
+                                self.num_evicted)
+
+    def __sub__(self, other):
+        # type: (MasterReuseStats) -> MasterReuseStats
+        return MasterReuseStats(self.num_new - other.num_new, self.num_reused - other.num_reused,
+                                self.gen_time - other.gen_time, self.saved_time - other.saved_time,
+                                self.num_evicted - other.num_evicted)
+
+    def __iadd__(self, other):
+        # type: (MasterReuseStats) -> MasterReuseStats
+        self.num_new += other.num_new
+        self.num_reused += other.num_reused
+        self.gen_time += other.gen_time
+        self.saved_time += other.saved_time
+        self.num_evicted += other.num_evicted
+        return self
+
+    def __repr__(self):
+        return ('%s(new=%d, reused=%d, reuse_rate=%.3f, gen_time=%.3f, saved_time=%.3f, evicted=%d)' %
+                (self.__class__.__name__, self.num_new, self.num_reused, self.reuse_rate,
+                 self.gen_time, self.saved_time, self.num_evicted))
+
+
+def set_param(params, name, value):
+    # type: (Dict[str, Any], str, Any) -> None
+    """Set a layout parameter.  Dotted names such as 'seg_dict.load' set nested entries."""
+    keys = name.split('.')
+    for key in keys[:-1]:
+        params = params[key]
+    params[keys[-1]] = value
+
+
+def _make_point(base_params, swp_names, values):
+    # type: (Dict[str, Any], List[str], Iterable[Any]) -> PointType
+    swp_values = OrderedDict(zip(swp_names, values))
+    params = copy.deepcopy(base_params)
+    for name, val in swp_values.items():
+        set_param(params, name, val)
+    return swp_values, params
+
+
+def iter_cartesian_points(specs):
+    # type: (Dict[str, Any]) -> Iterator[PointType]
+    """Lazily iterate over the Cartesian product of the swp_params section.
+
+    This is the same ordering as sweep.get_sweep_points(), with the last parameter
+    varying fastest, but points are only created when needed.  Sweep parameter names
+    may be dotted to sweep entries of dictionary parameters, such as 'seg_dict.load'.
+    """
+    base_params = specs['params']
+    swp_params = specs.get('swp_params', None) or {}
+    swp_names = list(swp_params.keys())
+    for values in itertools.product(*(swp_params[name] for name in swp_names)):
+        yield _make_point(base_params, swp_names, values)
+
+
+def _get_coprime(num, rng):
+    # type: (int, random.Random) -> int
+    while True:
+        val = rng.randrange(1, num) if num > 1 else 1
+        if math.gcd(val, num) == 1:
+            return val
+
+
+def iter_lhs_points(specs, num_points, seed=None):
+    # type: (Dict[str, Any], int, Optional[int]) -> Iterator[PointType]
+    """Lazily iterate over a Latin hypercube sample of the swp_params section.
+
+    Each sweep parameter gets a random affine permutation i -> (a * i + b) mod num_points
+    of the sample indices, and sample i uses value index perm(i) * num_values // num_points.
+    Every value of every parameter is used equally often, and memory does not grow with
+    the number of points.
+
+    Parameters
+    ----------
+    specs : Dict[str, Any]
+        the specification dictionary.
+    num_points : int
+        the number of sample points.
+    seed : Optional[int]
+        the random seed.
+    """
+    if num_points <= 0:
+        return
+    base_params = specs['params']
+    swp_params = specs.get('swp_params', None) or {}
+    swp_names = list(swp_params.keys())
+    rng = random.Random(seed)
+    perm_list = [(_get_coprime(num_points, rng), rng.randrange(num_points)) for _ in swp_names]
+    for idx in range(num_points):
+        values = []
+        for name, (a, b) in zip(swp_names, perm_list):
+            val_list = swp_params[name]
+            values.append(val_list[((a * idx + b) % num_points) * len(val_list) // num_points])
+        yield _make_point(base_params, swp_names, values)
+
+
+class MasterCache(object):
+    """Least-recently-used bookkeeping of the masters of a template database.
+
+    Records master generation and reuse in a MasterReuseStats, and evicts the oldest
+    masters from the database's master lookup table once there are more than
+    max_masters of them.  A master used by another cached master is never evicted,
+    since reusing the parent would not regenerate it.
+
+    Parameters
+    ----------
+    max_masters : int
+        maximum number of cached masters.
+    """
+
+    def __init__(self, max_masters):
+        # type: (int) -> None
+        self.stats = MasterReuseStats()
+        self._max_masters = max_masters
+        self._lru = OrderedDict()  # type: OrderedDict
+        self._children = {}  # type: Dict[Any, Tuple[Any, ...]]
+        self._num_parents = {}  # type: Dict[Any, int]
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._lru)
+
+    def add(self, key, gen_time, top_level=True, children=()):
+        # type: (Any, float, bool, Iterable[Any]) -> None
+        """Record a newly generated master.
+
+        gen_time includes the generation time of all new sub-masters, so it is only
+        added to the total generation time of top level masters.  children are the keys
+        of the masters instantiated by this master.
+        """
+        stats = self.stats
+        stats.num_new += 1
+        if top_level:
+            stats.gen_time += gen_time
+        self._lru[key] = gen_time
+        self._num_parents.setdefault(key, 0)
+        child_keys = tuple(child for child in set(children) if child in self._lru)
+        self._children[key] = child_keys
+        for child in child_keys:
+            self._num_parents[child] += 1
+
+    def reuse(self, key):
+        # type: (Any) -> None
+        """Record a master lookup served from the cache."""
+        stats = self.stats
+        stats.num_reused += 1
+        gen_time = self._lru.get(key, None)
+        if gen_time is not None:
+            stats.saved_time += gen_time
+            self._lru.move_to_end(key)
+
+    def evict(self, lookup):
+        # type: (Dict[Any, Any]) -> None
+        """Remove the least recently used unreferenced masters from lookup until the cache fits."""
+        num_parents = self._num_parents
+        while len(self._lru) > self._max_masters:
+            old_key = next((key for key in self._lru if num_parents[key] == 0), None)
+            if old_key is None:
+                break
+            del self._lru[old_key]
+            del num_parents[old_key]
+            for child in self._children.pop(old_key):
+                num_parents[child] -= 1
+            lookup.pop(old_key, None)
+            self.stats.num_evicted += 1
+
+
+def get_worker_suffix():
+    # type: () -> str
+    """Returns the suffix appended to the sub-master cell names of this worker process."""
+    return '_w%d' % os.getpid()
+
+
+def _create_reuse_db(tech_info, specs, max_masters):
+    """Create a TemplateDB that keeps content in memory and records master reuse.
+
+    Masters are kept in least-recently-used order, and the oldest masters are dropped
+    once there are more than max_masters of them.  Each worker names its sub-masters
+    independently, so sub-master cell names get a per-worker suffix to keep different
+    masters of different workers apart when all points are written to one library.
+    """
+    from bag.layout.routing import RoutingGrid
+    from bag.layout.template import TemplateDB
+
+    class _ReuseTemplateDB(TemplateDB):
+        def __init__(self, *args, **kwargs):
+            TemplateDB.__init__(self, *args, **kwargs)
+            self.content_list = None
+            self.master_cache = MasterCache(max_masters)
+            # keys of the masters used by each master being generated.
+            self._child_stack = []  # type: List[Set[Any]]
+
+        @property
+        def reuse_stats(self):
+            # type: () -> MasterReuseStats
+            return self.master_cache.stats
+
+        def new_master(self, gen_cls, params=None, debug=False, **kwargs):
+            lookup = self._master_lookup
+            num_before = len(lookup)
+            child_stack = self._child_stack
+            child_stack.append(set())
+            t0 = time.time()
+            try:
+                master = TemplateDB.new_master(self, gen_cls, params=params, debug=debug, **kwargs)
+            finally:
+                children = child_stack.pop()
+
+            cache = self.master_cache
+            if len(lookup) > num_before:
+                cache.add(master.key, time.time() - t0, top_level=not child_stack, children=children)
+            else:
+                cache.reuse(master.key)
+            if child_stack:
+                child_stack[-1].add(master.key)
+            else:
+                cache.evict(lookup)
+            return master
+
+        def create_masters_in_db(self, lib_name, content_list, debug=False):
+            self.content_list = content_list
+
+    grid_specs = specs['routing_grid']
+    routing_grid = RoutingGrid(tech_info, grid_specs['layers'], grid_specs['spaces'],
+                               grid_specs['widths'], grid_specs['bot_dir'])
+    return _ReuseTemplateDB('template_libs.def', routing_grid, specs['impl_lib'],
+                            name_suffix=get_worker_suffix())
+
+
+def _run_chunk(chunk, specs, temp_cls, max_masters, use_info_cache):
+    # type: (...) -> Tuple[List[SweepPointResult], MasterReuseStats]
+    """Generate a chunk of sweep points in a worker process, reusing the worker's masters.
+
+    If use_info_cache is True, each point is one generation of the transistor information cache.
+    """
+    global _worker_db
+
+    if _worker_db is None:
+        _worker_db = _create_reuse_db(_sweep._worker_tech_info, specs, max_masters)
+    temp_db = _worker_db
+    info_cache = _sweep._worker_tech_info.mos_tech.info_cache if use_info_cache else None
+    if info_cache is not None:
+        info_cache.enabled = True
+    stats_start = temp_db.reuse_stats.copy()
+    result_list = []
+    for index, cell_name, swp_values, params in chunk:
+        timing = {}
+        point_start = temp_db.reuse_stats.copy()
+        if info_cache is not None:
+            info_cache.start_generation()
+        try:
+            t0 = time.time()
+            template = temp_db.new_template(params=params, temp_cls=temp_cls)
+            t1 = time.time()
+            temp_db.batch_layout(None, [template], [cell_name])
+            timing['layout'] = t1 - t0
+            timing['content'] = time.time() - t1
+            timing['saved'] = temp_db.reuse_stats.saved_time - point_start.saved_time
+            result = SweepPointResult(index, cell_name, swp_values, template.sch_params,
+                                      temp_db.content_list, timing)
+        except Exception:
+            result = SweepPointResult(index, cell_name, swp_values, None, None, timing,
+                                      error=traceback.format_exc())
+        if info_cache is not None:
+            info_cache.end_generation()
+        temp_db.content_list = None
+        result_list.append(result)
+    return result_list, temp_db.reuse_stats - stats_start
+
+
+class DSERunner(object):
+    """Design-space exploration driver that reuses sub-block masters across sweep points.
+
+    Each worker process keeps one template database for the whole run, so sub-templates
+    whose parameters hash to an already generated master are reused instead of being
+    regenerated.  Consecutive points are sent to the same worker in chunks, since
+    neighbouring points share the most sub-blocks.  Points are created lazily and only
+    a bounded number of chunks is in flight, and the master cache is bounded, so memory
+    does not grow with the number of points.  Top cells are named by get_cell_name(),
+    and sub-master cell names end with the get_worker_suffix() of their worker.
+
+    Parameters
+    ----------
+    specs : Dict[str, Any]
+        the specification dictionary, with impl_lib, sch_cell, routing_grid, params, and
+        swp_params entries.
+    temp_cls : Type[TemplateBase]
+        the layout generator class.  Must be importable by worker processes.
+    max_workers : int
+        number of worker processes.
+    chunk_size : int
+        number of consecutive points generated per task.
+    max_masters : int
+        maximum number of cached masters per worker.
+    bag_config_path : Optional[str]
+        the BAG configuration file.  Defaults to the BAG_CONFIG_PATH environment variable.
+    use_info_cache : bool
+        True to also reuse transistor row information and connection shapes between points whose masters differ.
+        See MOSInfoCache.
+    """
+
+    def __init__(self, specs, temp_cls, max_workers=1, chunk_size=16, max_masters=20000,
+                 bag_config_path=None, use_info_cache=False):
+        # type: (Dict[str, Any], Type[TemplateBase], int, int, int, Optional[str], bool) -> None
+        self._specs = specs
+        self._temp_cls = temp_cls
+        self._max_workers = max(1, max_workers)
+        self._chunk_size = max(1, chunk_size)
+        self._max_masters = max_masters
+        self._bag_config_path = bag_config_path
+        self._use_info_cache = use_info_cache
+        self._stats = MasterReuseStats()
+
+    @property
+    def stats(self):
+        # type: () -> MasterReuseStats
+        """The master reuse statistics of all points generated so far."""
+        return self._stats
+
+    def get_cell_name(self, index):
+        # type: (int) -> str
+        return '%s_%d' % (self._specs['sch_cell'].upper(), index)
+
+    def run_cartesian(self):
+        # type: () -> Iterator[SweepPointResult]
+        """Generate the full Cartesian sweep.  See iter_cartesian_points()."""
+        return self.run(iter_cartesian_points(self._specs))
+
+    def run_lhs(self, num_points, seed=None):
+        # type: (int, Optional[int]) -> Iterator[SweepPointResult]
+        """Generate a Latin hypercube sample of the sweep.  See iter_lhs_points()."""
+        return self.run(iter_lhs_points(self._specs, num_points, seed=seed))
+
+    def run(self, point_iter):
+        # type: (Iterable[PointType]) -> Iterator[SweepPointResult]
+        """Generate the given sweep points.
+
+        Parameters
+        ----------
+        point_iter : Iterable[PointType]
+            the (swept values, layout parameters) of each point.
+
+        Yields
+        ------
+        result : SweepPointResult
+            the sweep results, in point order.  Callers should write out and drop each
+            result to keep memory bounded.
+        """
+        specs = self._specs
+        chunk_iter = self._iter_chunks(point_iter)
+        max_pending = 2 * self._max_workers
+        with ProcessPoolExecutor(max_workers=self._max_workers, initializer=_sweep._init_worker,
+                                 initargs=(self._bag_config_path,)) as executor:
+            pending = deque()
+            for chunk in itertools.chain(chunk_iter, [None]):
+                if chunk is not None:
+                    pending.append(executor.submit(_run_chunk, chunk, specs, self._temp_cls, self._max_masters,
+                                                   self._use_info_cache))
+                while pending and (chunk is None or len(pending) >= max_pending):
+                    result_list, stats = pending.popleft().result()
+                    self._stats += stats
+                    for result in result_list:
+                        yield result
+
+    def _iter_chunks(self, point_iter):
+        # type: (Iterable[PointType]) -> Iterator[List[Tuple[int, str, Dict[str, Any], Dict[str, Any]]]]
+        point_iter = iter(point_iter)
+        index = 0
+        while True:
+            chunk = []
+            for swp_values, params in itertools.islice(point_iter, self._chunk_size):
+                chunk.append((index, self.get_cell_name(index), swp_values, params))
+                index += 1
+            if not chunk:
+                return
+            yield chunk
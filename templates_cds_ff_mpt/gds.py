@@ -0,0 +1,537 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, List, Tuple, Union, Optional, Iterable, Set, BinaryIO
+
+import time
+import struct
+import warnings
+
+from . import config as _config
+
+# GDSII record types, with their data type already OR'ed in.
+_HEADER = 0x0002
+_BGNLIB = 0x0102
+_LIBNAME = 0x0206
+_UNITS = 0x0305
+_ENDLIB = 0x0400
+_BGNSTR = 0x0502
+_STRNAME = 0x0606
+_ENDSTR = 0x0700
+_BOUNDARY = 0x0800
+_PATH = 0x0900
+_SREF = 0x0A00
+_AREF = 0x0B00
+_TEXT = 0x0C00
+_LAYER = 0x0D02
+_DATATYPE = 0x0E02
+_WIDTH = 0x0F03
+_XY = 0x1003
+_ENDEL = 0x1100
+_SNAME = 0x1206
+_COLROW = 0x1302
+_TEXTTYPE = 0x1602
+_STRING = 0x1906
+_STRANS = 0x1A01
+_ANGLE = 0x1C05
+_PATHTYPE = 0x2102
+
+# the record length is 16 bits and includes the 4 byte header.
+_MAX_RECORD_DATA = 0xFFFF - 4
+# an XY record holds at most 8191 points, so polygons have at most 8190 distinct vertices.
+_MAX_XY_POINTS = _MAX_RECORD_DATA // 8
+
+# mapping from orientation to (reflect about X axis, rotation angle in degrees).
+_orient_table = {
+    'R0': (False, 0),
+    'R90': (False, 90),
+    'R180': (False, 180),
+    'R270': (False, 270),
+    'MX': (True, 0),
+    'MY': (True, 180),
+    'MXR90': (True, 90),
+    'MYR90': (True, 270),
+}
+
+# mapping from path end style to GDS path type.
+_path_type_table = {
+    'truncate': 0,
+    'round': 1,
+    'extend': 2,
+}
+
+LayerType = Union[str, Tuple[str, str], List[str]]
+
+
+def _get_lay_purp(layer):
+    # type: (LayerType) -> Tuple[str, str]
+    if isinstance(layer, str):
+        return layer, 'drawing'
+    return layer[0], layer[1]
+
+
+def _real8(val):
+    # type: (float) -> bytes
+    """Encode a float in the GDSII excess-64, base-16 floating point format."""
+    if val == 0:
+        return b'\x00' * 8
+    sign = 0x80 if val < 0 else 0x00
+    val = abs(val)
+    exp = 64
+    while val >= 1:
+        val /= 16.0
+        exp += 1
+    while val < 1.0 / 16:
+        val *= 16.0
+        exp -= 1
+    mantissa = int(round(val * (1 << 56)))
+    if mantissa >= (1 << 56):
+        mantissa >>= 4
+        exp += 1
+    return struct.pack('>Q', ((sign | exp) << 56) | mantissa)
+
+
+def get_tech_layers(config=None):
+    # type: (Optional[Dict[str, Any]]) -> Set[Tuple[str, str]]
+    """Returns all layer/purpose pairs the technology parameters can draw on.
+
+    Parameters
+    ----------
+    config : Optional[Dict[str, Any]]
+        the technology parameters dictionary.  Defaults to tech_params.yaml.
+
+    Returns
+    -------
+    lay_set : Set[Tuple[str, str]]
+        the set of layer/purpose pairs from layer_name, mos_layer_table, imp_layers,
+        thres_layers, and via_cut_layer.
+    """
+    if config is None:
+        config = _config
+
+    lay_set = set()
+    for lay in config['layer_name'].values():
+        lay_set.add(_get_lay_purp(lay))
+    for lay in config['mos_layer_table'].values():
+        if lay is not None:
+            lay_set.add(_get_lay_purp(lay))
+    for lay in config.get('via_cut_layer', {}).values():
+        lay_set.add(_get_lay_purp(lay))
+    mos_config = config['mos']
+    for imp_table in mos_config['imp_layers'].values():
+        lay_set.update(imp_table.keys())
+    for thres_table in mos_config['thres_layers'].values():
+        for lay_table in thres_table.values():
+            lay_set.update(lay_table.keys())
+    return lay_set
+
+
+class GDSLayerMap(object):
+    """A mapping from layer/purpose pairs to GDS layer/datatype numbers.
+
+    Parameters
+    ----------
+    lay_map : Dict[Tuple[str, str], Tuple[int, int]]
+        the layer map dictionary.
+    """
+
+    def __init__(self, lay_map):
+        # type: (Dict[Tuple[str, str], Tuple[int, int]]) -> None
+        self._lay_map = dict(lay_map)
+
+    @classmethod
+    def from_file(cls, fname):
+        # type: (str) -> GDSLayerMap
+        """Parse a stream layer map file.
+
+        Each non-comment line of the file has the format "layer purpose gds_layer gds_datatype".
+        """
+        lay_map = {}
+        with open(fname, 'r') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                parts = line.split()
+                if len(parts) < 4:
+                    raise ValueError('Invalid layer map line: %s' % line)
+                lay_map[(parts[0], parts[1])] = (int(parts[2]), int(parts[3]))
+        return cls(lay_map)
+
+    def __contains__(self, layer):
+        # type: (LayerType) -> bool
+        return _get_lay_purp(layer) in self._lay_map
+
+    def get(self, layer):
+        # type: (LayerType) -> Optional[Tuple[int, int]]
+        return self._lay_map.get(_get_lay_purp(layer), None)
+
+    def get_missing_layers(self, config=None):
+        # type: (Optional[Dict[str, Any]]) -> List[Tuple[str, str]]
+        """Returns the technology layer/purpose pairs that are not in this layer map."""
+        return sorted(lay for lay in get_tech_layers(config) if lay not in self._lay_map)
+
+
+class GDSWriter(object):
+    """A streaming GDSII writer.
+
+    Each cell is written to the output file as soon as it is finalized, so memory usage is
+    bounded by the largest single cell instead of the whole hierarchy.  Vias are expanded
+    into cut and enclosure rectangles using the via_cut_layer and via_id tables of the
+    technology parameters.
+
+    Parameters
+    ----------
+    fname : str
+        the output file name.
+    lib_name : str
+        the GDS library name.
+    lay_map : GDSLayerMap
+        the layer map.
+    config : Optional[Dict[str, Any]]
+        the technology parameters dictionary.  Defaults to tech_params.yaml.
+    skip_unmapped : bool
+        True to silently drop shapes on layers missing from the layer map.  Otherwise
+        a ValueError is raised.
+    merge_layers : Optional[Iterable[LayerType]]
+        if given, write_content_list() merges rectangles of these layers across the cell
+        hierarchy with merge_content_list() and verifies the result.  Use get_merge_layers()
+        for the implant and threshold layers.
+    """
+
+    def __init__(self, fname, lib_name, lay_map, config=None, skip_unmapped=False, merge_layers=None):
+        # type: (str, str, GDSLayerMap, Optional[Dict[str, Any]], bool, Optional[Iterable[LayerType]]) -> None
+        if config is None:
+            config = _config
+
+        self._config = config
+        self._merge_layers = None if merge_layers is None else [_get_lay_purp(lay) for lay in merge_layers]
+        self._lay_map = lay_map
+        self._skip_unmapped = skip_unmapped
+        self._res = config['resolution']
+        self._via_cut_layer = config.get('via_cut_layer', {})
+        self._via_layers = {via_id: (_get_lay_purp(bot_lay), _get_lay_purp(top_lay))
+                            for (bot_lay, top_lay), via_id in config['via_id'].items()}
+        self._cur_cell = None  # type: Optional[str]
+        self._cells = set()  # type: Set[str]
+        self._inst_cells = set()  # type: Set[str]
+        self._unmapped = set()  # type: Set[Tuple[str, str]]
+        self._num_shapes = 0
+        self._stream = open(fname, 'wb')  # type: BinaryIO
+
+        timestamp = self._timestamp()
+        self._write_record(_HEADER, struct.pack('>h', 600))
+        self._write_record(_BGNLIB, timestamp + timestamp)
+        self._write_str(_LIBNAME, lib_name)
+        self._write_record(_UNITS, _real8(self._res) + _real8(self._res * config['layout_unit']))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def num_shapes(self):
+        # type: () -> int
+        return self._num_shapes
+
+    @property
+    def unmapped_layers(self):
+        # type: () -> Set[Tuple[str, str]]
+        """The layers that had shapes dropped because they are not in the layer map."""
+        return self._unmapped
+
+    @property
+    def undefined_cells(self):
+        # type: () -> Set[str]
+        """Cells that are instantiated but not written to this file so far."""
+        return self._inst_cells - self._cells
+
+    @staticmethod
+    def _timestamp():
+        # type: () -> bytes
+        t = time.localtime()
+        return struct.pack('>6h', t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec)
+
+    def _write_record(self, rec_type, data=b''):
+        # type: (int, bytes) -> None
+        if len(data) > _MAX_RECORD_DATA:
+            raise ValueError('GDS record of %d bytes exceeds the maximum of %d bytes.' %
+                             (len(data), _MAX_RECORD_DATA))
+        self._stream.write(struct.pack('>HH', len(data) + 4, rec_type))
+        self._stream.write(data)
+
+    def _write_str(self, rec_type, val):
+        # type: (int, str) -> None
+        data = val.encode('ascii')
+        if len(data) % 2 != 0:
+            data += b'\x00'
+        self._write_record(rec_type, data)
+
+    def _write_xy(self, xy_list):
+        # type: (Iterable[int]) -> None
+        data = list(xy_list)
+        self._write_record(_XY, struct.pack('>%di' % len(data), *data))
+
+    def _write_strans(self, orient):
+        # type: (str) -> None
+        try:
+            reflect, angle = _orient_table[orient]
+        except KeyError:
+            raise ValueError('Unsupported orientation: %s' % orient)
+        if reflect or angle:
+            self._write_record(_STRANS, struct.pack('>H', 0x8000 if reflect else 0))
+            if angle:
+                self._write_record(_ANGLE, _real8(angle))
+
+    def _get_gds_layer(self, layer):
+        # type: (LayerType) -> Optional[Tuple[int, int]]
+        gds_lay = self._lay_map.get(layer)
+        if gds_lay is None:
+            lay_purp = _get_lay_purp(layer)
+            if not self._skip_unmapped:
+                raise ValueError('Layer %s not in layer map.' % (lay_purp, ))
+            self._unmapped.add(lay_purp)
+        return gds_lay
+
+    def _to_unit(self, val):
+        # type: (float) -> int
+        return int(round(val / self._res))
+
+    def begin_cell(self, cell_name):
+        # type: (str) -> None
+        if self._cur_cell is not None:
+            raise ValueError('Cell %s is not finished yet.' % self._cur_cell)
+        self._cur_cell = cell_name
+        self._cells.add(cell_name)
+        timestamp = self._timestamp()
+        self._write_record(_BGNSTR, timestamp + timestamp)
+        self._write_str(_STRNAME, cell_name)
+
+    def end_cell(self):
+        # type: () -> None
+        if self._cur_cell is None:
+            raise ValueError('No cell to end.')
+        self._write_record(_ENDSTR)
+        self._cur_cell = None
+
+    def add_rect(self, layer, xl, yb, xr, yt):
+        # type: (LayerType, int, int, int, int) -> None
+        """Add a rectangle to the current cell.  Coordinates are in resolution units."""
+        gds_lay = self._get_gds_layer(layer)
+        if gds_lay is None:
+            return
+        self._write_record(_BOUNDARY)
+        self._write_record(_LAYER, struct.pack('>h', gds_lay[0]))
+        self._write_record(_DATATYPE, struct.pack('>h', gds_lay[1]))
+        self._write_xy((xl, yb, xr, yb, xr, yt, xl, yt, xl, yb))
+        self._write_record(_ENDEL)
+        self._num_shapes += 1
+
+    def add_polygon(self, layer, points):
+        # type: (LayerType, List[Tuple[int, int]]) -> None
+        """Add a polygon to the current cell.  Coordinates are in resolution units.
+
+        Rectilinear polygons with more vertices than a GDS XY record can hold are written
+        as rectangles.
+
+        Raises
+        ------
+        ValueError
+            if a polygon that is not rectilinear has too many vertices.
+        """
+        gds_lay = self._get_gds_layer(layer)
+        if gds_lay is None:
+            return
+        if len(points) >= _MAX_XY_POINTS:
+            from .drc.merge import polygon_to_rects
+
+            for xl, yb, xr, yt in polygon_to_rects(points):
+                self.add_rect(layer, xl, yb, xr, yt)
+            return
+        xy_list = []
+        for x, y in points:
+            xy_list.append(x)
+            xy_list.append(y)
+        xy_list.append(points[0][0])
+        xy_list.append(points[0][1])
+        self._write_record(_BOUNDARY)
+        self._write_record(_LAYER, struct.pack('>h', gds_lay[0]))
+        self._write_record(_DATATYPE, struct.pack('>h', gds_lay[1]))
+        self._write_xy(xy_list)
+        self._write_record(_ENDEL)
+        self._num_shapes += 1
+
+    def add_path(self, layer, width, points, end_style='truncate'):
+        # type: (LayerType, int, List[Tuple[int, int]], str) -> None
+        """Add a path to the current cell.  Coordinates and width are in resolution units."""
+        try:
+            path_type = _path_type_table[end_style]
+        except KeyError:
+            raise ValueError('Unsupported path end style: %s' % end_style)
+        gds_lay = self._get_gds_layer(layer)
+        if gds_lay is None:
+            return
+        xy_list = []
+        for x, y in points:
+            xy_list.append(x)
+            xy_list.append(y)
+        self._write_record(_PATH)
+        self._write_record(_LAYER, struct.pack('>h', gds_lay[0]))
+        self._write_record(_DATATYPE, struct.pack('>h', gds_lay[1]))
+        self._write_record(_PATHTYPE, struct.pack('>h', path_type))
+        self._write_record(_WIDTH, struct.pack('>i', width))
+        self._write_xy(xy_list)
+        self._write_record(_ENDEL)
+        self._num_shapes += 1
+
+    def add_via(self, via_id, xc, yc, cut_width, cut_height, enc1, enc2, num_rows=1, num_cols=1,
+                sp_rows=0, sp_cols=0):
+        # type: (str, int, int, int, int, List[int], List[int], int, int, int, int) -> None
+        """Add a via to the current cell, expanded into cut and metal rectangles.
+
+        All coordinates are in resolution units.  Enclosures are given as
+        [left, right, top, bottom], the same as add_via_primitive().
+        """
+        bot_lay, top_lay = self._via_layers[via_id]
+        arr_w = num_cols * cut_width + (num_cols - 1) * sp_cols
+        arr_h = num_rows * cut_height + (num_rows - 1) * sp_rows
+        arr_xl = xc - arr_w // 2
+        arr_yb = yc - arr_h // 2
+        arr_xr = arr_xl + arr_w
+        arr_yt = arr_yb + arr_h
+
+        self.add_rect(bot_lay, arr_xl - enc1[0], arr_yb - enc1[3], arr_xr + enc1[1], arr_yt + enc1[2])
+        self.add_rect(top_lay, arr_xl - enc2[0], arr_yb - enc2[3], arr_xr + enc2[1], arr_yt + enc2[2])
+        cut_lay = self._via_cut_layer[via_id]
+        for ridx in range(num_rows):
+            cut_yb = arr_yb + ridx * (cut_height + sp_rows)
+            for cidx in range(num_cols):
+                cut_xl = arr_xl + cidx * (cut_width + sp_cols)
+                self.add_rect(cut_lay, cut_xl, cut_yb, cut_xl + cut_width, cut_yb + cut_height)
+
+    def add_instance(self, cell_name, x, y, orient='R0', num_rows=1, num_cols=1, sp_rows=0, sp_cols=0):
+        # type: (str, int, int, str, int, int, int, int) -> None
+        """Add an instance or instance array to the current cell.  Coordinates are in resolution units."""
+        self._inst_cells.add(cell_name)
+        if num_rows == 1 and num_cols == 1:
+            self._write_record(_SREF)
+            self._write_str(_SNAME, cell_name)
+            self._write_strans(orient)
+            self._write_xy((x, y))
+        else:
+            self._write_record(_AREF)
+            self._write_str(_SNAME, cell_name)
+            self._write_strans(orient)
+            self._write_record(_COLROW, struct.pack('>hh', num_cols, num_rows))
+            self._write_xy((x, y, x + num_cols * sp_cols, y, x, y + num_rows * sp_rows))
+        self._write_record(_ENDEL)
+
+    def add_label(self, layer, text, x, y):
+        # type: (LayerType, str, int, int) -> None
+        """Add a text label to the current cell.  Coordinates are in resolution units."""
+        gds_lay = self._get_gds_layer(layer)
+        if gds_lay is None:
+            return
+        self._write_record(_TEXT)
+        self._write_record(_LAYER, struct.pack('>h', gds_lay[0]))
+        self._write_record(_TEXTTYPE, struct.pack('>h', gds_lay[1]))
+        self._write_xy((x, y))
+        self._write_str(_STRING, text)
+        self._write_record(_ENDEL)
+
+    def write_content(self, content):
+        # type: (Tuple[Any, ...]) -> None
+        """Write a single cell from a layout content tuple.
+
+        The content tuple is the per-cell entry of the content list passed to
+        TemplateDB.create_masters_in_db(), that is, (cell_name, inst_list, rect_list,
+        via_list, pin_list, path_list, blockage_list, boundary_list, polygon_list).
+        Missing trailing entries are treated as empty.  Coordinates in the content are
+        in layout units.
+
+        Raises
+        ------
+        ValueError
+            if the cell has blockages or boundaries, which have no GDS equivalent.
+        """
+        content = tuple(content) + ([], ) * (9 - len(content))
+        (cell_name, inst_list, rect_list, via_list, pin_list, path_list, blockage_list,
+         boundary_list, polygon_list) = content[:9]
+        if blockage_list or boundary_list:
+            raise ValueError('Cell %s has blockages or boundaries, which cannot be written to GDS.' %
+                             cell_name)
+        to_unit = self._to_unit
+
+        self.begin_cell(cell_name)
+        for inst in inst_list:
+            x, y = inst['loc']
+            self.add_instance(inst['cell'], to_unit(x), to_unit(y), orient=inst.get('orient', 'R0'),
+                              num_rows=inst.get('num_rows', 1), num_cols=inst.get('num_cols', 1),
+                              sp_rows=to_unit(inst.get('sp_rows', 0)),
+                              sp_cols=to_unit(inst.get('sp_cols', 0)))
+        for rect in rect_list:
+            (xl, yb), (xr, yt) = rect['bbox']
+            xl, yb, xr, yt = to_unit(xl), to_unit(yb), to_unit(xr), to_unit(yt)
+            spx, spy = to_unit(rect.get('arr_spx', 0)), to_unit(rect.get('arr_spy', 0))
+            for xidx in range(rect.get('arr_nx', 1)):
+                dx = xidx * spx
+                for yidx in range(rect.get('arr_ny', 1)):
+                    dy = yidx * spy
+                    self.add_rect(rect['layer'], xl + dx, yb + dy, xr + dx, yt + dy)
+        for via in via_list:
+            if via.get('orient', 'R0') != 'R0':
+                raise ValueError('Only R0 vias are supported, got %s' % via['orient'])
+            x, y = via['loc']
+            x, y = to_unit(x), to_unit(y)
+            spx, spy = to_unit(via.get('arr_spx', 0)), to_unit(via.get('arr_spy', 0))
+            enc1 = [to_unit(v) for v in via['enc1']]
+            enc2 = [to_unit(v) for v in via['enc2']]
+            for xidx in range(via.get('arr_nx', 1)):
+                for yidx in range(via.get('arr_ny', 1)):
+                    self.add_via(via['id'], x + xidx * spx, y + yidx * spy,
+                                 to_unit(via['cut_width']), to_unit(via['cut_height']), enc1, enc2,
+                                 num_rows=via.get('num_rows', 1), num_cols=via.get('num_cols', 1),
+                                 sp_rows=to_unit(via.get('sp_rows', 0)),
+                                 sp_cols=to_unit(via.get('sp_cols', 0)))
+        for pin in pin_list:
+            (xl, yb), (xr, yt) = pin['bbox']
+            xl, yb, xr, yt = to_unit(xl), to_unit(yb), to_unit(xr), to_unit(yt)
+            if pin.get('make_rect', True):
+                self.add_rect(pin['layer'], xl, yb, xr, yt)
+            self.add_label(pin['layer'], pin.get('label', pin['net_name']), (xl + xr) // 2, (yb + yt) // 2)
+        for path in path_list:
+            points = [(to_unit(x), to_unit(y)) for x, y in path['points']]
+            self.add_path(path['layer'], to_unit(path['width']), points,
+                          end_style=path.get('end_style', 'truncate'))
+        for poly in polygon_list:
+            self.add_polygon(poly['layer'], [(to_unit(x), to_unit(y)) for x, y in poly['points']])
+        self.end_cell()
+
+    def write_content_list(self, content_list):
+        # type: (Iterable[Tuple[Any, ...]]) -> None
+        """Write cells from an iterable of layout content tuples, one cell at a time.
+
+        Cells should be ordered bottom-up, the same order TemplateDB produces them in.
+        Passing a generator keeps only one cell in memory at a time.  Instances of cells
+        that are never written are reported by close().  If merge_layers is set, all cells
+        are merged first, so the whole content list is kept in memory.
+        """
+        if self._merge_layers is not None:
+            from .drc.merge import merge_content_list
+
+            content_list = merge_content_list(content_list, layers=self._merge_layers, config=self._config)
+        for content in content_list:
+            self.write_content(content)
+
+    def close(self):
+        # type: () -> None
+        if self._stream.closed:
+            return
+        if self._cur_cell is not None:
+            self.end_cell()
+        self._write_record(_ENDLIB)
+        self._stream.close()
+        undefined = self.undefined_cells
+        if undefined:
+            warnings.warn('GDS file has instances of undefined cells: %s' % ', '.join(sorted(undefined)))
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, List, Tuple, Optional, Set
+
+import os
+
+# (layer, purpose, horizontal enclosure, vertical enclosure)
+LayerEntry = Tuple[str, str, int, int]
+
+_prim_lib_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'BAG_prim')
+
+
+def get_prim_flavors(lib_dir=None):
+    # type: (Optional[str]) -> Optional[Set[str]]
+    """Returns the transistor threshold flavors of the BAG_prim library.
+
+    Flavors are parsed from the nmos4_<flavor> and pmos4_<flavor> cell names.
+
+    Parameters
+    ----------
+    lib_dir : Optional[str]
+        the BAG_prim library directory.  Defaults to the one shipped with this package.
+
+    Returns
+    -------
+    flavors : Optional[Set[str]]
+        the flavor names, or None if the library directory does not exist.
+    """
+    if lib_dir is None:
+        lib_dir = _prim_lib_dir
+    if not os.path.isdir(lib_dir):
+        return None
+    flavors = set()
+    for cell_name in os.listdir(lib_dir):
+        for prefix in ('nmos4_', 'pmos4_'):
+            if cell_name.startswith(prefix):
+                flavors.add(cell_name[len(prefix):])
+    return flavors
+
+
+def _compile_layers(lay_table):
+    # type: (Dict[Tuple[str, str], List[int]]) -> Tuple[LayerEntry, ...]
+    return tuple((lay, purp, enc[0], enc[1]) for (lay, purp), enc in lay_table.items())
+
+
+class MOSLayerTable(object):
+    """Implant and threshold layers of each (mos_type, threshold), compiled from the mos section.
+
+    The nested imp_layers and thres_layers tables are flattened once into tuples of
+    (layer, purpose, x_enc, y_enc) entries, implant layers first.
+
+    Parameters
+    ----------
+    config : Dict[str, Any]
+        the technology parameters dictionary.
+    prim_flavors : Optional[Set[str]]
+        the threshold flavors of the primitive library.  If given, every threshold in
+        thres_layers must be one of them.
+    """
+
+    def __init__(self, config, prim_flavors=None):
+        # type: (Dict[str, Any], Optional[Set[str]]) -> None
+        mos_config = config['mos']
+        self._imp = {mos_type: _compile_layers(lay_table)
+                     for mos_type, lay_table in mos_config['imp_layers'].items()}
+        self._thres = {}  # type: Dict[Tuple[str, str], Tuple[LayerEntry, ...]]
+        self._table = {}  # type: Dict[Tuple[str, str], Tuple[LayerEntry, ...]]
+        thres_set = set()
+        for mos_type, thres_table in mos_config['thres_layers'].items():
+            if mos_type not in self._imp:
+                raise ValueError('mos_type %s has threshold layers but no implant layers.' % mos_type)
+            for threshold, lay_table in thres_table.items():
+                if prim_flavors is not None and threshold not in prim_flavors:
+                    raise ValueError('Threshold %s of mos_type %s is not a BAG_prim flavor %s.' %
+                                     (threshold, mos_type, sorted(prim_flavors)))
+                thres_set.add(threshold)
+                key = (mos_type, threshold)
+                self._thres[key] = _compile_layers(lay_table)
+                self._table[key] = self._imp[mos_type] + self._thres[key]
+
+        self._imp_lays = {key: tuple(entry[:2] for entry in val) for key, val in self._imp.items()}
+        self._thres_lays = {key: tuple(entry[:2] for entry in val) for key, val in self._thres.items()}
+        if prim_flavors is None:
+            self._missing = []  # type: List[str]
+        else:
+            self._missing = sorted(prim_flavors - thres_set)
+
+    @property
+    def missing_flavors(self):
+        # type: () -> List[str]
+        """BAG_prim flavors without threshold layers.  Rows of these flavors cannot be drawn."""
+        return self._missing
+
+    def _get_key(self, mos_type, threshold):
+        # type: (str, str) -> Tuple[str, str]
+        key = (mos_type, threshold)
+        if key not in self._table:
+            raise ValueError('No implant/threshold layers for mos_type %s, threshold %s.  '
+                             'Valid keys: %s' % (mos_type, threshold, sorted(self._table.keys())))
+        return key
+
+    def get_layer_info(self, mos_type, threshold):
+        # type: (str, str) -> Tuple[LayerEntry, ...]
+        """Returns the implant then threshold layer entries of the given transistor."""
+        return self._table[self._get_key(mos_type, threshold)]
+
+    def get_implant_layers(self, mos_type):
+        # type: (str) -> Tuple[Tuple[str, str], ...]
+        try:
+            return self._imp_lays[mos_type]
+        except KeyError:
+            raise ValueError('No implant layers for mos_type %s.' % mos_type)
+
+    def get_threshold_layers(self, mos_type, threshold):
+        # type: (str, str) -> Tuple[Tuple[str, str], ...]
+        return self._thres_lays[self._get_key(mos_type, threshold)]
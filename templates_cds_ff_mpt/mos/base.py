@@ -1,25 +1,76 @@
 # -*- coding: utf-8 -*-
 
-from typing import TYPE_CHECKING, Dict, Any, List, Tuple, Union, Optional
+from typing import TYPE_CHECKING, Dict, Any, List, Tuple, Union, Optional, Callable
 
+import copy
 from itertools import chain, repeat
 
 from bag.math import lcm
-from bag.layout.util import BBox
 from bag.layout.template import TemplateBase
 from bag.layout.routing import WireArray, TrackID
 
 from abs_templates_ec.analog_mos.finfet import MOSTechFinfetBase
 
+from .shapes import MOSShapeBuffer
+from .cache import MOSInfoCache, freeze_params
+
 if TYPE_CHECKING:
     from bag.layout.tech import TechInfoConfig
 
 
+def _get_mos_tech(tech_info):
+    # type: (TechInfoConfig) -> MOSTechCDSFFMPT
+    """Unpickle helper; returns the MOSTech object owned by the given technology information."""
+    return tech_info.mos_tech
+
+
 class MOSTechCDSFFMPT(MOSTechFinfetBase):
 
     def __init__(self, config, tech_info):
         # type: (Dict[str, Any], TechInfoConfig) -> None
         MOSTechFinfetBase.__init__(self, config, tech_info)
+        self._info_cache = MOSInfoCache()
+
+    def __reduce__(self):
+        # pickle as a reference to the technology information, which itself pickles
+        # as a reference to the technology configuration file.
+        return _get_mos_tech, (self.tech_info,)
+
+    @property
+    def info_cache(self):
+        # type: () -> MOSInfoCache
+        """The row information cache.  Set info_cache.enabled to reuse row information between layouts."""
+        return self._info_cache
+
+    def _get_cached(self, key, compute_fn, *args, **kwargs):
+        # type: (Tuple[Any, ...], Callable[..., Any], *Any, **Any) -> Any
+        """Returns compute_fn(*args, **kwargs), from the information cache if it is enabled."""
+        cache = self._info_cache
+        if not cache.enabled:
+            return compute_fn(*args, **kwargs)
+        try:
+            key += (freeze_params(kwargs),)
+        except TypeError:
+            # unhashable options, always recompute.
+            return compute_fn(*args, **kwargs)
+        return cache.get(key, lambda: compute_fn(*args, **kwargs))
+
+    def _copy_info(self, info):
+        # type: (Dict[str, Any]) -> Dict[str, Any]
+        # cached layout_info and ext_info dictionaries are shared, and callers may modify them.
+        return copy.deepcopy(info) if self._info_cache.enabled else info
+
+    def get_mos_info(self, lch_unit, w, mos_type, threshold, fg, **kwargs):
+        # type: (int, int, str, str, int, **kwargs) -> Dict[str, Any]
+        return self._copy_info(self._get_cached(('mos', lch_unit, w, mos_type, threshold, fg),
+                                                MOSTechFinfetBase.get_mos_info, self, lch_unit, w, mos_type,
+                                                threshold, fg, **kwargs))
+
+    def get_sub_info(self, lch_unit, w, mos_type, threshold, fg, **kwargs):
+        # type: (int, int, str, str, int, **kwargs) -> Dict[str, Any]
+        return self._copy_info(self._get_cached(('sub', lch_unit, w, mos_type, threshold, fg),
+                                                MOSTechFinfetBase.get_sub_info, self, lch_unit, w, mos_type,
+                                                threshold, fg, **kwargs))
 
     def get_conn_yloc_info(self, lch_unit, od_y, md_y, is_sub):
         # type: (int, Tuple[int, int], Tuple[int, int], bool) -> Dict[str, Any]
@@ -274,11 +325,10 @@ class MOSTechCDSFFMPT(MOSTechFinfetBase):
             d_conn_y=(m3_yb, m3_yt),
         )
 
-    def up_one_layer(self, template, cur_lay, cur_y, via_dim, via_sp, via_ble, via_tle,
+    def up_one_layer(self, shapes, cur_lay, cur_y, via_dim, via_sp, via_ble, via_tle,
                      via_x_list, prev_info, conn_drc_info):
         """A helper method that draws vias to connect to upper layer."""
 
-        res = self.res
         lay_name_table = self.config['layer_name']
         via_id_table = self.config['via_id']
 
@@ -321,40 +371,25 @@ class MOSTechCDSFFMPT(MOSTechFinfetBase):
         # draw vias and wire(s)
         enc1 = [bot_encx, bot_encx, bot_ency, bot_ency]
         enc2 = [top_encx, top_encx, top_ency, top_ency]
-        for via_xc in via_x_list:
-            template.add_via_primitive(via_id, [via_xc, via_yc], num_rows=num_rows, sp_rows=via_sp,
-                                       enc1=enc1, enc2=enc2, cut_width=via_w, cut_height=via_h,
-                                       unit_mode=True)
-            if cur_dir == 'y':
-                template.add_rect(cur_lay_name, BBox(via_xc - cur_w // 2, cur_yb, via_xc + cur_w // 2, cur_yt,
-                                                     res, unit_mode=True))
-        if cur_dir == 'x':
-            template.add_rect(cur_lay_name, BBox(cur_xl, cur_yb, cur_xr, cur_yt, res, unit_mode=True))
+        shapes.add_vias(via_id, via_x_list, via_yc, enc1, enc2, via_w, via_h, num_rows=num_rows, sp_rows=via_sp)
+        if cur_dir == 'y':
+            shapes.add_rects(cur_lay_name, [via_xc - cur_w // 2 for via_xc in via_x_list], cur_yb,
+                             [via_xc + cur_w // 2 for via_xc in via_x_list], cur_yt)
+        else:
+            shapes.add_rect(cur_lay_name, cur_xl, cur_yb, cur_xr, cur_yt)
 
         # setup next iteration
         return cur_yb, cur_yt, cur_dir, cur_w, cur_lay_name
 
-    def draw_ds_connection(self,  # type: MOSTechCDSFFMPT
-                           template,  # type: TemplateBase
-                           lch_unit,  # type: int
-                           fg,  # type: int
-                           wire_pitch,  # type: int
-                           xc,  # type: int
-                           od_y,  # type: Tuple[int, int]
-                           md_y,  # type: Tuple[int, int]
-                           dum_x_list,  # type: List[int]
-                           conn_x_list,  # type: List[int]
-                           align_gate,  # type: bool
-                           wire_dir,  # type: int
-                           ds_code,  # type: int
-                           **kwargs
-                           ):
-        # type: (...) -> Tuple[List[WireArray], List[WireArray]]
-
-        is_dum = kwargs.get('is_dum', False)
+    def _get_ds_geometry(self, lch_unit, fg, wire_pitch, xc, od_y, md_y, align_gate, ds_code, is_dum):
+        # type: (...) -> Tuple[MOSShapeBuffer, Optional[Tuple[int, int]], Optional[Tuple[int, int]]]
+        """Draws a drain/source connection into a new shape buffer.
 
-        res = self.res
+        Returns the shape buffer, and the Y intervals of the dummy and transistor connection
+        ports, or None if the connection does not reach that layer.
+        """
         mos_lay_table = self.config['mos_layer_table']
+        shapes = MOSShapeBuffer(self.res)
 
         mos_constants = self.get_mos_tech_constants(lch_unit)
         md_w = mos_constants['md_w']
@@ -367,7 +402,6 @@ class MOSTechCDSFFMPT(MOSTechFinfetBase):
 
         dum_layer = self.get_dum_conn_layer()
         mos_layer = self.get_mos_conn_layer()
-        dum_warrs, conn_warrs = [], []
 
         # figure out via X coordinates
         if is_sub:
@@ -390,42 +424,70 @@ class MOSTechCDSFFMPT(MOSTechFinfetBase):
         for cur_lay, cur_y, via_dim, via_sp, via_ble, via_tle in \
                 zip(lay_list, conn_y_list, via_info['dim'], via_info['sp'],
                     via_info['bot_enc_le'], via_info['top_enc_le']):
-            prev_info = self.up_one_layer(template, cur_lay, cur_y, via_dim, via_sp, via_ble, via_tle,
+            prev_info = self.up_one_layer(shapes, cur_lay, cur_y, via_dim, via_sp, via_ble, via_tle,
                                           via_x_list, prev_info, conn_drc_info)
 
+        dum_y = conn_y_list[dum_layer - bot_layer] if stop_layer >= dum_layer else None
+        conn_y = conn_y_list[mos_layer - bot_layer] if stop_layer >= mos_layer else None
+        return shapes, dum_y, conn_y
+
+    def draw_ds_connection(self,  # type: MOSTechCDSFFMPT
+                           template,  # type: TemplateBase
+                           lch_unit,  # type: int
+                           fg,  # type: int
+                           wire_pitch,  # type: int
+                           xc,  # type: int
+                           od_y,  # type: Tuple[int, int]
+                           md_y,  # type: Tuple[int, int]
+                           dum_x_list,  # type: List[int]
+                           conn_x_list,  # type: List[int]
+                           align_gate,  # type: bool
+                           wire_dir,  # type: int
+                           ds_code,  # type: int
+                           **kwargs
+                           ):
+        # type: (...) -> Tuple[List[WireArray], List[WireArray]]
+
+        is_dum = kwargs.get('is_dum', False)
+        shapes = kwargs.get('shapes', None)
+
+        res = self.res
+        key = ('ds', lch_unit, fg, wire_pitch, xc, tuple(od_y), tuple(md_y), align_gate, ds_code, is_dum)
+        conn_shapes, dum_y, conn_y = self._get_cached(key, self._get_ds_geometry, lch_unit, fg, wire_pitch, xc,
+                                                      od_y, md_y, align_gate, ds_code, is_dum)
+        if shapes is None:
+            buf = MOSShapeBuffer(res)
+            buf.add_buffer(conn_shapes)
+            buf.flush(template)
+        else:
+            shapes.add_buffer(conn_shapes)
+
         # add WireArrays
-        if stop_layer >= dum_layer:
-            cur_yb, cur_yt = conn_y_list[dum_layer - bot_layer]
+        dum_warrs, conn_warrs = [], []
+        if dum_y is not None:
+            dum_layer = self.get_dum_conn_layer()
             for conn_xc in dum_x_list:
                 tidx = template.grid.coord_to_track(dum_layer, conn_xc, unit_mode=True)
-                dum_warrs.append(WireArray(TrackID(dum_layer, tidx), cur_yb * res, cur_yt * res, res))
-        if stop_layer >= mos_layer:
-            cur_yb, cur_yt = conn_y_list[mos_layer - bot_layer]
+                dum_warrs.append(WireArray(TrackID(dum_layer, tidx), dum_y[0] * res, dum_y[1] * res, res))
+        if conn_y is not None:
+            mos_layer = self.get_mos_conn_layer()
             for conn_xc in conn_x_list:
                 tidx = template.grid.coord_to_track(mos_layer, conn_xc, unit_mode=True)
-                conn_warrs.append(WireArray(TrackID(mos_layer, tidx), cur_yb * res, cur_yt * res, res))
+                conn_warrs.append(WireArray(TrackID(mos_layer, tidx), conn_y[0] * res, conn_y[1] * res, res))
 
         return dum_warrs, conn_warrs
 
-    def draw_g_connection(self,  # type: MOSTechCDSFFMPT
-                          template,  # type: TemplateBase
-                          lch_unit,  # type: int
-                          fg,  # type: int
-                          sd_pitch,  # type: int
-                          xc,  # type: int
-                          od_y,  # type: Tuple[int, int]
-                          md_y,  # type: Tuple[int, int]
-                          conn_x_list,  # type: List[int]
-                          is_sub=False,  # type: bool
-                          **kwargs
-                          ):
-        # type: (...) -> List[WireArray]
+    def _get_g_geometry(self, lch_unit, fg, sd_pitch, xc, od_y, md_y, conn_x_list, is_sub, is_dum):
+        # type: (...) -> Tuple[MOSShapeBuffer, Tuple[int, int], List[int], Optional[Tuple[int, int]]]
+        """Draws a gate connection into a new shape buffer.
 
-        is_dum = kwargs.get('is_dum', False)
-        res = self.res
+        Returns the shape buffer, the Y interval and X coordinates of the M1 gate wires,
+        and the Y interval of the connection ports, or None if there are no ports.
+        """
         mos_lay_table = self.config['mos_layer_table']
         lay_name_table = self.config['layer_name']
         via_id_table = self.config['via_id']
+        shapes = MOSShapeBuffer(self.res)
 
         mos_constants = self.get_mos_tech_constants(lch_unit)
         mp_po_ovl_constants = mos_constants['mp_po_ovl_constants']
@@ -437,12 +499,12 @@ class MOSTechCDSFFMPT(MOSTechFinfetBase):
         conn_yloc_info = self.get_conn_yloc_info(lch_unit, od_y, md_y, is_sub)
         conn_drc_info = self.get_conn_drc_info(lch_unit, 'g')
 
-        conn_warrs = []
-
         mp_lay = mos_lay_table['MP']
         m1_w = conn_drc_info[1]['w']
         mp_y_list = conn_yloc_info['mp_y_list']
         v0_id = via_id_table[(mos_lay_table['MP'], lay_name_table[1])]
+        m1_x_list = []  # type: List[int]
+        conn_y = None
         if is_sub:
             mp_po_ovl = mp_po_ovl_constants_sub[0] + lch_unit * mp_po_ovl_constants_sub[1]
             # connect gate to M1 only
@@ -456,16 +518,14 @@ class MOSTechCDSFFMPT(MOSTechFinfetBase):
             mp_dx = sd_pitch // 2 - lch_unit // 2 + mp_po_ovl
             enc1 = [bot_encx, bot_encx, bot_ency, bot_ency]
             enc2 = [top_encx, top_encx, top_ency, top_ency]
-            for via_xc in range(xc, xc + (fg + 1) * sd_pitch, 2 * sd_pitch):
-                mp_xl = via_xc - mp_dx
-                mp_xr = via_xc + mp_dx
-                for mp_yb, mp_yt in mp_y_list:
-                    template.add_rect(mp_lay, BBox(mp_xl, mp_yb, mp_xr, mp_yt, res, unit_mode=True))
-                    mp_yc = (mp_yb + mp_yt) // 2
-                    template.add_via_primitive(v0_id, [via_xc, mp_yc], enc1=enc1, enc2=enc2,
-                                               cut_width=via_w, cut_height=via_h, unit_mode=True)
-                template.add_rect('M1', BBox(via_xc - m1_w // 2, m1_yb, via_xc + m1_w // 2, m1_yt, res,
-                                             unit_mode=True))
+            via_x_list = list(range(xc, xc + (fg + 1) * sd_pitch, 2 * sd_pitch))
+            for mp_yb, mp_yt in mp_y_list:
+                shapes.add_rects(mp_lay, [via_xc - mp_dx for via_xc in via_x_list], mp_yb,
+                                 [via_xc + mp_dx for via_xc in via_x_list], mp_yt)
+                mp_yc = (mp_yb + mp_yt) // 2
+                shapes.add_vias(v0_id, via_x_list, mp_yc, enc1, enc2, via_w, via_h)
+            shapes.add_rects('M1', [via_xc - m1_w // 2 for via_xc in via_x_list], m1_yb,
+                             [via_xc + m1_w // 2 for via_xc in via_x_list], m1_yt)
         else:
             mp_po_ovl = mp_po_ovl_constants[0] + lch_unit * mp_po_ovl_constants[1]
 
@@ -500,15 +560,13 @@ class MOSTechCDSFFMPT(MOSTechFinfetBase):
                 mp_w = (num_fg - 1) * sd_pitch - lch_unit + 2 * mp_po_ovl
                 mp_xl = cur_xc - mp_w // 2
                 mp_xr = mp_xl + mp_w
-                template.add_rect(mp_lay, BBox(mp_xl, mp_yb, mp_xr, mp_yt, res, unit_mode=True))
-                # draw V0, M1
-                for via_xc in range(via_xoff, via_xoff + (num_fg - 1) * sd_pitch, sd_pitch):
-                    cur_tidx = template.grid.coord_to_track(1, via_xc, unit_mode=True)
-                    template.add_via_primitive(v0_id, [via_xc, via_yc], enc1=enc1, enc2=enc2,
-                                               cut_width=via_w, cut_height=via_h, unit_mode=True)
-                    template.add_wires(1, cur_tidx, m1_yb, m1_yt, unit_mode=True)
-                    via_x_list.append(via_xc)
+                shapes.add_rect(mp_lay, mp_xl, mp_yb, mp_xr, mp_yt)
+                # draw V0; M1 wires are added to the template
+                cur_x_list = list(range(via_xoff, via_xoff + (num_fg - 1) * sd_pitch, sd_pitch))
+                shapes.add_vias(v0_id, cur_x_list, via_yc, enc1, enc2, via_w, via_h)
+                via_x_list.extend(cur_x_list)
                 tot_fg += num_fg
+            m1_x_list = list(via_x_list)
 
             # connect from M1 up to M3 if not dummy gate connection
             if not is_dum:
@@ -518,17 +576,53 @@ class MOSTechCDSFFMPT(MOSTechFinfetBase):
                 for cur_lay, cur_y, via_dim, via_sp, via_ble, via_tle in \
                         zip(lay_list, conn_y_list, via_info['dim'][1:], via_info['sp'][1:],
                             via_info['bot_enc_le'][1:], via_info['top_enc_le'][1:]):
-                    prev_info = self.up_one_layer(template, cur_lay, cur_y, via_dim, via_sp, via_ble, via_tle,
+                    prev_info = self.up_one_layer(shapes, cur_lay, cur_y, via_dim, via_sp, via_ble, via_tle,
                                                   via_x_list, prev_info, conn_drc_info)
                     via_x_list = conn_x_list
+                conn_y = conn_y_list[-1]
 
-                # add ports
-                mos_layer = self.get_mos_conn_layer()
-                cur_yb, cur_yt = conn_y_list[-1]
-                for conn_xc in conn_x_list:
-                    tidx = template.grid.coord_to_track(mos_layer, conn_xc, unit_mode=True)
-                    conn_warrs.append(WireArray(TrackID(mos_layer, tidx), cur_yb * res, cur_yt * res, res))
+        return shapes, (m1_yb, m1_yt), m1_x_list, conn_y
 
+    def draw_g_connection(self,  # type: MOSTechCDSFFMPT
+                          template,  # type: TemplateBase
+                          lch_unit,  # type: int
+                          fg,  # type: int
+                          sd_pitch,  # type: int
+                          xc,  # type: int
+                          od_y,  # type: Tuple[int, int]
+                          md_y,  # type: Tuple[int, int]
+                          conn_x_list,  # type: List[int]
+                          is_sub=False,  # type: bool
+                          **kwargs
+                          ):
+        # type: (...) -> List[WireArray]
+
+        is_dum = kwargs.get('is_dum', False)
+        shapes = kwargs.get('shapes', None)
+        res = self.res
+
+        # conn_x_list sets the upper via locations, so it is part of the key.
+        key = ('g', lch_unit, fg, sd_pitch, xc, tuple(od_y), tuple(md_y), tuple(conn_x_list), is_sub, is_dum)
+        conn_shapes, m1_y, m1_x_list, conn_y = self._get_cached(key, self._get_g_geometry, lch_unit, fg, sd_pitch,
+                                                                xc, od_y, md_y, conn_x_list, is_sub, is_dum)
+        for via_xc in m1_x_list:
+            cur_tidx = template.grid.coord_to_track(1, via_xc, unit_mode=True)
+            template.add_wires(1, cur_tidx, m1_y[0], m1_y[1], unit_mode=True)
+
+        # add ports
+        conn_warrs = []
+        if conn_y is not None:
+            mos_layer = self.get_mos_conn_layer()
+            for conn_xc in conn_x_list:
+                tidx = template.grid.coord_to_track(mos_layer, conn_xc, unit_mode=True)
+                conn_warrs.append(WireArray(TrackID(mos_layer, tidx), conn_y[0] * res, conn_y[1] * res, res))
+
+        if shapes is None:
+            buf = MOSShapeBuffer(res)
+            buf.add_buffer(conn_shapes)
+            buf.flush(template)
+        else:
+            shapes.add_buffer(conn_shapes)
         return conn_warrs
 
     def draw_dum_connection_helper(self,
@@ -560,9 +654,13 @@ class MOSTechCDSFFMPT(MOSTechFinfetBase):
         m1_yt = conn_yloc_info['d_y_list'][0][1]
 
         # draw gate/drain/source connection to M1
-        self.draw_g_connection(template, lch_unit, fg, sd_pitch, xc, od_y, md_y, [], is_sub=False, is_dum=True)
-        self.draw_ds_connection(template, lch_unit, fg, sd_pitch, xc, od_y, md_y, [], [], False, 1, 1, is_dum=True)
-        self.draw_ds_connection(template, lch_unit, fg, sd_pitch, xc, od_y, md_y, [], [], True, 1, 2, is_dum=True)
+        shapes = MOSShapeBuffer(res)
+        self.draw_g_connection(template, lch_unit, fg, sd_pitch, xc, od_y, md_y, [], is_sub=False, is_dum=True,
+                               shapes=shapes)
+        self.draw_ds_connection(template, lch_unit, fg, sd_pitch, xc, od_y, md_y, [], [], False, 1, 1, is_dum=True,
+                                shapes=shapes)
+        self.draw_ds_connection(template, lch_unit, fg, sd_pitch, xc, od_y, md_y, [], [], True, 1, 2, is_dum=True,
+                                shapes=shapes)
 
         # short M1 together
         dum_layer = self.get_dum_conn_layer()
@@ -572,7 +670,8 @@ class MOSTechCDSFFMPT(MOSTechFinfetBase):
         xl = ds_x_list[0]
         xr = ds_x_list[-1]
         if xr > xl:
-            template.add_rect(m1_lay, BBox(xl, m1_yb, xr, m1_yb + g_m1_dum_h, res, unit_mode=True))
+            shapes.add_rect(m1_lay, xl, m1_yb, xr, m1_yb + g_m1_dum_h)
+        shapes.flush(template)
 
         # return gate ports
         return [WireArray(TrackID(dum_layer, tidx), m1_yb * res, m1_yt * res, res) for tidx in gate_tracks]
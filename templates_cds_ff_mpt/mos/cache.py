@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Tuple, Callable, Set, FrozenSet, Hashable
+
+from collections import OrderedDict
+
+
+def freeze_params(val):
+    # type: (Any) -> Hashable
+    """Returns a hashable copy of the given parameter value.
+
+    Dictionaries become sorted item tuples, lists become tuples and sets become frozensets.
+
+    Raises
+    ------
+    TypeError
+        if the value contains an unhashable object of another type.
+    """
+    if isinstance(val, dict):
+        return tuple(sorted((key, freeze_params(item)) for key, item in val.items()))
+    if isinstance(val, (list, tuple)):
+        return tuple(freeze_params(item) for item in val)
+    if isinstance(val, (set, frozenset)):
+        return frozenset(freeze_params(item) for item in val)
+    hash(val)
+    return val
+
+
+class InfoCacheDiff(object):
+    """Difference between the cache keys used by two consecutive layout generations.
+
+    Parameters
+    ----------
+    added : FrozenSet[Tuple[Any, ...]]
+        keys used only by the new generation.  These values were recomputed.
+    removed : FrozenSet[Tuple[Any, ...]]
+        keys used only by the previous generation.
+    reused : FrozenSet[Tuple[Any, ...]]
+        keys used by both generations.
+    num_hits : int
+        number of lookups served from the cache in the new generation.
+    num_misses : int
+        number of lookups computed in the new generation.
+    """
+
+    def __init__(self, added, removed, reused, num_hits, num_misses):
+        # type: (FrozenSet, FrozenSet, FrozenSet, int, int) -> None
+        self.added = added
+        self.removed = removed
+        self.reused = reused
+        self.num_hits = num_hits
+        self.num_misses = num_misses
+
+    def get_changed_rows(self):
+        # type: () -> Set[Tuple[Any, ...]]
+        """Returns the (lch_unit, w, mos_type, threshold, fg) of rows whose information was recomputed."""
+        return {key[1:6] for key in self.added if key[0] in ('mos', 'sub')}
+
+    def __repr__(self):
+        return ('%s(added=%d, removed=%d, reused=%d, hits=%d, misses=%d)' %
+                (self.__class__.__name__, len(self.added), len(self.removed), len(self.reused),
+                 self.num_hits, self.num_misses))
+
+
+class MOSInfoCache(object):
+    """Cache of transistor row information and connection shapes, reused between layout generations.
+
+    Caches the results of get_mos_info() and get_sub_info(), and the shapes computed by
+    draw_ds_connection() and draw_g_connection().  Entries are keyed by the row or
+    connection parameters, such as (lch_unit, w, mos_type, threshold, fg).  This only
+    saves the computation of these values; draw_mos() still draws every row, and row
+    information is deep-copied on every hit since callers modify it.  Cached values
+    are shared and must not be modified.
+
+    Each generation is bracketed by start_generation() and end_generation(), which
+    returns the keys that changed since the previous generation.  Entries unused for
+    max_generations generations are dropped.  Independent of generations, at most
+    max_entries entries are kept, dropping the least recently used ones first.  The
+    cache is disabled by default.
+
+    Parameters
+    ----------
+    max_generations : int
+        number of generations an unused entry is kept for.
+    max_entries : int
+        maximum number of entries.
+    """
+
+    def __init__(self, max_generations=2, max_entries=4096):
+        # type: (int, int) -> None
+        self.enabled = False
+        self._max_gen = max(1, max_generations)
+        self._max_entries = max(1, max_entries)
+        self._table = OrderedDict()  # type: OrderedDict
+        self._gen = 0
+        self._prev_keys = frozenset()  # type: FrozenSet[Tuple[Any, ...]]
+        self._cur_keys = set()  # type: Set[Tuple[Any, ...]]
+        self._num_hits = 0
+        self._num_misses = 0
+
+    def __len__(self):
+        return len(self._table)
+
+    @property
+    def generation(self):
+        # type: () -> int
+        return self._gen
+
+    def get(self, key, compute_fn):
+        # type: (Tuple[Any, ...], Callable[[], Any]) -> Any
+        """Returns the cached value of the given key, calling compute_fn() on a miss."""
+        self._cur_keys.add(key)
+        table = self._table
+        entry = table.get(key, None)
+        if entry is None:
+            self._num_misses += 1
+            val = compute_fn()
+        else:
+            self._num_hits += 1
+            val = entry[0]
+            table.move_to_end(key)
+        table[key] = (val, self._gen)
+        while len(table) > self._max_entries:
+            table.popitem(last=False)
+        return val
+
+    def start_generation(self):
+        # type: () -> None
+        """Start recording the keys used by a new layout generation."""
+        self._cur_keys = set()
+        self._num_hits = self._num_misses = 0
+
+    def end_generation(self):
+        # type: () -> InfoCacheDiff
+        """Finish the current layout generation.
+
+        Returns
+        -------
+        diff : InfoCacheDiff
+            the keys that changed since the previous generation.
+        """
+        cur_keys = frozenset(self._cur_keys)
+        prev_keys = self._prev_keys
+        diff = InfoCacheDiff(cur_keys - prev_keys, prev_keys - cur_keys, cur_keys & prev_keys,
+                            self._num_hits, self._num_misses)
+
+        min_gen = self._gen - self._max_gen + 1
+        self._table = OrderedDict((key, entry) for key, entry in self._table.items() if entry[1] >= min_gen)
+        self._prev_keys = cur_keys
+        self._cur_keys = set()
+        self._gen += 1
+        return diff
+
+    def clear(self):
+        # type: () -> None
+        self._table.clear()
+        self._prev_keys = frozenset()
+        self._cur_keys = set()
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union, Sequence, Iterator
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from bag.layout.template import TemplateBase
+
+LayerType = Union[str, Tuple[str, str]]
+
+_rect_fields = ('xl', 'yb', 'xr', 'yt')
+_via_fields = ('xc', 'yc', 'num_rows', 'sp_rows', 'cut_w', 'cut_h',
+               'enc1_l', 'enc1_r', 'enc1_t', 'enc1_b', 'enc2_l', 'enc2_r', 'enc2_t', 'enc2_b')
+_rect_dtype = np.dtype([(name, np.int64) for name in _rect_fields])
+_via_dtype = np.dtype([(name, np.int64) for name in _via_fields])
+
+
+class _RecordBuffer(object):
+    """A growable NumPy structured array."""
+
+    def __init__(self, dtype, capacity=64):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, num):
+        # type: (int) -> None
+        need = self._size + num
+        if need > self._data.shape[0]:
+            new_data = np.empty(max(need, 2 * self._data.shape[0]), dtype=self._data.dtype)
+            new_data[:self._size] = self._data[:self._size]
+            self._data = new_data
+
+    def append(self, values):
+        # type: (Tuple[int, ...]) -> None
+        self._reserve(1)
+        self._data[self._size] = values
+        self._size += 1
+
+    def extend(self, columns):
+        # type: (Dict[str, Union[int, Sequence[int], np.ndarray]]) -> None
+        """Append many records at once; each column is either a scalar or a sequence."""
+        sizes = [np.size(val) for val in columns.values() if np.ndim(val) > 0]
+        num = sizes[0] if sizes else 1
+        if any(size != num for size in sizes):
+            raise ValueError('Column lengths do not match: %s' % sizes)
+        if num == 0:
+            return
+        self._reserve(num)
+        view = self._data[self._size:self._size + num]
+        for name, val in columns.items():
+            view[name] = val
+        self._size += num
+
+    def append_buffer(self, other):
+        # type: (_RecordBuffer) -> None
+        """Append all records of another buffer with the same dtype."""
+        num = other._size
+        self._reserve(num)
+        self._data[self._size:self._size + num] = other._data[:num]
+        self._size += num
+
+    def to_array(self):
+        # type: () -> np.ndarray
+        """Returns the records as a 2D integer array, one row per record."""
+        data = self._data[:self._size]
+        return np.stack([data[name] for name in data.dtype.names], axis=1)
+
+
+def _iter_runs(keys, xc):
+    # type: (np.ndarray, np.ndarray) -> Iterator[Tuple[int, int, int]]
+    """Split records into uniformly spaced runs along X.
+
+    Records are grouped by their key rows, and the X coordinates of each group are split
+    greedily into arithmetic progressions.
+
+    Yields
+    ------
+    idx : int
+        index of the first record of the run.
+    num : int
+        number of records in the run.
+    sp : int
+        X pitch of the run.
+    """
+    num_rec = xc.shape[0]
+    if num_rec == 0:
+        return
+    # sort by key columns, then by X, and remove duplicates.
+    order = np.lexsort((xc,) + tuple(keys[:, col] for col in range(keys.shape[1] - 1, -1, -1)))
+    keys = keys[order]
+    xc = xc[order]
+    new_key = np.any(keys[1:] != keys[:-1], axis=1)
+    keep = np.concatenate(([True], new_key | (xc[1:] != xc[:-1])))
+    order, keys, xc = order[keep], keys[keep], xc[keep]
+    grp_start = np.flatnonzero(np.concatenate(([True], np.any(keys[1:] != keys[:-1], axis=1))))
+    grp_stop = np.append(grp_start[1:], xc.shape[0])
+
+    order_list = order.tolist()
+    xc_list = xc.tolist()
+    for start, stop in zip(grp_start.tolist(), grp_stop.tolist()):
+        idx = start
+        while idx < stop:
+            if idx + 1 == stop:
+                yield order_list[idx], 1, 0
+                break
+            sp = xc_list[idx + 1] - xc_list[idx]
+            end = idx + 2
+            while end < stop and xc_list[end] - xc_list[end - 1] == sp:
+                end += 1
+            yield order_list[idx], end - idx, sp
+            idx = end
+
+
+class MOSShapeBuffer(object):
+    """A compact store for rectangles and vias drawn by the transistor templates.
+
+    Shapes are stored as integer NumPy records, one buffer per layer and per via ID,
+    instead of as individual BBox objects.  When flushed, duplicate shapes are removed
+    and uniformly spaced shapes are emitted as a single rectangle or via array.
+
+    Parameters
+    ----------
+    res : float
+        the layout resolution.
+    """
+
+    def __init__(self, res):
+        # type: (float) -> None
+        self._res = res
+        self._rects = {}  # type: Dict[LayerType, _RecordBuffer]
+        self._vias = {}  # type: Dict[str, _RecordBuffer]
+        self._num_added = 0
+
+    @property
+    def num_added(self):
+        # type: () -> int
+        """Number of shapes added to this buffer since the last flush."""
+        return self._num_added
+
+    def _get_rect_buf(self, layer):
+        # type: (LayerType) -> _RecordBuffer
+        buf = self._rects.get(layer, None)
+        if buf is None:
+            buf = self._rects[layer] = _RecordBuffer(_rect_dtype)
+        return buf
+
+    def _get_via_buf(self, via_id):
+        # type: (str) -> _RecordBuffer
+        buf = self._vias.get(via_id, None)
+        if buf is None:
+            buf = self._vias[via_id] = _RecordBuffer(_via_dtype)
+        return buf
+
+    def add_rect(self, layer, xl, yb, xr, yt):
+        # type: (LayerType, int, int, int, int) -> None
+        """Add a rectangle, in resolution units."""
+        self._get_rect_buf(layer).append((xl, yb, xr, yt))
+        self._num_added += 1
+
+    def add_rects(self, layer, xl, yb, xr, yt):
+        # type: (...) -> None
+        """Add many rectangles at once.  Each coordinate is either a scalar or a sequence."""
+        buf = self._get_rect_buf(layer)
+        num_old = len(buf)
+        buf.extend(dict(xl=xl, yb=yb, xr=xr, yt=yt))
+        self._num_added += len(buf) - num_old
+
+    def add_vias(self, via_id, xc, yc, enc1, enc2, cut_width, cut_height, num_rows=1, sp_rows=0):
+        # type: (str, Union[int, Sequence[int]], int, List[int], List[int], int, int, int, int) -> None
+        """Add one or more vias, in resolution units.
+
+        xc may be a sequence to add a via at each X coordinate.  Enclosures are given as
+        [left, right, top, bottom], the same as add_via_primitive().
+        """
+        buf = self._get_via_buf(via_id)
+        num_old = len(buf)
+        buf.extend(dict(xc=xc, yc=yc, num_rows=num_rows, sp_rows=sp_rows, cut_w=cut_width,
+                        cut_h=cut_height, enc1_l=enc1[0], enc1_r=enc1[1], enc1_t=enc1[2],
+                        enc1_b=enc1[3], enc2_l=enc2[0], enc2_r=enc2[1], enc2_t=enc2[2],
+                        enc2_b=enc2[3]))
+        self._num_added += len(buf) - num_old
+
+    def add_buffer(self, other):
+        # type: (MOSShapeBuffer) -> None
+        """Add all shapes of another buffer.  The other buffer is not modified."""
+        for layer, buf in other._rects.items():
+            self._get_rect_buf(layer).append_buffer(buf)
+        for via_id, buf in other._vias.items():
+            self._get_via_buf(via_id).append_buffer(buf)
+        self._num_added += other._num_added
+
+    def iter_rect_arrays(self):
+        # type: () -> Iterator[Tuple[LayerType, int, int, int, int, int, int]]
+        """Iterate over the buffered rectangles, merged into arrays along X.
+
+        Yields
+        ------
+        layer : Union[str, Tuple[str, str]]
+            the rectangle layer.
+        xl, yb, xr, yt : int
+            the first rectangle of the array, in resolution units.
+        nx : int
+            number of rectangles in the array.
+        spx : int
+            X pitch of the array.
+        """
+        for layer, buf in self._rects.items():
+            data = buf.to_array()
+            # group by (yb, yt, width), run along xl.
+            keys = np.stack((data[:, 1], data[:, 3], data[:, 2] - data[:, 0]), axis=1)
+            for idx, num, sp in _iter_runs(keys, data[:, 0]):
+                xl, yb, xr, yt = data[idx].tolist()
+                yield layer, xl, yb, xr, yt, num, sp
+
+    def iter_via_arrays(self):
+        # type: () -> Iterator[Tuple[str, int, int, int, int, List[int], List[int], int, int, int, int]]
+        """Iterate over the buffered vias, merged into arrays along X.
+
+        Yields (via_id, xc, yc, num_rows, sp_rows, enc1, enc2, cut_width, cut_height, nx, spx),
+        with coordinates in resolution units.
+        """
+        for via_id, buf in self._vias.items():
+            data = buf.to_array()
+            for idx, num, sp in _iter_runs(data[:, 1:], data[:, 0]):
+                (xc, yc, num_rows, sp_rows, cut_w, cut_h, e1l, e1r, e1t, e1b,
+                 e2l, e2r, e2t, e2b) = data[idx].tolist()
+                yield (via_id, xc, yc, num_rows, sp_rows, [e1l, e1r, e1t, e1b], [e2l, e2r, e2t, e2b],
+                       cut_w, cut_h, num, sp)
+
+    def flush(self, template):
+        # type: (TemplateBase) -> int
+        """Add all buffered shapes to the given template, then clear this buffer.
+
+        Returns
+        -------
+        num_emitted : int
+            number of add_rect()/add_via_primitive() calls made.
+        """
+        from bag.layout.util import BBox
+
+        res = self._res
+        num_emitted = 0
+        for layer, xl, yb, xr, yt, nx, spx in self.iter_rect_arrays():
+            template.add_rect(layer, BBox(xl, yb, xr, yt, res, unit_mode=True), nx=nx, spx=spx, unit_mode=True)
+            num_emitted += 1
+
+        for via_id, xc, yc, num_rows, sp_rows, enc1, enc2, cut_w, cut_h, nx, spx in self.iter_via_arrays():
+            template.add_via_primitive(via_id, [xc, yc], num_rows=num_rows, sp_rows=sp_rows, enc1=enc1,
+                                       enc2=enc2, cut_width=cut_w, cut_height=cut_h, nx=nx, spx=spx,
+                                       unit_mode=True)
+            num_emitted += 1
+
+        self._rects.clear()
+        self._vias.clear()
+        self._num_added = 0
+        return num_emitted
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, Tuple, Sequence, Union
+
+import numpy as np
+
+WidthType = Union[int, Sequence[int], np.ndarray]
+
+
+class WidthTable(object):
+    """A width bucketed rule table compiled into sorted arrays.
+
+    The value of a width w is the value of the first bucket with w <= w_list[i].
+
+    Parameters
+    ----------
+    w_list : Sequence[float]
+        the increasing bucket upper bounds, in resolution units.
+    val_list : Sequence[Any]
+        the bucket values.  Entries may be sequences of equal length.
+    """
+
+    def __init__(self, w_list, val_list):
+        # type: (Sequence[float], Sequence[Any]) -> None
+        self._w = np.asarray(w_list, dtype=float)
+        self._val = np.asarray(val_list, dtype=np.int64)
+        if self._w.size != self._val.shape[0]:
+            raise ValueError('w_list and value list have different lengths.')
+        if np.any(np.diff(self._w) <= 0):
+            raise ValueError('w_list must be strictly increasing: %s' % list(w_list))
+
+    @property
+    def max_width(self):
+        # type: () -> float
+        return self._w[-1]
+
+    def get_index(self, widths):
+        # type: (WidthType) -> np.ndarray
+        """Returns the bucket index of each width.  Raises ValueError if a width is too large."""
+        idx = np.searchsorted(self._w, widths, side='left')
+        if np.any(idx >= self._w.size):
+            raise ValueError('Width %s exceeds the maximum width %s of this rule.' %
+                             (np.max(widths), self._w[-1]))
+        return idx
+
+    def lookup(self, widths):
+        # type: (WidthType) -> np.ndarray
+        return self._val[self.get_index(widths)]
+
+
+def _ceil_div(a, b):
+    # type: (np.ndarray, np.ndarray) -> np.ndarray
+    return -(-a // b)
+
+
+class LengthRule(object):
+    """The minimum length rule of one layer type, from the len_min table.
+
+    The length is set by the minimum area and minimum length of the width bucket, then
+    grown by the maximum dimension buckets from largest to smallest, and rounded up to an
+    even number unless a maximum dimension bucket was exceeded, matching the scalar rule
+    in TechInfoConfig.
+    """
+
+    def __init__(self, rule_config):
+        # type: (Dict[str, Any]) -> None
+        self._w_table = WidthTable(rule_config['w_list'], rule_config['w_al_list'])
+        self._md = np.asarray(rule_config['md_list'], dtype=float)[::-1]
+        self._md_al = np.asarray(rule_config['md_al_list'], dtype=np.int64)[::-1]
+
+    def lookup(self, widths):
+        # type: (WidthType) -> np.ndarray
+        widths = np.asarray(widths, dtype=np.int64)
+        area, len_min = self._w_table.lookup(widths).T
+        l_unit = np.maximum(len_min, _ceil_div(area, widths))
+
+        active = np.ones(widths.shape, dtype=bool)
+        for max_dim, (area, len_min) in zip(self._md, self._md_al):
+            active &= np.maximum(widths, l_unit) <= max_dim
+            new_l = np.maximum(np.maximum(l_unit, len_min), _ceil_div(area, widths))
+            l_unit = np.where(active, new_l, l_unit)
+
+        return np.where(active, _ceil_div(l_unit, 2) * 2, l_unit)
+
+
+class DRCRuleTables(object):
+    """Compiled sp_min, sp_sc_min, sp_le_min, and len_min rules of the technology.
+
+    Tables are compiled once from the technology parameters.  Scalar lookups are
+    memoized, and the array methods look up many widths with a single searchsorted.
+    All widths and results are in resolution units.
+
+    Parameters
+    ----------
+    config : Dict[str, Any]
+        the technology parameters dictionary.
+    """
+
+    def __init__(self, config):
+        # type: (Dict[str, Any]) -> None
+        self._tables = {}  # type: Dict[str, Dict[str, Any]]
+        for rule_name in ('sp_min', 'sp_sc_min', 'sp_le_min'):
+            self._tables[rule_name] = {lay_type: WidthTable(val['w_list'], val['sp_list'])
+                                       for lay_type, val in config[rule_name].items()}
+        self._tables['len_min'] = {lay_type: LengthRule(val)
+                                   for lay_type, val in config['len_min'].items()}
+        self._memo = {}  # type: Dict[Tuple[str, str, int], int]
+
+    def _lookup_scalar(self, rule_name, layer_type, width):
+        # type: (str, str, int) -> int
+        key = (rule_name, layer_type, width)
+        ans = self._memo.get(key, None)
+        if ans is None:
+            ans = self._memo[key] = int(self._tables[rule_name][layer_type].lookup(width))
+        return ans
+
+    def get_min_space(self, layer_type, width, same_color=False):
+        # type: (str, int, bool) -> int
+        return self._lookup_scalar('sp_sc_min' if same_color else 'sp_min', layer_type, width)
+
+    def get_min_line_end_space(self, layer_type, width):
+        # type: (str, int) -> int
+        return self._lookup_scalar('sp_le_min', layer_type, width)
+
+    def get_min_length(self, layer_type, width):
+        # type: (str, int) -> int
+        return self._lookup_scalar('len_min', layer_type, width)
+
+    def get_max_width(self, layer_type):
+        # type: (str) -> float
+        """Returns the largest width covered by the sp_min and sp_le_min tables of a layer type."""
+        return min(self._tables['sp_min'][layer_type].max_width, self._tables['sp_le_min'][layer_type].max_width)
+
+    def get_min_space_array(self, layer_type, widths, same_color=False):
+        # type: (str, WidthType, bool) -> np.ndarray
+        """Returns the minimum space of every width in the given array."""
+        return self._tables['sp_sc_min' if same_color else 'sp_min'][layer_type].lookup(widths)
+
+    def get_min_line_end_space_array(self, layer_type, widths):
+        # type: (str, WidthType) -> np.ndarray
+        """Returns the minimum line-end space of every width in the given array."""
+        return self._tables['sp_le_min'][layer_type].lookup(widths)
+
+    def get_min_length_array(self, layer_type, widths):
+        # type: (str, WidthType) -> np.ndarray
+        """Returns the minimum length of every width in the given array."""
+        return self._tables['len_min'][layer_type].lookup(widths)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, List, Tuple, Optional
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import tempfile
+import threading
+
+from .corners import CornerInfo, CornerSetup
+from .scheduler import SimJob, SimBackend
+
+# marks a cache miss, since None is a valid cached result.
+_miss = object()
+
+
+def get_sim_key(netlist, corner, analysis):
+    # type: (str, CornerInfo, Dict[str, Any]) -> str
+    """Returns the cache key of a simulation.
+
+    Parameters
+    ----------
+    netlist : str
+        the flattened netlist content.
+    corner : CornerInfo
+        the corner; its model sections and variables are part of the key, its name is not.
+        Model sections are kept in order, since the include order can change the results.
+    analysis : Dict[str, Any]
+        the analysis setup.  Must be JSON serializable.
+
+    Returns
+    -------
+    key : str
+        the hex digest identifying this simulation.
+    """
+    setup = dict(
+        models=corner.model_sections,
+        variables=sorted(corner.variables.items()),
+        analysis=analysis,
+    )
+    h = hashlib.sha256(netlist.encode('utf-8'))
+    h.update(json.dumps(setup, sort_keys=True, default=repr).encode('utf-8'))
+    return h.hexdigest()
+
+
+class SimResultCache(object):
+    """A persistent, size bounded store of simulation results.
+
+    Each entry is a pickle file named by its key.  When the total size exceeds
+    max_bytes, least recently used entries are deleted.  Hit and miss counts are
+    kept per sweep name.
+
+    Parameters
+    ----------
+    cache_dir : str
+        the cache directory.  Environment variables are expanded.
+    max_bytes : int
+        maximum total size of cached results, in bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=10 * 1024**3):
+        # type: (str, int) -> None
+        self._cache_dir = os.path.abspath(os.path.expandvars(cache_dir))
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {}  # type: Dict[str, Dict[str, int]]
+        # entry sizes and last access times, keyed by cache key.
+        self._entries = {}  # type: Dict[str, Tuple[int, float]]
+        self._tot_bytes = 0
+
+        os.makedirs(self._cache_dir, exist_ok=True)
+        for fname in os.listdir(self._cache_dir):
+            if fname.endswith('.pkl'):
+                stat = os.stat(os.path.join(self._cache_dir, fname))
+                self._entries[fname[:-4]] = (stat.st_size, stat.st_mtime)
+                self._tot_bytes += stat.st_size
+
+    @property
+    def total_bytes(self):
+        # type: () -> int
+        return self._tot_bytes
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._entries)
+
+    def _get_path(self, key):
+        # type: (str) -> str
+        return os.path.join(self._cache_dir, key + '.pkl')
+
+    def _record(self, sweep, name):
+        # type: (str, str) -> None
+        sweep_stats = self._stats.setdefault(sweep, dict(hits=0, misses=0))
+        sweep_stats[name] += 1
+
+    def get(self, key, sweep='', default=None):
+        # type: (str, str, Any) -> Optional[Any]
+        """Returns the cached result of the given key, or default on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                self._record(sweep, 'misses')
+                return default
+            fname = self._get_path(key)
+            try:
+                with open(fname, 'rb') as f:
+                    result = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                # entry removed or corrupted behind our back
+                self._remove(key)
+                self._record(sweep, 'misses')
+                return default
+            now = time.time()
+            os.utime(fname, (now, now))
+            self._entries[key] = (self._entries[key][0], now)
+            self._record(sweep, 'hits')
+            return result
+
+    def put(self, key, result):
+        # type: (str, Any) -> None
+        """Store a result, evicting least recently used entries if needed."""
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        fd, tmp_name = tempfile.mkstemp(suffix='.tmp', dir=self._cache_dir)
+        fname = self._get_path(key)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            with self._lock:
+                os.replace(tmp_name, fname)
+                if key in self._entries:
+                    self._tot_bytes -= self._entries[key][0]
+                self._entries[key] = (len(data), time.time())
+                self._tot_bytes += len(data)
+                self._evict()
+        finally:
+            # only left behind if writing or renaming failed.
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+
+    def _remove(self, key):
+        # type: (str) -> None
+        size = self._entries.pop(key)[0]
+        self._tot_bytes -= size
+        try:
+            os.remove(self._get_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        # type: () -> None
+        if self._tot_bytes <= self._max_bytes:
+            return
+        for key, _ in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._tot_bytes <= self._max_bytes:
+                break
+            self._remove(key)
+
+    def get_report(self):
+        # type: () -> Dict[str, Dict[str, int]]
+        """Returns hit and miss counts per sweep name."""
+        with self._lock:
+            return {sweep: dict(val) for sweep, val in self._stats.items()}
+
+    def reset_report(self):
+        # type: () -> None
+        with self._lock:
+            self._stats.clear()
+
+
+class CachedSimBackend(SimBackend):
+    """A simulation backend that returns cached results when available.
+
+    Jobs must have a 'netlist' parameter with the flattened netlist file name, and may
+    have an 'analysis' parameter with the analysis setup dictionary and a 'sweep'
+    parameter naming the sweep the job belongs to, for hit/miss reporting.
+
+    Parameters
+    ----------
+    backend : SimBackend
+        the backend used on cache misses.
+    cache : SimResultCache
+        the result cache.
+    setup : CornerSetup
+        the corner definitions.
+    """
+
+    def __init__(self, backend, cache, setup):
+        # type: (SimBackend, SimResultCache, CornerSetup) -> None
+        self._backend = backend
+        self._cache = cache
+        self._setup = setup
+
+    def get_key(self, job):
+        # type: (SimJob) -> str
+        with open(job.params['netlist'], 'r') as f:
+            netlist = f.read()
+        return get_sim_key(netlist, self._setup[job.corner], job.params.get('analysis', {}))
+
+    def run(self, job):
+        # type: (SimJob) -> Any
+        key = self.get_key(job)
+        sweep = job.params.get('sweep', '')
+        result = self._cache.get(key, sweep=sweep, default=_miss)
+        if result is _miss:
+            result = self._backend.run(job)
+            self._cache.put(key, result)
+        return result
+
+
+def format_report(report):
+    # type: (Dict[str, Dict[str, int]]) -> List[str]
+    """Format a cache report as lines of text."""
+    lines = []
+    for sweep, val in sorted(report.items()):
+        num_hits, num_misses = val['hits'], val['misses']
+        tot = num_hits + num_misses
+        rate = 100.0 * num_hits / tot if tot else 0.0
+        lines.append('%s: %d hits, %d misses (%.1f%% hit rate)' % (sweep or '<default>', num_hits,
+                                                                   num_misses, rate))
+    return lines
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, List, Tuple, Optional
+
+import os
+import threading
+import xml.etree.ElementTree as ElementTree
+
+# cache of parsed corner files, keyed by absolute path.
+_corner_cache = {}  # type: Dict[str, Tuple[Tuple[int, int], CornerSetup]]
+_cache_lock = threading.Lock()
+
+
+def _get_text(elem):
+    # type: (ElementTree.Element) -> str
+    """Returns the text of an element before its first child, stripped."""
+    return (elem.text or '').strip()
+
+
+def _get_child_text(elem, tag):
+    # type: (ElementTree.Element, str) -> str
+    child = elem.find(tag)
+    return '' if child is None else _get_text(child)
+
+
+class ModelInfo(object):
+    """A model file entry of a corner.
+
+    Parameters
+    ----------
+    name : str
+        the model entry name.
+    fname : str
+        the model file path.
+    section : str
+        the model section, without quotes.
+    test : str
+        the test this model applies to.
+    block : str
+        the model block.
+    enabled : bool
+        True if this model entry is enabled.
+    """
+
+    __slots__ = ('name', 'fname', 'section', 'test', 'block', 'enabled')
+
+    def __init__(self, name, fname, section, test, block, enabled):
+        # type: (str, str, str, str, str, bool) -> None
+        self.name = name
+        self.fname = fname
+        self.section = section
+        self.test = test
+        self.block = block
+        self.enabled = enabled
+
+    def __getstate__(self):
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+    def __setstate__(self, state):
+        for attr, val in zip(self.__slots__, state):
+            setattr(self, attr, val)
+
+    def __repr__(self):
+        return '%s(%r, %r)' % (self.__class__.__name__, self.fname, self.section)
+
+
+class CornerInfo(object):
+    """A process corner definition.
+
+    Parameters
+    ----------
+    name : str
+        the corner name.
+    enabled : bool
+        True if this corner is enabled.
+    variables : Dict[str, str]
+        the corner design variables.
+    models : List[ModelInfo]
+        the model file entries of this corner.
+    """
+
+    __slots__ = ('name', 'enabled', 'variables', 'models')
+
+    def __init__(self, name, enabled, variables, models):
+        # type: (str, bool, Dict[str, str], List[ModelInfo]) -> None
+        self.name = name
+        self.enabled = enabled
+        self.variables = variables
+        self.models = models
+
+    def __getstate__(self):
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+    def __setstate__(self, state):
+        for attr, val in zip(self.__slots__, state):
+            setattr(self, attr, val)
+
+    @property
+    def temperature(self):
+        # type: () -> Optional[float]
+        val = self.variables.get('temperature', None)
+        return None if val is None else float(val)
+
+    @property
+    def model_sections(self):
+        # type: () -> List[Tuple[str, str]]
+        """List of (model file, section) of all enabled models."""
+        return [(model.fname, model.section) for model in self.models if model.enabled]
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.name)
+
+
+class CornerSetup(object):
+    """An indexed view of an ADE setup database corner file.
+
+    Parameters
+    ----------
+    corner_list : List[CornerInfo]
+        the corners, in file order.
+    """
+
+    def __init__(self, corner_list):
+        # type: (List[CornerInfo]) -> None
+        self._corner_list = corner_list
+        self._corners = {corner.name: corner for corner in corner_list}
+        self._section_index = {}  # type: Dict[str, List[str]]
+        for corner in corner_list:
+            for _, section in corner.model_sections:
+                self._section_index.setdefault(section, []).append(corner.name)
+
+    @classmethod
+    def parse(cls, fname):
+        # type: (str) -> CornerSetup
+        """Parse the given corner file."""
+        root = ElementTree.parse(fname).getroot()
+        corner_list = []
+        corner_elems = (elem for corners_elem in root.iter('corners') for elem in corners_elem.findall('corner'))
+        for corner_elem in corner_elems:
+            variables = {}
+            vars_elem = corner_elem.find('vars')
+            if vars_elem is not None:
+                for var_elem in vars_elem.findall('var'):
+                    variables[_get_text(var_elem)] = _get_child_text(var_elem, 'value')
+            models = []
+            models_elem = corner_elem.find('models')
+            if models_elem is not None:
+                for model_elem in models_elem.findall('model'):
+                    models.append(ModelInfo(_get_text(model_elem),
+                                            _get_child_text(model_elem, 'modelfile'),
+                                            _get_child_text(model_elem, 'modelsection').strip('"'),
+                                            _get_child_text(model_elem, 'modeltest'),
+                                            _get_child_text(model_elem, 'modelblock'),
+                                            model_elem.get('enabled', '1') == '1'))
+            corner_list.append(CornerInfo(_get_text(corner_elem), corner_elem.get('enabled', '1') == '1',
+                                          variables, models))
+        return cls(corner_list)
+
+    def __contains__(self, name):
+        # type: (str) -> bool
+        return name in self._corners
+
+    def __getitem__(self, name):
+        # type: (str) -> CornerInfo
+        return self._corners[name]
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._corner_list)
+
+    def get_corner_names(self, enabled_only=True):
+        # type: (bool) -> List[str]
+        """Returns the corner names in file order."""
+        return [corner.name for corner in self._corner_list if corner.enabled or not enabled_only]
+
+    def get_corners_by_section(self, section):
+        # type: (str) -> List[str]
+        """Returns names of all corners that use the given model section."""
+        return list(self._section_index.get(section, []))
+
+
+def get_corner_setup(fname):
+    # type: (str) -> CornerSetup
+    """Returns the parsed corner file, reparsing only if the file changed since last call.
+
+    Parameters
+    ----------
+    fname : str
+        the corner file name.  Environment variables are expanded.
+
+    Returns
+    -------
+    setup : CornerSetup
+        the indexed corner definitions.
+    """
+    fname = os.path.abspath(os.path.expandvars(fname))
+    stat = os.stat(fname)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        entry = _corner_cache.get(fname, None)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+    setup = CornerSetup.parse(fname)
+    with _cache_lock:
+        _corner_cache[fname] = (key, setup)
+    return setup
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, List, Optional, Sequence, Callable, Pattern
+
+import os
+import re
+import sys
+import time
+import asyncio
+import itertools
+
+# stdout stream buffer limit, in bytes.
+_log_limit = 1 << 20
+
+
+class SimProcessResult(object):
+    """The outcome of a monitored simulator process.
+
+    Parameters
+    ----------
+    job_id : int
+        the job ID.
+    returncode : Optional[int]
+        the process return code.  None if the process did not exit within linger_timeout
+        after its completion marker and was terminated.
+    result_file : str
+        the result file path, empty string if not checked.
+    runtime : float
+        wall time of the job, in seconds.
+    cancelled : bool
+        True if the job was cancelled.
+    completed : bool
+        True if the completion marker of the job was seen.
+    """
+
+    __slots__ = ('job_id', 'returncode', 'result_file', 'runtime', 'cancelled', 'completed')
+
+    def __init__(self, job_id, returncode, result_file, runtime, cancelled=False, completed=False):
+        # type: (int, Optional[int], str, float, bool, bool) -> None
+        self.job_id = job_id
+        self.returncode = returncode
+        self.result_file = result_file
+        self.runtime = runtime
+        self.cancelled = cancelled
+        self.completed = completed
+
+    @property
+    def success(self):
+        # type: () -> bool
+        if self.cancelled:
+            return False
+        if self.returncode is None:
+            ok = self.completed
+        else:
+            ok = self.returncode == 0
+        return ok and (not self.result_file or os.path.isfile(self.result_file))
+
+
+def get_stub_sim_command(runtime, result_file='', returncode=0, done_file='', log_line='', linger=0.0):
+    # type: (float, str, int, str, str, float) -> List[str]
+    """Returns a command that mimics a simulator, for testing job monitoring without Cadence tools.
+
+    Like a real simulator, the command creates the result file at startup and writes part of
+    it, sleeps for the given time, and then finishes the result file.  It then writes the
+    done file and prints the log line if given, lingers, and exits with the given return code.
+    """
+    script = ('import sys, time\n'
+              'result_file, done_file, log_line = %r, %r, %r\n'
+              'f = open(result_file, "w") if result_file else None\n'
+              'if f:\n'
+              '    f.write("part\\n")\n'
+              '    f.flush()\n'
+              'time.sleep(%r)\n'
+              'if f:\n'
+              '    f.write("rest\\n")\n'
+              '    f.close()\n'
+              'if done_file:\n'
+              '    open(done_file, "w").close()\n'
+              'if log_line:\n'
+              '    print(log_line, flush=True)\n'
+              'time.sleep(%r)\n'
+              'sys.exit(%d)\n' % (result_file, done_file, log_line, runtime, linger, returncode))
+    return [sys.executable, '-c', script]
+
+
+class SimJobMonitor(object):
+    """Runs simulator processes and reports completions as they happen.
+
+    A job is done when its process exits.  Simulators that linger after finishing can
+    give a completion marker: a done file the simulator writes when it finishes, or a
+    regular expression matching the log line it prints on stdout.  A result file is not
+    a completion marker, since simulators create it at startup.  Once the marker is seen,
+    the process gets linger_timeout seconds to exit on its own before it is terminated.
+    There is no fixed polling timeout, so short DC/AC runs return as soon as they finish.
+    Cancellation terminates the process immediately and escalates to kill after
+    cancel_timeout.
+
+    Parameters
+    ----------
+    max_workers : int
+        maximum number of concurrent processes.
+    update_timeout : float
+        if positive, on_update is called at this interval, in seconds, while a job runs.
+    cancel_timeout : float
+        seconds to wait for a terminated process to exit before killing it.
+    linger_timeout : float
+        seconds to wait for a process to exit after its completion marker.
+    file_poll : float
+        interval used to check done files, in seconds.
+    on_update : Optional[Callable[[int, float], None]]
+        called with (job ID, elapsed time) every update_timeout seconds.
+    """
+
+    def __init__(self, max_workers=1, update_timeout=120.0, cancel_timeout=10.0, linger_timeout=30.0,
+                 file_poll=0.05, on_update=None):
+        # type: (int, float, float, float, float, Optional[Callable[[int, float], None]]) -> None
+        self._max_workers = max_workers
+        self._update_timeout = update_timeout
+        self._cancel_timeout = cancel_timeout
+        self._linger_timeout = linger_timeout
+        self._file_poll = file_poll
+        self._on_update = on_update
+        self._id_iter = itertools.count()
+        self._sem = None  # type: Optional[asyncio.Semaphore]
+        self._tasks = {}  # type: Dict[int, asyncio.Task]
+
+    @classmethod
+    def from_config(cls, sim_config, **kwargs):
+        # type: (Dict[str, object], **kwargs) -> SimJobMonitor
+        """Create a monitor from the simulation section of the BAG configuration file."""
+        return cls(max_workers=sim_config.get('max_workers', 1),
+                   update_timeout=sim_config.get('update_timeout_ms', 120000) / 1000,
+                   cancel_timeout=sim_config.get('cancel_timeout_ms', 10000) / 1000,
+                   **kwargs)
+
+    def _get_sem(self):
+        # type: () -> asyncio.Semaphore
+        # create lazily so the semaphore binds to the running event loop.
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self._max_workers)
+        return self._sem
+
+    async def _wait_file(self, fname, done):
+        # type: (str, asyncio.Event) -> None
+        while not os.path.isfile(fname):
+            await asyncio.sleep(self._file_poll)
+        done.set()
+
+    @staticmethod
+    async def _read_log(stream, pattern, done):
+        # type: (asyncio.StreamReader, Pattern, asyncio.Event) -> None
+        # keep draining stdout after the marker, so the process never blocks on a full pipe.
+        while True:
+            try:
+                line = await stream.readline()
+            except ValueError:
+                # line longer than the stream limit; skip it.
+                await stream.read(_log_limit)
+                continue
+            if not line:
+                return
+            if not done.is_set() and pattern.search(line.decode('utf-8', 'replace')):
+                done.set()
+
+    async def _terminate(self, proc):
+        # type: (asyncio.subprocess.Process) -> None
+        if proc.returncode is not None:
+            return
+        proc.terminate()
+        try:
+            await asyncio.wait_for(proc.wait(), self._cancel_timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+
+    async def _run(self, job_id, cmd, cwd, env, result_file, done_file, done_pattern):
+        # type: (...) -> SimProcessResult
+        async with self._get_sem():
+            t0 = time.time()
+            for fname in (result_file, done_file):
+                if fname and os.path.isfile(fname):
+                    os.remove(fname)
+            stdout = asyncio.subprocess.DEVNULL if done_pattern is None else asyncio.subprocess.PIPE
+            proc = await asyncio.create_subprocess_exec(*cmd, cwd=cwd, env=env, stdout=stdout,
+                                                        stderr=asyncio.subprocess.DEVNULL, limit=_log_limit)
+            done = asyncio.Event()
+            exit_task = asyncio.ensure_future(proc.wait())
+            marker_task = asyncio.ensure_future(done.wait())
+            helpers = []
+            if done_file:
+                helpers.append(asyncio.ensure_future(self._wait_file(done_file, done)))
+            if done_pattern is not None:
+                helpers.append(asyncio.ensure_future(self._read_log(proc.stdout, re.compile(done_pattern), done)))
+            waiters = [exit_task, marker_task]
+            lingered = False
+            try:
+                while True:
+                    timeout = self._update_timeout if self._update_timeout > 0 else None
+                    finished, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    if finished:
+                        break
+                    if self._on_update is not None:
+                        self._on_update(job_id, time.time() - t0)
+                runtime = time.time() - t0
+                if not exit_task.done():
+                    # the simulator finished; give it a chance to exit on its own.
+                    try:
+                        await asyncio.wait_for(asyncio.shield(exit_task), self._linger_timeout)
+                    except asyncio.TimeoutError:
+                        lingered = True
+                        await self._terminate(proc)
+            except asyncio.CancelledError:
+                await self._terminate(proc)
+                return SimProcessResult(job_id, proc.returncode, result_file, time.time() - t0,
+                                        cancelled=True, completed=done.is_set())
+            finally:
+                for task in helpers + waiters:
+                    task.cancel()
+            returncode = None if lingered else proc.returncode
+            return SimProcessResult(job_id, returncode, result_file, runtime, completed=done.is_set())
+
+    def submit(self, cmd, cwd=None, env=None, result_file='', done_file='', done_pattern=None):
+        # type: (Sequence[str], Optional[str], Optional[Dict[str, str]], str, str, Optional[str]) -> int
+        """Start a job from within a running event loop.
+
+        Parameters
+        ----------
+        cmd : Sequence[str]
+            the simulator command.
+        cwd : Optional[str]
+            the working directory.
+        env : Optional[Dict[str, str]]
+            the environment variables.
+        result_file : str
+            if given, this file is removed before the job starts, and the job only
+            succeeds if it exists afterwards.
+        done_file : str
+            if given, the job is complete as soon as this file appears, even if the
+            simulator process lingers.
+        done_pattern : Optional[str]
+            if given, the job is complete as soon as a line of the simulator's stdout
+            matches this regular expression, even if the process lingers.
+
+        Returns
+        -------
+        job_id : int
+            the job ID, used with wait() and cancel().
+        """
+        job_id = next(self._id_iter)
+        self._tasks[job_id] = asyncio.ensure_future(self._run(job_id, cmd, cwd, env, result_file, done_file,
+                                                              done_pattern))
+        return job_id
+
+    async def wait(self, job_id):
+        # type: (int) -> SimProcessResult
+        """Wait for the given job to finish and return its result."""
+        task = self._tasks[job_id]
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+            # cancelled before the process started
+            return SimProcessResult(job_id, None, '', 0.0, cancelled=True)
+        finally:
+            if task.done():
+                self._tasks.pop(job_id, None)
+
+    def cancel(self, job_id):
+        # type: (int) -> bool
+        """Cancel the given job.  Returns False if the job already finished."""
+        task = self._tasks.get(job_id, None)
+        if task is None or task.done():
+            return False
+        return task.cancel()
+
+    async def as_completed(self, job_ids=None):
+        """Asynchronously iterate over results of the given jobs (default all) as they finish."""
+        id_list = list(self._tasks.keys()) if job_ids is None else list(job_ids)
+        task_ids = {self._tasks[job_id]: job_id for job_id in id_list}
+        pending = set(task_ids.keys())
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                job_id = task_ids[task]
+                self._tasks.pop(job_id, None)
+                if task.cancelled():
+                    yield SimProcessResult(job_id, None, '', 0.0, cancelled=True)
+                else:
+                    yield task.result()
+
+    def run_all(self, cmd_list, result_files=None):
+        # type: (List[Sequence[str]], Optional[List[str]]) -> List[SimProcessResult]
+        """Blocking helper; run all commands and return results in order."""
+        if result_files is None:
+            result_files = [''] * len(cmd_list)
+
+        async def _run_all():
+            id_list = [self.submit(cmd, result_file=fname) for cmd, fname in zip(cmd_list, result_files)]
+            return [await self.wait(job_id) for job_id in id_list]
+
+        self._sem = None
+        return asyncio.run(_run_all())
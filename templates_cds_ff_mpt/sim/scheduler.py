@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, List, Tuple, Optional, Iterable, Callable
+
+import os
+import abc
+import sys
+import time
+import heapq
+import random
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .corners import CornerSetup
+
+
+class SimJob(object):
+    """A single testbench simulation in a single corner.
+
+    Parameters
+    ----------
+    tb_name : str
+        the testbench name.
+    corner : str
+        the corner name.
+    params : Optional[Dict[str, Any]]
+        additional backend-specific job parameters.
+    """
+
+    __slots__ = ('tb_name', 'corner', 'params')
+
+    def __init__(self, tb_name, corner, params=None):
+        # type: (str, str, Optional[Dict[str, Any]]) -> None
+        self.tb_name = tb_name
+        self.corner = corner
+        self.params = params or {}
+
+    @property
+    def key(self):
+        # type: () -> Tuple[str, str]
+        return self.tb_name, self.corner
+
+    def __repr__(self):
+        return '%s(%r, %r)' % (self.__class__.__name__, self.tb_name, self.corner)
+
+
+class SimJobResult(object):
+    """The outcome of a simulation job.
+
+    Parameters
+    ----------
+    job : SimJob
+        the simulation job.
+    value : Any
+        the value returned by the backend, None if the job failed.
+    error : str
+        the last error message, empty string if the job succeeded.
+    runtime : float
+        runtime of the last attempt, in seconds.
+    attempts : int
+        number of times this job was run.
+    """
+
+    __slots__ = ('job', 'value', 'error', 'runtime', 'attempts')
+
+    def __init__(self, job, value, error, runtime, attempts):
+        # type: (SimJob, Any, str, float, int) -> None
+        self.job = job
+        self.value = value
+        self.error = error
+        self.runtime = runtime
+        self.attempts = attempts
+
+    @property
+    def success(self):
+        # type: () -> bool
+        return not self.error
+
+
+class RuntimeModel(object):
+    """Estimates simulation runtime from previous runs.
+
+    Estimates are exponential moving averages per (testbench, corner), falling back
+    to the testbench average, then to a default value.
+
+    Parameters
+    ----------
+    default : float
+        the runtime estimate of a testbench that was never run.
+    alpha : float
+        the moving average weight of the newest observation.
+    """
+
+    def __init__(self, default=1.0, alpha=0.5):
+        # type: (float, float) -> None
+        self._default = default
+        self._alpha = alpha
+        self._job_table = {}  # type: Dict[Tuple[str, str], float]
+        self._tb_table = {}  # type: Dict[str, float]
+        self._lock = threading.Lock()
+
+    def estimate(self, job):
+        # type: (SimJob) -> float
+        val = self._job_table.get(job.key, None)
+        if val is None:
+            val = self._tb_table.get(job.tb_name, self._default)
+        return val
+
+    def update(self, job, runtime):
+        # type: (SimJob, float) -> None
+        alpha = self._alpha
+        with self._lock:
+            for table, key in ((self._job_table, job.key), (self._tb_table, job.tb_name)):
+                old_val = table.get(key, None)
+                table[key] = runtime if old_val is None else alpha * runtime + (1 - alpha) * old_val
+
+
+class SimBackend(object, metaclass=abc.ABCMeta):
+    """The interface used by CornerScheduler to run a single simulation job."""
+
+    @abc.abstractmethod
+    def run(self, job):
+        # type: (SimJob) -> Any
+        """Run the given job, blocking until done.  Raise an exception on failure."""
+        return None
+
+
+class FakeSimBackend(SimBackend):
+    """A local simulator stand-in for benchmarking the scheduler.
+
+    Parameters
+    ----------
+    runtime_fun : Callable[[SimJob], float]
+        returns the simulated runtime of a job, in seconds.
+    fail_prob : float
+        probability that a job attempt fails.
+    use_process : bool
+        True to run each job as a separate Python subprocess, to also account for process
+        startup overhead.  Otherwise the job just sleeps in the calling thread.
+    seed : Optional[int]
+        the random seed used to decide failures.
+    """
+
+    def __init__(self, runtime_fun, fail_prob=0.0, use_process=False, seed=None):
+        # type: (Callable[[SimJob], float], float, bool, Optional[int]) -> None
+        self._runtime_fun = runtime_fun
+        self._fail_prob = fail_prob
+        self._use_process = use_process
+        self._rand = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def run(self, job):
+        # type: (SimJob) -> Any
+        runtime = self._runtime_fun(job)
+        with self._lock:
+            fail = self._rand.random() < self._fail_prob
+        if self._use_process:
+            subprocess.check_call([sys.executable, '-c', 'import time; time.sleep(%r)' % runtime])
+        else:
+            time.sleep(runtime)
+        if fail:
+            raise RuntimeError('fake simulation of %s failed.' % (job, ))
+        return dict(tb_name=job.tb_name, corner=job.corner, runtime=runtime)
+
+
+def expand_jobs(tb_list, corners, params=None):
+    # type: (Iterable[str], Iterable[str], Optional[Dict[str, Any]]) -> List[SimJob]
+    """Returns one job per testbench and corner."""
+    corner_list = list(corners)
+    return [SimJob(tb_name, corner, params=params) for tb_name in tb_list for corner in corner_list]
+
+
+class CornerScheduler(object):
+    """Runs testbench x corner simulation jobs on a fixed size worker pool.
+
+    Jobs are started longest expected runtime first, and a new job is started as soon as
+    any worker frees up, so the pool stays saturated.  Failed jobs are requeued up to
+    max_retries times.
+
+    Parameters
+    ----------
+    backend : SimBackend
+        the simulation backend.
+    max_workers : Optional[int]
+        maximum number of concurrent simulations.  Defaults to the number of CPUs.
+    max_retries : int
+        maximum number of times a failed job is rerun.
+    runtime_model : Optional[RuntimeModel]
+        the runtime estimator.  It is updated with every finished job, so sharing one model
+        between runs improves ordering over time.
+    """
+
+    def __init__(self, backend, max_workers=None, max_retries=1, runtime_model=None):
+        # type: (SimBackend, Optional[int], int, Optional[RuntimeModel]) -> None
+        self._backend = backend
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._max_retries = max_retries
+        self._model = runtime_model or RuntimeModel()
+        self._stats = {}  # type: Dict[str, float]
+
+    @property
+    def runtime_model(self):
+        # type: () -> RuntimeModel
+        return self._model
+
+    @property
+    def stats(self):
+        # type: () -> Dict[str, float]
+        """Statistics of the last run: wall time, busy time, utilization, throughput, and retries."""
+        return self._stats
+
+    def expand_corner_jobs(self, tb_list, setup, corners=None, params=None):
+        # type: (Iterable[str], CornerSetup, Optional[Iterable[str]], Optional[Dict[str, Any]]) -> List[SimJob]
+        """Returns jobs for the given testbenches over the given (default all enabled) corners."""
+        if corners is None:
+            corners = setup.get_corner_names()
+        else:
+            corners = list(corners)
+            for corner in corners:
+                if corner not in setup:
+                    raise ValueError('Unknown corner: %s' % corner)
+        return expand_jobs(tb_list, corners, params=params)
+
+    def _run_job(self, job):
+        # type: (SimJob) -> Tuple[Any, str, float]
+        t0 = time.time()
+        try:
+            value = self._backend.run(job)
+            err = ''
+        except Exception as ex:
+            value = None
+            err = '%s: %s' % (type(ex).__name__, ex)
+        return value, err, time.time() - t0
+
+    def run(self, job_list):
+        # type: (List[SimJob]) -> List[SimJobResult]
+        """Run all jobs.
+
+        Returns
+        -------
+        result_list : List[SimJobResult]
+            results in the same order as job_list.
+        """
+        model = self._model
+        queue = [(-model.estimate(job), idx, 0) for idx, job in enumerate(job_list)]
+        heapq.heapify(queue)
+        results = [None] * len(job_list)  # type: List[Optional[SimJobResult]]
+        busy_time = 0.0
+        num_retries = 0
+
+        t_start = time.time()
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            running = {}
+            while queue or running:
+                while queue and len(running) < self._max_workers:
+                    _, idx, attempt = heapq.heappop(queue)
+                    running[executor.submit(self._run_job, job_list[idx])] = (idx, attempt)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    idx, attempt = running.pop(future)
+                    job = job_list[idx]
+                    value, err, runtime = future.result()
+                    busy_time += runtime
+                    if not err:
+                        model.update(job, runtime)
+                    elif attempt < self._max_retries:
+                        num_retries += 1
+                        heapq.heappush(queue, (-model.estimate(job), idx, attempt + 1))
+                        continue
+                    results[idx] = SimJobResult(job, value, err, runtime, attempt + 1)
+
+        wall_time = time.time() - t_start
+        self._stats = dict(
+            wall_time=wall_time,
+            busy_time=busy_time,
+            utilization=busy_time / (wall_time * self._max_workers) if wall_time > 0 else 0.0,
+            throughput=len(job_list) / wall_time if wall_time > 0 else 0.0,
+            num_retries=num_retries,
+        )
+        return results
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+from typing import TYPE_CHECKING, Dict, Any, List, Tuple, Optional, Type, Iterable
+
+import os
+import time
+import copy
+import itertools
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+if TYPE_CHECKING:
+    from bag.core import BagProject
+    from bag.layout.template import TemplateBase
+
+# per-process technology information, created once by the worker initializer.
+_worker_tech_info = None
+
+
+class SweepPointResult(object):
+    """The result of generating a single sweep point.
+
+    Parameters
+    ----------
+    index : int
+        the sweep point index.
+    cell_name : str
+        the generated cell name.
+    swp_values : Dict[str, Any]
+        the swept parameter values of this point.
+    sch_params : Optional[Dict[str, Any]]
+        the schematic parameters computed by the layout generator.
+    content_list : Optional[List[Any]]
+        the layout content list, ready to be passed to the database interface.
+    timing : Dict[str, float]
+        runtime of each stage of this point, in seconds.
+    error : str
+        the formatted traceback if generation failed, empty string otherwise.
+    """
+
+    def __init__(self, index, cell_name, swp_values, sch_params, content_list, timing, error=''):
+        # type: (...) -> None
+        self.index = index
+        self.cell_name = cell_name
+        self.swp_values = swp_values
+        self.sch_params = sch_params
+        self.content_list = content_list
+        self.timing = timing
+        self.error = error
+
+    @property
+    def success(self):
+        # type: () -> bool
+        return not self.error
+
+    def __repr__(self):
+        return '%s(%d, %r, %s)' % (self.__class__.__name__, self.index, self.cell_name,
+                                   'ok' if self.success else 'failed')
+
+
+def get_sweep_points(specs):
+    # type: (Dict[str, Any]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]
+    """Expand the swp_params section of a specification into individual sweep points.
+
+    The Cartesian product of all swept values is taken in the order the sweep parameters
+    appear in the specification, with the last parameter varying fastest.
+
+    Parameters
+    ----------
+    specs : Dict[str, Any]
+        the specification dictionary.
+
+    Returns
+    -------
+    point_list : List[Tuple[Dict[str, Any], Dict[str, Any]]]
+        list of (swept values, full layout parameters) tuples.
+    """
+    base_params = specs['params']
+    swp_params = specs.get('swp_params', None) or {}
+
+    swp_names = list(swp_params.keys())
+    point_list = []
+    for values in itertools.product(*(swp_params[name] for name in swp_names)):
+        swp_values = dict(zip(swp_names, values))
+        params = copy.deepcopy(base_params)
+        params.update(swp_values)
+        point_list.append((swp_values, params))
+    return point_list
+
+
+def get_sub_cell_suffix(cell_name):
+    # type: (str) -> str
+    """Returns the suffix appended to the sub-cell names of the given top cell."""
+    return '_' + cell_name
+
+
+def rename_sub_cells(content_list, top_cell_name, suffix):
+    # type: (List[Any], str, str) -> List[Any]
+    """Append a suffix to all sub-cell names of a layout content list.
+
+    Each sweep point is generated by its own TemplateDB, so sub-masters of different points
+    get the same cell names even when their content differs.  Renaming the sub-cells of
+    each point keeps them apart when all points are written to one library.
+
+    Parameters
+    ----------
+    content_list : List[Any]
+        the layout content list.  Instances of cells outside this list are not renamed.
+    top_cell_name : str
+        the top cell name, which is kept.
+    suffix : str
+        the suffix to append.
+
+    Returns
+    -------
+    new_content_list : List[Any]
+        the renamed content list.  The given list is not modified.
+    """
+    rename_dict = {content[0]: content[0] + suffix for content in content_list
+                   if content[0] != top_cell_name}
+    new_content_list = []
+    for content in content_list:
+        inst_list = []
+        for inst in content[1]:
+            new_name = rename_dict.get(inst['cell'], None)
+            if new_name is not None:
+                inst = dict(inst)
+                inst['cell'] = new_name
+            inst_list.append(inst)
+        new_content_list.append((rename_dict.get(content[0], content[0]), inst_list) + tuple(content[2:]))
+    return new_content_list
+
+
+def _init_worker(bag_config_path):
+    # type: (Optional[str]) -> None
+    """Process pool initializer; builds the technology information once per worker."""
+    global _worker_tech_info
+
+    from bag.core import create_tech_info
+    _worker_tech_info = create_tech_info(bag_config_path=bag_config_path)
+
+
+def _create_template_db(tech_info, specs):
+    """Create a TemplateDB that keeps layout content in memory instead of writing to the database."""
+    from bag.layout.routing import RoutingGrid
+    from bag.layout.template import TemplateDB
+
+    class _ContentTemplateDB(TemplateDB):
+        def __init__(self, *args, **kwargs):
+            TemplateDB.__init__(self, *args, **kwargs)
+            self.content_list = None
+
+        def create_masters_in_db(self, lib_name, content_list, debug=False):
+            self.content_list = content_list
+
+    grid_specs = specs['routing_grid']
+    routing_grid = RoutingGrid(tech_info, grid_specs['layers'], grid_specs['spaces'],
+                               grid_specs['widths'], grid_specs['bot_dir'])
+    return _ContentTemplateDB('template_libs.def', routing_grid, specs['impl_lib'])
+
+
+def _generate_point(index, cell_name, swp_values, params, specs, temp_cls):
+    # type: (int, str, Dict[str, Any], Dict[str, Any], Dict[str, Any], Type[TemplateBase]) -> SweepPointResult
+    """Generate the layout of a single sweep point in a worker process."""
+    timing = {}
+    try:
+        t0 = time.time()
+        temp_db = _create_template_db(_worker_tech_info, specs)
+        template = temp_db.new_template(params=params, temp_cls=temp_cls)
+        t1 = time.time()
+        temp_db.batch_layout(None, [template], [cell_name])
+        t2 = time.time()
+        timing['layout'] = t1 - t0
+        timing['content'] = t2 - t1
+        content_list = rename_sub_cells(temp_db.content_list, cell_name, get_sub_cell_suffix(cell_name))
+        return SweepPointResult(index, cell_name, swp_values, template.sch_params, content_list, timing)
+    except Exception:
+        return SweepPointResult(index, cell_name, swp_values, None, None, timing,
+                                error=traceback.format_exc())
+
+
+class SweepRunner(object):
+    """Generates all points of a layout sweep on a process pool.
+
+    Each worker process builds the technology information once at startup, so
+    TechInfoCDSFFMPT and MOSTechCDSFFMPT are already warm when sweep points arrive.
+    Layout and schematic sub-cells of each point are suffixed with the point's cell name,
+    so all points can be written to the same library.
+
+    Parameters
+    ----------
+    specs : Dict[str, Any]
+        the specification dictionary, with impl_lib, sch_lib, sch_cell, routing_grid,
+        params, and optionally swp_params entries.
+    temp_cls : Type[TemplateBase]
+        the layout generator class.  Must be importable by worker processes.
+    max_workers : Optional[int]
+        maximum number of worker processes.  Defaults to the number of CPUs.
+    bag_config_path : Optional[str]
+        the BAG configuration file.  Defaults to the BAG_CONFIG_PATH environment variable.
+    """
+
+    def __init__(self, specs, temp_cls, max_workers=None, bag_config_path=None):
+        # type: (Dict[str, Any], Type[TemplateBase], Optional[int], Optional[str]) -> None
+        self._specs = specs
+        self._temp_cls = temp_cls
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._bag_config_path = bag_config_path
+
+    @property
+    def max_workers(self):
+        # type: () -> int
+        return self._max_workers
+
+    def get_cell_name(self, index):
+        # type: (int) -> str
+        return '%s_%d' % (self._specs['sch_cell'].upper(), index)
+
+    def run(self):
+        # type: () -> List[SweepPointResult]
+        """Generate all sweep points.
+
+        Returns
+        -------
+        result_list : List[SweepPointResult]
+            the sweep results, in sweep point order.  Failed points have their
+            traceback stored in the error attribute.
+        """
+        specs = self._specs
+        point_list = get_sweep_points(specs)
+        num_workers = min(self._max_workers, len(point_list))
+        if num_workers == 0:
+            return []
+
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                 initargs=(self._bag_config_path,)) as executor:
+            future_list = [executor.submit(_generate_point, idx, self.get_cell_name(idx),
+                                           swp_values, params, specs, self._temp_cls)
+                           for idx, (swp_values, params) in enumerate(point_list)]
+            return [future.result() for future in future_list]
+
+    def instantiate(self, prj, result_list, gen_sch=True, merge_layers=None):
+        # type: (BagProject, List[SweepPointResult], bool, Optional[Iterable[Tuple[str, str]]]) -> None
+        """Write successful sweep results to the database.
+
+        Parameters
+        ----------
+        prj : BagProject
+            the BagProject instance.
+        result_list : List[SweepPointResult]
+            the sweep results returned by run().
+        gen_sch : bool
+            True to also generate schematics from the computed schematic parameters.
+        merge_layers : Optional[Iterable[Tuple[str, str]]]
+            if given, rectangles of these layers are merged across the cell hierarchy of
+            each point with merge_content_list() before it is written.
+        """
+        specs = self._specs
+        impl_lib = specs['impl_lib']
+        via_tech = prj.tech_info.via_tech_name
+        for result in result_list:
+            if not result.success:
+                continue
+            t0 = time.time()
+            content_list = result.content_list
+            if merge_layers is not None:
+                from .drc.merge import merge_content_list
+
+                content_list = merge_content_list(content_list, layers=merge_layers)
+            prj.instantiate_layout(impl_lib, 'layout', via_tech, content_list)
+            t1 = time.time()
+            result.timing['instantiate'] = t1 - t0
+            if gen_sch:
+                dsn = prj.create_design_module(lib_name=specs['sch_lib'], cell_name=specs['sch_cell'])
+                dsn.design(**result.sch_params)
+                dsn.implement_design(impl_lib, top_cell_name=result.cell_name,
+                                     suffix=get_sub_cell_suffix(result.cell_name))
+                result.timing['schematic'] = time.time() - t1
@@ -1,24 +1,217 @@
 # -*- coding: utf-8 -*-
 
-from typing import TYPE_CHECKING, List, Tuple, Optional, Callable
+from typing import TYPE_CHECKING, Dict, Any, List, Tuple, Optional, Callable
 
+import os
+import hashlib
+from collections import OrderedDict
+
+from bag.io import read_yaml
 from bag.layout.tech import TechInfoConfig
 
 from . import config as _config
+from . import config_hash as _config_hash
 from .mos.base import MOSTechCDSFFMPT
+from .rules import DRCRuleTables
+from .layers import MOSLayerTable, get_prim_flavors
 
 if TYPE_CHECKING:
     from bag.layout.template import TemplateBase
 
+# technology information objects in this process, keyed by technology configuration hash.
+# Only the most recently used ones are kept; evicted objects are rebuilt when unpickled.
+_tech_info_cache = OrderedDict()  # type: OrderedDict
+_max_tech_info = 8
+
+
+def _add_tech_info(tech_info):
+    # type: (TechInfoCDSFFMPT) -> None
+    """Add a technology information object to the cache, unless one with its key exists."""
+    key = tech_info.tech_key
+    if key not in _tech_info_cache:
+        _tech_info_cache[key] = tech_info
+        while len(_tech_info_cache) > _max_tech_info:
+            _tech_info_cache.popitem(last=False)
+
+
+def _get_cached_tech_info(key):
+    # type: (str) -> Optional[TechInfoCDSFFMPT]
+    tech_info = _tech_info_cache.get(key, None)
+    if tech_info is not None:
+        _tech_info_cache.move_to_end(key)
+    return tech_info
+
+
+def get_tech_config_path(bag_config_path=None):
+    # type: (Optional[str]) -> Optional[str]
+    """Returns the technology configuration file path defined in the BAG configuration file.
+
+    Parameters
+    ----------
+    bag_config_path : Optional[str]
+        the BAG configuration file.  Defaults to the BAG_CONFIG_PATH environment variable.
+
+    Returns
+    -------
+    tech_config_path : Optional[str]
+        the technology configuration file, or None if it is not defined.
+    """
+    if bag_config_path is None:
+        bag_config_path = os.environ.get('BAG_CONFIG_PATH', '')
+    if not bag_config_path or not os.path.isfile(bag_config_path):
+        return None
+    tech_config_path = read_yaml(bag_config_path).get('tech_config_path', '')
+    return os.path.abspath(os.path.expandvars(tech_config_path)) if tech_config_path else None
+
+
+# process_params entries filled in by TechInfoCDSFFMPT, excluded from the technology key.
+_tech_class_keys = ('mos_tech_class', 'laygo_tech_class', 'res_tech_class')
+
+
+def _get_canonical(obj):
+    # type: (Any) -> Any
+    """Returns a copy of obj with dictionaries replaced by item tuples sorted by key repr."""
+    if isinstance(obj, dict):
+        return tuple(sorted(((repr(key), _get_canonical(val)) for key, val in obj.items())))
+    if isinstance(obj, (list, tuple)):
+        return type(obj).__name__, tuple(_get_canonical(val) for val in obj)
+    return obj
+
+
+def get_tech_key(process_params):
+    # type: (Dict[str, Any]) -> str
+    """Returns the hash of the technology parameters and the given process parameters.
+
+    The tech class entries that TechInfoCDSFFMPT adds to the layout section are ignored,
+    so the key is the same before and after the technology information is created.
+    """
+    params = dict(process_params)
+    layout = params.get('layout', None)
+    if isinstance(layout, dict):
+        params['layout'] = {key: val for key, val in layout.items() if key not in _tech_class_keys}
+    content = repr(_get_canonical(params)).encode('utf-8')
+    return hashlib.sha1(_config_hash.encode('ascii') + content).hexdigest()
+
+
+def get_tech_info(tech_config_path=None, tech_key=None, bag_config_path=None):
+    # type: (Optional[str], Optional[str], Optional[str]) -> TechInfoCDSFFMPT
+    """Returns the technology information object of the given configuration file.
+
+    The object is created only once per process; later calls return the cached instance
+    while it is among the most recently used ones.
+
+    Parameters
+    ----------
+    tech_config_path : Optional[str]
+        the technology configuration file.  Defaults to the one in the BAG configuration file.
+    tech_key : Optional[str]
+        the expected technology key.  If given, a cached object with this key is
+        returned directly, and an error is raised if the parameters in the configuration
+        file no longer match this key.
+    bag_config_path : Optional[str]
+        the BAG configuration file used to find the technology configuration file.
+        Defaults to the BAG_CONFIG_PATH environment variable.
+
+    Returns
+    -------
+    tech_info : TechInfoCDSFFMPT
+        the technology information object.
+    """
+    if tech_key is not None:
+        tech_info = _get_cached_tech_info(tech_key)
+        if tech_info is not None:
+            return tech_info
+
+    if tech_config_path is None:
+        tech_config_path = get_tech_config_path(bag_config_path)
+        if tech_config_path is None:
+            raise ValueError('Cannot find technology configuration file; is BAG_CONFIG_PATH set?')
+
+    process_params = read_yaml(tech_config_path)
+    cur_key = get_tech_key(process_params)
+    if tech_key is not None and cur_key != tech_key:
+        raise ValueError('Technology configuration %s changed since it was pickled.' % tech_config_path)
+    tech_info = _get_cached_tech_info(cur_key)
+    if tech_info is None:
+        tech_info = TechInfoCDSFFMPT(process_params, tech_config_path=tech_config_path)
+    return tech_info
+
 
 class TechInfoCDSFFMPT(TechInfoConfig):
-    def __init__(self, process_params):
+    def __init__(self, process_params, tech_config_path=None):
+        # hash the parameters this object is built from, before the tech classes are added.
+        self._tech_key = get_tech_key(process_params)
         TechInfoConfig.__init__(self, _config, process_params)
 
-        process_params['layout']['mos_tech_class'] = MOSTechCDSFFMPT(_config, self)
+        self._mos_tech = MOSTechCDSFFMPT(_config, self)
+        self._drc_rules = DRCRuleTables(_config)
+        self._mos_layers = MOSLayerTable(_config, get_prim_flavors())
+        process_params['layout']['mos_tech_class'] = self._mos_tech
         process_params['layout']['laygo_tech_class'] = None
         process_params['layout']['res_tech_class'] = None
 
+        if tech_config_path is None:
+            tech_config_path = get_tech_config_path()
+        if tech_config_path is None:
+            self._tech_config_path = None
+        else:
+            self._tech_config_path = os.path.abspath(tech_config_path)
+        _add_tech_info(self)
+
+    def __reduce__(self):
+        if self._tech_config_path is None:
+            raise TypeError('Cannot pickle %s without a technology configuration file.' %
+                            self.__class__.__name__)
+        return get_tech_info, (self._tech_config_path, self._tech_key)
+
+    @property
+    def mos_tech(self):
+        # type: () -> MOSTechCDSFFMPT
+        return self._mos_tech
+
+    @property
+    def tech_key(self):
+        # type: () -> str
+        """The hash of the technology parameters and the process parameters of this object."""
+        return self._tech_key
+
+    @property
+    def drc_rules(self):
+        # type: () -> DRCRuleTables
+        """The compiled spacing and length rule tables, with vectorized lookup methods."""
+        return self._drc_rules
+
+    @property
+    def mos_layers(self):
+        # type: () -> MOSLayerTable
+        """The compiled implant and threshold layers of each (mos_type, threshold)."""
+        return self._mos_layers
+
+    def get_implant_layers(self, mos_type, res_type=None):
+        if res_type is not None:
+            return TechInfoConfig.get_implant_layers(self, mos_type, res_type=res_type)
+        return list(self._mos_layers.get_implant_layers(mos_type))
+
+    def get_threshold_layers(self, mos_type, threshold, res_type=None):
+        if res_type is not None:
+            return TechInfoConfig.get_threshold_layers(self, mos_type, threshold, res_type=res_type)
+        return list(self._mos_layers.get_threshold_layers(mos_type, threshold))
+
+    def get_min_space(self, layer_type, width, unit_mode=False, same_color=False):
+        res = self.resolution
+        w_unit = width if unit_mode else int(round(width / res))
+        sp = self._drc_rules.get_min_space(layer_type, w_unit, same_color=same_color)
+        return sp if unit_mode else sp * res
+
+    def get_min_line_end_space(self, layer_type, width, unit_mode=False):
+        res = self.resolution
+        w_unit = width if unit_mode else int(round(width / res))
+        sp = self._drc_rules.get_min_line_end_space(layer_type, w_unit)
+        return sp if unit_mode else sp * res
+
+    def get_min_length(self, layer_type, w_unit):
+        return self._drc_rules.get_min_length(layer_type, w_unit)
+
     def get_metal_em_specs(self, layer_name, w, l=-1, vertical=False, **kwargs):
         metal_type = self.get_layer_type(layer_name)
         idc = self._get_metal_idc(metal_type, w, l, vertical, **kwargs)
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, List, Tuple, Optional, Callable, Sequence
+
+import os
+import json
+import time
+import mmap
+import shutil
+import struct
+import hashlib
+import tempfile
+
+# GDSII HEADER record, and the BGNLIB/BGNSTR records that hold modification/access dates.
+_GDS_HEADER = 0x0002
+_GDS_DATE_RECORDS = (0x0102, 0x0502)
+_gds_rec = struct.Struct('>HH')
+
+
+def hash_files(fname_list, chunk_size=1 << 20):
+    # type: (Sequence[str], int) -> str
+    """Returns the combined content hash of the given files."""
+    h = hashlib.sha256()
+    for fname in fname_list:
+        h.update(os.path.basename(fname).encode('utf-8'))
+        with open(fname, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_layout_file(fname):
+    # type: (str) -> str
+    """Returns the content hash of a layout file, ignoring GDSII timestamps.
+
+    The dates of the BGNLIB and BGNSTR records are hashed as zeros, so re-exporting an
+    unchanged cell gives the same hash.  Files that are not GDSII are hashed as is.
+    """
+    h = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < _gds_rec.size:
+            h.update(f.read())
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            if _gds_rec.unpack_from(data, 0)[1] != _GDS_HEADER:
+                h.update(data)
+                return h.hexdigest()
+            start = idx = 0
+            while idx + _gds_rec.size <= size:
+                rec_len, rec_type = _gds_rec.unpack_from(data, idx)
+                if rec_len < _gds_rec.size:
+                    # zero padding after ENDLIB, or a corrupt file.
+                    break
+                if rec_type in _GDS_DATE_RECORDS:
+                    body_start = idx + _gds_rec.size
+                    h.update(data[start:body_start])
+                    h.update(bytes(rec_len - _gds_rec.size))
+                    start = idx + rec_len
+                idx += rec_len
+            h.update(data[start:])
+    return h.hexdigest()
+
+
+def hash_netlist_file(fname):
+    # type: (str) -> str
+    """Returns the content hash of a CDL/SPICE netlist, ignoring comments and blank lines.
+
+    Comment lines, such as the "Generated on" header written by netlisters, do not
+    affect the hash.  "*." directives such as *.PININFO are kept.
+    """
+    h = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        for line in f:
+            line = line.strip()
+            if not line or (line.startswith(b'*') and not line.startswith(b'*.')):
+                continue
+            h.update(line)
+            h.update(b'\n')
+    return h.hexdigest()
+
+
+class LVSCellInfo(object):
+    """The LVS inputs of a single cell.
+
+    Parameters
+    ----------
+    cell_name : str
+        the cell name.
+    layout_file : str
+        the exported layout (GDS) file.
+    netlist_file : str
+        the exported CDL netlist.
+    children : Sequence[str]
+        names of the sub-cells of this cell that are also checked.
+    """
+
+    __slots__ = ('cell_name', 'layout_file', 'netlist_file', 'children')
+
+    def __init__(self, cell_name, layout_file, netlist_file, children=()):
+        # type: (str, str, str, Sequence[str]) -> None
+        self.cell_name = cell_name
+        self.layout_file = layout_file
+        self.netlist_file = netlist_file
+        self.children = list(children)
+
+
+class LVSResultCache(object):
+    """A persistent store of clean LVS reports keyed by input hashes.
+
+    Parameters
+    ----------
+    cache_dir : str
+        the cache directory.  Environment variables are expanded.
+    rule_files : Sequence[str]
+        the LVS runset and rule files, such as the checker lvs_runset and lvs_rule_file
+        entries of bag_config.yaml.  Their content is part of every cache key.
+    """
+
+    def __init__(self, cache_dir, rule_files):
+        # type: (str, Sequence[str]) -> None
+        self._cache_dir = os.path.abspath(os.path.expandvars(cache_dir))
+        self._rule_hash = hash_files([os.path.expandvars(fname) for fname in rule_files])
+        os.makedirs(self._cache_dir, exist_ok=True)
+
+    def get_key(self, info, child_keys):
+        # type: (LVSCellInfo, Sequence[str]) -> str
+        """Returns the cache key of a cell given the cache keys of its children."""
+        h = hashlib.sha256(self._rule_hash.encode('ascii'))
+        h.update(info.cell_name.encode('utf-8'))
+        h.update(hash_layout_file(info.layout_file).encode('ascii'))
+        h.update(hash_netlist_file(info.netlist_file).encode('ascii'))
+        for key in child_keys:
+            h.update(key.encode('ascii'))
+        return h.hexdigest()
+
+    def _get_paths(self, key):
+        # type: (str) -> Tuple[str, str]
+        base = os.path.join(self._cache_dir, key)
+        return base + '.json', base + '.rpt'
+
+    def get(self, key):
+        # type: (str) -> Optional[str]
+        """Returns the path of the cached clean report, or None on a miss."""
+        info_file, rpt_file = self._get_paths(key)
+        if os.path.isfile(info_file) and os.path.isfile(rpt_file):
+            return rpt_file
+        return None
+
+    def put(self, key, cell_name, report_file):
+        # type: (str, str, str) -> str
+        """Store a clean report.  Returns the path of the cached copy."""
+        info_file, rpt_file = self._get_paths(key)
+        fd, tmp_name = tempfile.mkstemp(dir=self._cache_dir)
+        os.close(fd)
+        shutil.copyfile(report_file, tmp_name)
+        os.replace(tmp_name, rpt_file)
+        with open(info_file, 'w') as f:
+            json.dump(dict(cell_name=cell_name, report=report_file, time=time.time()), f)
+        return rpt_file
+
+
+class IncrementalLVS(object):
+    """Runs LVS over a cell hierarchy bottom-up, skipping cells whose inputs are unchanged.
+
+    A cell's cache key covers its layout, its CDL netlist, the LVS rule files, and the keys
+    of its children, so a change in any sub-cell also reruns every cell above it.  GDSII
+    timestamps and netlist comments are not part of the key.  Only clean results are cached.
+
+    Parameters
+    ----------
+    run_lvs : Callable[[str], Tuple[bool, str]]
+        runs LVS on the given cell name and returns (clean, report file), for example a
+        thin wrapper around the checker's run_lvs().
+    cache : LVSResultCache
+        the LVS result cache.
+    """
+
+    def __init__(self, run_lvs, cache):
+        # type: (Callable[[str], Tuple[bool, str]], LVSResultCache) -> None
+        self._run_lvs = run_lvs
+        self._cache = cache
+
+    @staticmethod
+    def get_bottom_up_order(cell_table):
+        # type: (Dict[str, LVSCellInfo]) -> List[str]
+        """Returns cell names ordered such that every cell comes after its children."""
+        order = []
+        state = {}  # type: Dict[str, int]
+        for top in cell_table:
+            stack = [(top, False)]
+            while stack:
+                name, expanded = stack.pop()
+                if expanded:
+                    state[name] = 2
+                    order.append(name)
+                    continue
+                cur_state = state.get(name, 0)
+                if cur_state == 2:
+                    continue
+                if cur_state == 1:
+                    raise ValueError('Cell hierarchy has a cycle through %s' % name)
+                state[name] = 1
+                stack.append((name, True))
+                for child in cell_table[name].children:
+                    if child in cell_table and state.get(child, 0) != 2:
+                        if state.get(child, 0) == 1:
+                            raise ValueError('Cell hierarchy has a cycle through %s' % child)
+                        stack.append((child, False))
+        return order
+
+    def run(self, cell_table):
+        # type: (Dict[str, LVSCellInfo]) -> Dict[str, Tuple[bool, str, bool]]
+        """Run LVS on all cells.
+
+        Parameters
+        ----------
+        cell_table : Dict[str, LVSCellInfo]
+            the cells to check, keyed by cell name.
+
+        Returns
+        -------
+        results : Dict[str, Tuple[bool, str, bool]]
+            map from cell name to (clean, report file, cache hit).
+        """
+        cache = self._cache
+        key_table = {}  # type: Dict[str, str]
+        results = {}
+        for name in self.get_bottom_up_order(cell_table):
+            info = cell_table[name]
+            child_keys = [key_table[child] for child in info.children if child in key_table]
+            key = key_table[name] = cache.get_key(info, child_keys)
+            rpt_file = cache.get(key)
+            if rpt_file is not None:
+                results[name] = (True, rpt_file, True)
+                continue
+            clean, rpt_file = self._run_lvs(name)
+            if clean:
+                rpt_file = cache.put(key, name, rpt_file)
+            results[name] = (clean, rpt_file, False)
+        return results
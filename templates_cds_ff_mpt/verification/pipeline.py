@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, List, Tuple, Optional, Callable, Sequence
+
+import os
+import sys
+import copy
+import time
+import tempfile
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# a checker function takes (cell name, number of CPUs) and returns (success, log file).
+CheckerFun = Callable[[str, int], Tuple[bool, str]]
+
+
+def get_rcx_params(rcx_params, num_cpus):
+    # type: (Dict[str, Any], int) -> Dict[str, Any]
+    """Returns a copy of the rcx_params of bag_config.yaml with the given number of CPUs."""
+    ans = copy.deepcopy(rcx_params)
+    ans.setdefault('distributed_processing', {})['multi_cpu'] = num_cpus
+    return ans
+
+
+def get_job_cpus(free_cpus, num_waiting, max_cpus):
+    # type: (int, int, int) -> int
+    """Returns the number of CPUs to give the next job.
+
+    Free CPUs are split evenly among waiting jobs, so a deep queue runs many single
+    CPU jobs while a short queue gives each job more CPUs.
+    """
+    if free_cpus <= 0:
+        return 0
+    return max(1, min(max_cpus, free_cpus // max(num_waiting, 1)))
+
+
+class StubChecker(object):
+    """A checker stand-in that runs a sleeping subprocess, for testing without PVS/QRC.
+
+    Parameters
+    ----------
+    runtime_fun : Callable[[str], float]
+        returns the single CPU runtime of a cell, in seconds.  The runtime is divided by
+        the number of CPUs given to the job.
+    fail_cells : Sequence[str]
+        cells that fail this check.
+    log_dir : Optional[str]
+        directory of the log files.  Defaults to a new temporary directory.
+    """
+
+    def __init__(self, runtime_fun, fail_cells=(), log_dir=None):
+        # type: (Callable[[str], float], Sequence[str], Optional[str]) -> None
+        self._runtime_fun = runtime_fun
+        self._fail_cells = set(fail_cells)
+        self._log_dir = log_dir or tempfile.mkdtemp(prefix='stub_checker_')
+
+    def __call__(self, cell_name, num_cpus):
+        # type: (str, int) -> Tuple[bool, str]
+        runtime = self._runtime_fun(cell_name) / max(num_cpus, 1)
+        log_file = os.path.join(self._log_dir, '%s.log' % cell_name)
+        returncode = 1 if cell_name in self._fail_cells else 0
+        script = ('import sys, time\n'
+                  'time.sleep(%r)\n'
+                  'open(%r, "w").write("cpus: %d\\n")\n'
+                  'sys.exit(%d)\n' % (runtime, log_file, num_cpus, returncode))
+        proc = subprocess.run([sys.executable, '-c', script])
+        return proc.returncode == 0, log_file
+
+
+class VerificationResult(object):
+    """The generation, LVS, and RCX outcome of a single cell.
+
+    Parameters
+    ----------
+    cell_name : str
+        the cell name.
+    """
+
+    __slots__ = ('cell_name', 'gen_value', 'lvs', 'rcx', 'error')
+
+    def __init__(self, cell_name):
+        # type: (str) -> None
+        self.cell_name = cell_name
+        self.gen_value = None  # type: Any
+        self.lvs = None  # type: Optional[Tuple[bool, str]]
+        self.rcx = None  # type: Optional[Tuple[bool, str]]
+        self.error = ''
+
+    @property
+    def success(self):
+        # type: () -> bool
+        return (not self.error and self.lvs is not None and self.lvs[0] and
+                (self.rcx is None or self.rcx[0]))
+
+
+class VerificationPipeline(object):
+    """Overlaps layout generation with LVS and RCX of previously generated cells.
+
+    Cells are generated one at a time in order.  As soon as a cell is generated it is
+    queued for LVS, and a cell that passes LVS is queued for RCX.  Checker jobs share a
+    pool of num_cpus CPUs; each job is given a share of the free CPUs that depends on
+    the number of waiting jobs, so the worker count and per-job CPU count adapt to the
+    queue depth instead of being fixed.
+
+    Parameters
+    ----------
+    gen_fun : Callable[[str], Any]
+        generates the given cell.  Runs in a single dedicated thread.
+    lvs_fun : CheckerFun
+        runs LVS on the given cell with the given number of CPUs.
+    rcx_fun : Optional[CheckerFun]
+        runs RCX on the given cell with the given number of CPUs.  None to skip RCX.
+    num_cpus : Optional[int]
+        total CPUs available to checker jobs.  Defaults to the number of CPUs.
+    max_lvs_cpus : int
+        maximum CPUs of a single LVS job.
+    max_rcx_cpus : int
+        maximum CPUs of a single RCX job.
+    """
+
+    def __init__(self, gen_fun, lvs_fun, rcx_fun=None, num_cpus=None, max_lvs_cpus=4,
+                 max_rcx_cpus=8):
+        # type: (Callable[[str], Any], CheckerFun, Optional[CheckerFun], Optional[int], int, int) -> None
+        self._gen_fun = gen_fun
+        self._lvs_fun = lvs_fun
+        self._rcx_fun = rcx_fun
+        self._num_cpus = num_cpus or os.cpu_count() or 1
+        self._max_cpus = dict(lvs=max_lvs_cpus, rcx=max_rcx_cpus)
+        self._stats = {}  # type: Dict[str, Any]
+
+    @property
+    def stats(self):
+        # type: () -> Dict[str, Any]
+        """Statistics of the last run.
+
+        wall_time is the total time.  For each stage, busy_time is the summed job time,
+        cpu_time the summed job time weighted by CPUs, and utilization the fraction of
+        the wall time (generation) or of the CPU pool (checkers) used by the stage.
+        """
+        return self._stats
+
+    @staticmethod
+    def _timed(fun, *args):
+        t0 = time.time()
+        try:
+            return fun(*args), '', time.time() - t0
+        except Exception as ex:
+            return None, '%s: %s' % (type(ex).__name__, ex), time.time() - t0
+
+    def run(self, cell_list):
+        # type: (Sequence[str]) -> List[VerificationResult]
+        """Generate and verify the given cells.
+
+        Returns
+        -------
+        result_list : List[VerificationResult]
+            results in the same order as cell_list.
+        """
+        num_cpus = self._num_cpus
+        results = [VerificationResult(name) for name in cell_list]
+        gen_queue = deque(range(len(cell_list)))
+        queues = dict(lvs=deque(), rcx=deque())
+        funs = dict(lvs=self._lvs_fun, rcx=self._rcx_fun)
+        busy = dict(gen=0.0, lvs=0.0, rcx=0.0)
+        cpu_time = dict(lvs=0.0, rcx=0.0)
+        free_cpus = num_cpus
+        running = {}  # type: Dict[Any, Tuple[str, int, int]]
+
+        t_start = time.time()
+        with ThreadPoolExecutor(max_workers=1) as gen_pool, \
+                ThreadPoolExecutor(max_workers=num_cpus) as check_pool:
+            while gen_queue or queues['lvs'] or queues['rcx'] or running:
+                if gen_queue and not any(val[0] == 'gen' for val in running.values()):
+                    idx = gen_queue.popleft()
+                    future = gen_pool.submit(self._timed, self._gen_fun, cell_list[idx])
+                    running[future] = ('gen', idx, 0)
+                # drain downstream stages first to shorten per-cell latency.
+                for stage in ('rcx', 'lvs'):
+                    queue = queues[stage]
+                    while queue and free_cpus > 0:
+                        num_waiting = len(queues['lvs']) + len(queues['rcx'])
+                        ncpu = get_job_cpus(free_cpus, num_waiting, self._max_cpus[stage])
+                        idx = queue.popleft()
+                        free_cpus -= ncpu
+                        future = check_pool.submit(self._timed, funs[stage], cell_list[idx], ncpu)
+                        running[future] = (stage, idx, ncpu)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, idx, ncpu = running.pop(future)
+                    val, err, runtime = future.result()
+                    busy[stage] += runtime
+                    free_cpus += ncpu
+                    result = results[idx]
+                    if err:
+                        result.error = '%s: %s' % (stage, err)
+                    elif stage == 'gen':
+                        result.gen_value = val
+                        queues['lvs'].append(idx)
+                    else:
+                        cpu_time[stage] += runtime * ncpu
+                        setattr(result, stage, val)
+                        if stage == 'lvs' and val[0] and self._rcx_fun is not None:
+                            queues['rcx'].append(idx)
+
+        wall_time = time.time() - t_start
+        stats = dict(wall_time=wall_time, num_cpus=num_cpus)
+        for stage, val in busy.items():
+            if stage == 'gen':
+                util = val / wall_time if wall_time > 0 else 0.0
+                stats[stage] = dict(busy_time=val, utilization=util)
+            else:
+                util = cpu_time[stage] / (wall_time * num_cpus) if wall_time > 0 else 0.0
+                stats[stage] = dict(busy_time=val, cpu_time=cpu_time[stage], utilization=util)
+        self._stats = stats
+        return results
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Iterable, Iterator, Tuple, Optional, Callable, Sequence
+
+import re
+import mmap
+import contextlib
+
+# SPICE value suffixes, keyed by first letter; 'meg' is special cased.
+_SUFFIX_TABLE = {'t': 1e12, 'g': 1e9, 'k': 1e3, 'm': 1e-3, 'u': 1e-6, 'n': 1e-9, 'p': 1e-12,
+                 'f': 1e-15, 'a': 1e-18}
+_NUM_RE = re.compile(r'^([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)([a-zA-Z]*)$')
+
+# first tokens of control lines that carry no elements.
+_SKIP_KEYWORDS = frozenset(('simulator', 'include', 'parameters', 'global', 'model', 'section',
+                            'endsection', 'library', 'endlibrary'))
+
+# spectre primitive model names mapped to element kinds.
+_SPECTRE_KIND = {'resistor': 'R', 'capacitor': 'C', 'inductor': 'L'}
+# spectre has no element letters, so transistors are recognized by model name, such as
+# nch_lvt, pch_svt_mac, nmos, or pfet.
+_SPECTRE_MOS_RE = re.compile(r'^[np](?:ch|mos|fet)', re.IGNORECASE)
+
+
+def parse_value(token):
+    # type: (str) -> Optional[float]
+    """Parse a SPICE number with optional scale suffix.  Returns None if not a number."""
+    try:
+        return float(token)
+    except ValueError:
+        pass
+    mat = _NUM_RE.match(token)
+    if mat is None:
+        return None
+    val = float(mat.group(1))
+    suffix = mat.group(2).lower()
+    if suffix.startswith('meg'):
+        return val * 1e6
+    return val * _SUFFIX_TABLE.get(suffix[:1], 1.0)
+
+
+class NetlistElement(object):
+    """A device or parasitic element of an extracted netlist.
+
+    Parameters
+    ----------
+    kind : str
+        the element kind: 'R', 'C', 'L', 'M', or 'X' for other instances.
+    name : str
+        the element name.
+    nodes : Tuple[str, ...]
+        the connected nets.
+    value : Optional[float]
+        the resistance, capacitance, or inductance of parasitic elements.
+    model : str
+        the device model or subcircuit name.
+    params : Dict[str, str]
+        the instance parameters.
+    subckt : str
+        the enclosing subcircuit name, empty string at top level.
+    """
+
+    __slots__ = ('kind', 'name', 'nodes', 'value', 'model', 'params', 'subckt')
+
+    def __init__(self, kind, name, nodes, value=None, model='', params=None, subckt=''):
+        # type: (str, str, Tuple[str, ...], Optional[float], str, Optional[Dict[str, str]], str) -> None
+        self.kind = kind
+        self.name = name
+        self.nodes = nodes
+        self.value = value
+        self.model = model
+        self.params = params or {}
+        self.subckt = subckt
+
+    @property
+    def is_parasitic(self):
+        # type: () -> bool
+        return self.kind in ('R', 'C', 'L')
+
+    def __repr__(self):
+        return '%s(%r, %r, %r, value=%r, model=%r)' % (self.__class__.__name__, self.kind, self.name,
+                                                        self.nodes, self.value, self.model)
+
+
+def _iter_logical_lines(lines):
+    # type: (Iterable[bytes]) -> Iterator[str]
+    """Join SPICE '+' and spectre trailing backslash continuation lines.
+
+    Comment lines are dropped, so a continuation line after a comment continues the
+    element before the comment.
+    """
+    buf = []
+    for raw in lines:
+        line = raw.decode('utf-8', 'replace').rstrip()
+        if not line:
+            continue
+        head = line.lstrip()
+        if head[0] == '*' or head.startswith('//'):
+            continue
+        if line[0] == '+':
+            buf.append(line[1:])
+            continue
+        if buf and buf[-1].endswith('\\'):
+            buf[-1] = buf[-1][:-1]
+            buf.append(line)
+            continue
+        if buf:
+            yield ' '.join(buf)
+        buf = [line]
+    if buf:
+        yield ' '.join(buf)
+
+
+def _parse_params(tokens):
+    # type: (Sequence[str]) -> Tuple[list, Dict[str, str]]
+    pos_list = []
+    params = {}
+    for tok in tokens:
+        if tok.startswith('$'):
+            # DSPF annotations such as $X=... $lvl=...
+            continue
+        idx = tok.find('=')
+        if idx > 0:
+            params[tok[:idx]] = tok[idx + 1:]
+        else:
+            pos_list.append(tok)
+    return pos_list, params
+
+
+def _parse_spectre(line, subckt):
+    # type: (str, str) -> Optional[NetlistElement]
+    name, rest = line.split('(', 1)
+    node_str, rest = rest.split(')', 1)
+    nodes = tuple(node_str.split())
+    pos_list, params = _parse_params(rest.split())
+    model = pos_list[0] if pos_list else ''
+    kind = _SPECTRE_KIND.get(model, None)
+    if kind is None:
+        kind = 'M' if _SPECTRE_MOS_RE.match(model) else 'X'
+    value = None
+    if kind in ('R', 'C', 'L'):
+        value = parse_value(params.get(kind.lower(), ''))
+    return NetlistElement(kind, name.strip(), nodes, value=value, model=model, params=params,
+                          subckt=subckt)
+
+
+def _parse_spice(line, subckt):
+    # type: (str, str) -> Optional[NetlistElement]
+    tokens = line.split()
+    name = tokens[0]
+    kind = name[0].upper()
+    pos_list, params = _parse_params(tokens[1:])
+    if kind in ('R', 'C', 'L'):
+        nodes = tuple(pos_list[:2])
+        value = parse_value(pos_list[2]) if len(pos_list) > 2 else None
+        if value is None:
+            value = parse_value(params.get(kind, params.get(kind.lower(), '')))
+        model = pos_list[3] if len(pos_list) > 3 else ''
+        return NetlistElement(kind, name, nodes, value=value, model=model, params=params,
+                              subckt=subckt)
+    if kind not in ('M', 'X'):
+        kind = 'X'
+    return NetlistElement(kind, name, tuple(pos_list[:-1]), model=pos_list[-1] if pos_list else '',
+                          params=params, subckt=subckt)
+
+
+def iter_netlist(lines):
+    # type: (Iterable[bytes]) -> Iterator[NetlistElement]
+    """Parse an extracted SPICE/DSPF or spectre netlist one element at a time.
+
+    Parameters
+    ----------
+    lines : Iterable[bytes]
+        the netlist lines.
+
+    Yields
+    ------
+    elem : NetlistElement
+        the devices and parasitic elements, in netlist order.
+    """
+    subckt = ''
+    for line in _iter_logical_lines(lines):
+        head = line.lstrip()
+        first = head[0]
+        if first == '*' or first == '/':
+            continue
+        if first == '.' or first in 'segiplmESGIPLM':
+            # possible control statement
+            key = head.split(None, 1)[0].lower().lstrip('.')
+            if key == 'subckt':
+                subckt = head.split()[1]
+                continue
+            if key == 'ends':
+                subckt = ''
+                continue
+            if first == '.' or key in _SKIP_KEYWORDS:
+                continue
+        paren = head.find('(')
+        if 0 < paren < head.find(')') and '=' not in head[:paren]:
+            yield _parse_spectre(head, subckt)
+        else:
+            yield _parse_spice(head, subckt)
+
+
+@contextlib.contextmanager
+def open_netlist(fname, use_mmap=True):
+    """Open an extracted netlist and yield an iterator of its lines.
+
+    With use_mmap, the file is memory mapped so that pages are read on demand by the OS
+    and dropped under memory pressure, instead of going through Python read buffers.
+    """
+    with open(fname, 'rb') as f:
+        if not use_mmap:
+            yield iter(f)
+            return
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped.
+            yield iter(())
+            return
+        try:
+            yield iter(mm.readline, b'')
+        finally:
+            mm.close()
+
+
+def read_netlist(fname, filters=(), use_mmap=True):
+    # type: (str, Sequence[Callable[[NetlistElement], bool]], bool) -> Iterator[NetlistElement]
+    """Stream the elements of an extracted netlist file.
+
+    Parameters
+    ----------
+    fname : str
+        the netlist file name.
+    filters : Sequence[Callable[[NetlistElement], bool]]
+        elements are only yielded if all filters return True.  Filters are applied as
+        the file is parsed, so dropped elements are never accumulated.
+    use_mmap : bool
+        True to memory map the file.
+
+    Yields
+    ------
+    elem : NetlistElement
+        the elements that pass all filters.
+    """
+    with open_netlist(fname, use_mmap=use_mmap) as lines:
+        for elem in iter_netlist(lines):
+            if all(fun(elem) for fun in filters):
+                yield elem
+
+
+def min_cap_filter(cmin):
+    # type: (float) -> Callable[[NetlistElement], bool]
+    """Returns a filter that drops capacitors smaller than cmin, in Farads."""
+    def _fun(elem):
+        return elem.kind != 'C' or elem.value is None or elem.value >= cmin
+    return _fun
+
+
+def kind_filter(kinds):
+    # type: (Iterable[str]) -> Callable[[NetlistElement], bool]
+    """Returns a filter that keeps only the given element kinds."""
+    kind_set = frozenset(kinds)
+
+    def _fun(elem):
+        return elem.kind in kind_set
+    return _fun
+
+
+def net_filter(nets):
+    # type: (Iterable[str]) -> Callable[[NetlistElement], bool]
+    """Returns a filter that keeps only elements connected to one of the given nets."""
+    net_set = frozenset(nets)
+
+    def _fun(elem):
+        return any(node in net_set for node in elem.nodes)
+    return _fun
+
+
+def get_net_caps(elements, ground_nets=('0', 'VSS')):
+    # type: (Iterable[NetlistElement], Sequence[str]) -> Dict[str, Tuple[float, float]]
+    """Accumulate total capacitance per net in one pass.
+
+    Returns
+    -------
+    cap_table : Dict[str, Tuple[float, float]]
+        map from net name to (ground capacitance, coupling capacitance).
+    """
+    gnd_set = frozenset(ground_nets)
+    table = {}  # type: Dict[str, list]
+    for elem in elements:
+        if elem.kind != 'C' or elem.value is None or len(elem.nodes) != 2:
+            continue
+        n1, n2 = elem.nodes
+        idx = 0 if n1 in gnd_set or n2 in gnd_set else 1
+        for net in (n1, n2):
+            if net not in gnd_set:
+                table.setdefault(net, [0.0, 0.0])[idx] += elem.value
+    return {net: (val[0], val[1]) for net, val in table.items()}
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from templates_cds_ff_mpt.char.inverse import MOSInverseLookup, build_inverse_tables
+from templates_cds_ff_mpt.char.storage import CharStorage, CharStorageWriter
+
+_AXES = dict(vbs=np.linspace(0, -0.4, 3), vds=np.linspace(0.1, 0.9, 5), vgs=np.linspace(0, 1.0, 101))
+_K = 1e-4
+_LAMBDA = 0.2
+
+
+def _get_vth(vbs):
+    return 0.3 - 0.2 * vbs
+
+
+def _get_data(w=1.0):
+    """Square law device: vstar = vgs - vth, and gm / Id = 2 / vstar."""
+    vbs, vds, vgs = np.meshgrid(_AXES['vbs'], _AXES['vds'], _AXES['vgs'], indexing='ij')
+    vov = np.maximum(vgs - _get_vth(vbs), 0)
+    scale = _K * w * (1 + _LAMBDA * vds)
+    return scale * vov ** 2, 2 * scale * vov
+
+
+def test_get_vgs():
+    ibias, gm = _get_data()
+    lookup = MOSInverseLookup(_AXES, ibias, gm)
+    vstar = np.array([0.1, 0.2, 0.35])
+    assert lookup.get_vgs(vstar, 0.5) == pytest.approx(0.3 + vstar, abs=1e-4)
+    ans = lookup.get_vgs(0.15, np.array([0.3, 0.7]), vbs=np.array([[-0.2], [-0.4]]))
+    assert ans.shape == (2, 2)
+    assert ans[:, 0] == pytest.approx([0.49, 0.53], abs=1e-4)
+
+
+def test_get_current_density():
+    w = 4.0
+    ibias, gm = _get_data(w=w)
+    lookup = MOSInverseLookup(_AXES, -ibias, -gm, w=w)
+    gm_id = np.array([5.0, 10.0, 20.0])
+    expected = _K * (2 / gm_id) ** 2 * (1 + _LAMBDA * 0.5)
+    assert lookup.get_current_density(gm_id, 0.5, vbs=-0.2) == pytest.approx(expected, rel=5e-3)
+
+
+def test_clamp_out_of_range():
+    ibias, gm = _get_data()
+    lookup = MOSInverseLookup(_AXES, ibias, gm, vstar_range=(0.01, 0.9))
+    # the largest achievable vstar at vbs=0 is 1.0 - 0.3, so larger requests clamp to vgs = 1.0.
+    assert float(lookup.get_vgs(0.85, 0.5)) == pytest.approx(1.0, abs=1e-3)
+
+
+def test_build_inverse_tables(tmp_path):
+    writer = CharStorageWriter(str(tmp_path), 'nch', 'lvt', _AXES, [2, 4], ['gm', 'ibias'])
+    for env in ('tt', 'ss'):
+        data = [_get_data(w=w) for w in (2, 4)]
+        writer.write_env(env, dict(ibias=np.stack([val[0] for val in data]),
+                                   gm=np.stack([val[1] for val in data])))
+    storage = CharStorage(str(tmp_path), 'nch', 'lvt')
+    table = build_inverse_tables(storage, w_list=[4])
+    assert sorted(table.keys()) == [('ss', 4.0), ('tt', 4.0)]
+    jd = table['tt', 4.0].get_current_density(10.0, 0.5)
+    assert float(jd) == pytest.approx(_K * 0.2 ** 2 * 1.1, rel=5e-3)
+
+
+def test_zero_vds_row():
+    # no current flows at vds = 0, so those bias points cannot be inverted.
+    axes = dict(vbs=_AXES['vbs'], vds=np.linspace(0, 0.8, 5), vgs=_AXES['vgs'])
+    vbs, vds, vgs = np.meshgrid(axes['vbs'], axes['vds'], axes['vgs'], indexing='ij')
+    vov = np.maximum(vgs - _get_vth(vbs), 0)
+    scale = _K * (1 + _LAMBDA * vds) * np.minimum(vds / 0.2, 1)
+    lookup = MOSInverseLookup(axes, scale * vov ** 2, 2 * scale * vov)
+
+    vstar = np.array([0.1, 0.2])
+    assert lookup.get_vgs(vstar, 0.5) == pytest.approx(0.3 + vstar, abs=1e-4)
+    assert lookup.get_vgs(vstar, 0.0) == pytest.approx(0.3 + vstar, abs=1e-4)
+    gm_id = np.array([5.0, 10.0])
+    expected = _K * (2 / gm_id) ** 2 * (1 + _LAMBDA * 0.6)
+    assert lookup.get_current_density(gm_id, 0.6) == pytest.approx(expected, rel=5e-3)
+    assert np.all(np.isfinite(lookup.get_current_density(gm_id, 0.5)))
+
+    with pytest.raises(ValueError):
+        MOSInverseLookup(axes, np.zeros(vgs.shape), np.zeros(vgs.shape))
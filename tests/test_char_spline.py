@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from templates_cds_ff_mpt.char.spline import CubicGridSpline, MOSCharLookup, get_uniform_axis
+
+
+def _get_axes():
+    return dict(vbs=np.linspace(0, -0.4, 3), vds=np.linspace(0, 0.8, 9), vgs=np.linspace(0, 0.8, 17))
+
+
+def _get_data(fun):
+    axes = _get_axes()
+    vbs, vds, vgs = np.meshgrid(axes['vbs'], axes['vds'], axes['vgs'], indexing='ij')
+    return axes, fun(vbs, vds, vgs)
+
+
+def test_get_uniform_axis():
+    assert get_uniform_axis([0.0, 0.1, 0.2]) == pytest.approx((0.0, 0.1, 3))
+    assert get_uniform_axis([0.0, -0.2, -0.4]) == pytest.approx((0.0, -0.2, 3))
+    assert get_uniform_axis([0.5]) == (0.5, 1.0, 1)
+    with pytest.raises(ValueError):
+        get_uniform_axis([0.0, 0.1, 0.3])
+    with pytest.raises(ValueError):
+        get_uniform_axis([0.2, 0.2])
+
+
+def test_spline_interpolates_samples():
+    rand = np.random.RandomState(0)
+    values = rand.uniform(size=(5, 7, 2))
+    x, y = np.linspace(0, 1, 5), np.linspace(-1, 2, 7)
+    spline = CubicGridSpline([x, y], values)
+    xx, yy = np.meshgrid(x, y, indexing='ij')
+    ans = spline(np.stack((xx.ravel(), yy.ravel()), axis=-1))
+    assert ans == pytest.approx(values.reshape(-1, 2))
+    assert spline.ndim == 2 and spline.num_outputs == 2
+    assert spline.get_input_range(1) == pytest.approx((-1.0, 2.0))
+
+
+def test_spline_linear_exact_and_clamped():
+    x = np.linspace(0, 1, 6)
+    spline = CubicGridSpline([x], (2 * x + 1)[:, np.newaxis])
+    pts = np.array([[0.13], [0.5], [0.91]])
+    assert spline(pts)[:, 0] == pytest.approx(2 * pts[:, 0] + 1)
+    assert spline([[-1.0], [5.0]])[:, 0] == pytest.approx([1.0, 3.0])
+
+
+def test_spline_constant_dimension():
+    spline = CubicGridSpline([[0.0], np.linspace(0, 1, 4)], np.arange(4.0).reshape(1, 4, 1))
+    assert spline([[3.0, 1 / 3]])[0, 0] == pytest.approx(1.0)
+
+
+def test_spline_blocks():
+    rand = np.random.RandomState(1)
+    spline = CubicGridSpline([np.linspace(0, 1, 4), np.linspace(0, 1, 5)], rand.uniform(size=(4, 5, 3)))
+    pts = rand.uniform(size=(20, 2))
+    expected = spline(pts)
+    spline._block_size = 3
+    assert spline(pts) == pytest.approx(expected)
+    assert spline(pts, outputs=[2, 0]) == pytest.approx(expected[:, [2, 0]])
+
+
+def test_spline_bad_shape():
+    with pytest.raises(ValueError):
+        CubicGridSpline([np.linspace(0, 1, 4)], np.zeros(4))
+    with pytest.raises(ValueError):
+        CubicGridSpline([np.linspace(0, 1, 4)], np.zeros((5, 1)))
+
+
+def test_lookup_query():
+    axes, ibias = _get_data(lambda vbs, vds, vgs: 1e-4 * vgs * (1 + vds) * (1 + vbs))
+    _, gm = _get_data(lambda vbs, vds, vgs: 1e-4 * (1 + vds) * (1 + vbs) + 0 * vgs)
+    lookup = MOSCharLookup('nch', 'lvt', 'tt', axes, dict(ibias=ibias, gm=gm))
+    assert lookup.key == ('nch', 'lvt', 'tt')
+    assert lookup.names == ['gm', 'ibias']
+
+    vgs = np.array([0.25, 0.45, 0.65])
+    ans = lookup.query(vgs, 0.4, vbs=-0.2)
+    assert set(ans.keys()) == {'gm', 'ibias'}
+    assert ans['ibias'] == pytest.approx(1e-4 * vgs * 1.4 * 0.8, rel=1e-3)
+    assert ans['gm'].shape == (3, )
+
+    ans = lookup.query_grid([0.1, 0.2], [0.3, 0.5, 0.7], vbs=[0.0, -0.1], names=['gm'])
+    assert list(ans.keys()) == ['gm']
+    assert ans['gm'].shape == (2, 3, 2)
+    assert ans['gm'][1, 2, 0] == pytest.approx(1e-4 * 1.7 * 0.9, rel=1e-3)
+
+
+def test_lookup_bad_flavor():
+    axes, data = _get_data(lambda vbs, vds, vgs: vgs)
+    with pytest.raises(ValueError):
+        MOSCharLookup('nmos', 'lvt', 'tt', axes, dict(ibias=data))
+    with pytest.raises(ValueError):
+        MOSCharLookup('nch', 'ulvt', 'tt', axes, dict(ibias=data))
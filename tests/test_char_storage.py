@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from templates_cds_ff_mpt.char.storage import CharStorage, CharStorageWriter
+
+_AXES = dict(vbs=[0.0, -0.2], vds=[0.0, 0.4, 0.8], vgs=[0.0, 0.2, 0.4, 0.6])
+_SHAPE = (2, 2, 3, 4)
+
+
+def _get_data(offset):
+    base = np.arange(np.prod(_SHAPE), dtype=float).reshape(_SHAPE)
+    return dict(ibias=base + offset, gm=-base - offset)
+
+
+def test_write_read(tmp_path):
+    root = str(tmp_path)
+    writer = CharStorageWriter(root, 'nch', 'lvt', _AXES, [4, 8], ['ibias', 'gm'])
+    writer.write_env('tt', _get_data(0))
+    writer.write_env('ff', _get_data(100))
+
+    storage = CharStorage(root, 'nch', 'lvt')
+    assert storage.env_list == ['tt', 'ff']
+    assert storage.w_list == [4.0, 8.0]
+    assert storage.names == ['ibias', 'gm']
+    assert storage.axes['vgs'] == pytest.approx(_AXES['vgs'])
+
+    data = storage.get_data('ff', 8, names=['gm'])
+    assert list(data.keys()) == ['gm']
+    assert np.array_equal(data['gm'], _get_data(100)['gm'][1])
+    assert not data['gm'].flags.writeable
+    storage.close()
+
+
+def test_get_lookup_cached(tmp_path):
+    root = str(tmp_path)
+    writer = CharStorageWriter(root, 'pch', 'svt', _AXES, [4], ['ibias'])
+    writer.write_env('tt', dict(ibias=_get_data(0)['ibias'][:1]))
+
+    storage = CharStorage(root, 'pch', 'svt')
+    lookup = storage.get_lookup('tt', 4)
+    assert lookup is storage.get_lookup('tt', 4.0)
+    assert lookup.key == ('pch', 'svt', 'tt')
+    ans = lookup.query(0.2, 0.4, vbs=-0.2)['ibias']
+    assert float(ans) == pytest.approx(_get_data(0)['ibias'][0, 1, 1, 1])
+
+
+def test_missing_env_and_width(tmp_path):
+    root = str(tmp_path)
+    CharStorageWriter(root, 'nch', 'svt', _AXES, [4, 8], ['ibias', 'gm']).write_env('tt', _get_data(0))
+    storage = CharStorage(root, 'nch', 'svt')
+    with pytest.raises(ValueError):
+        storage.get_data('ss', 4)
+    with pytest.raises(ValueError):
+        storage.get_data('tt', 6)
+
+
+def test_reopen_keeps_corners(tmp_path):
+    root = str(tmp_path)
+    CharStorageWriter(root, 'nch', 'hvt', _AXES, [4, 8], ['ibias', 'gm']).write_env('tt', _get_data(0))
+    CharStorageWriter(root, 'nch', 'hvt', _AXES, [4, 8], ['ibias', 'gm']).write_env('ss', _get_data(1))
+    assert CharStorage(root, 'nch', 'hvt').env_list == ['tt', 'ss']
+
+    # a different sweep setup starts a new corner list.
+    CharStorageWriter(root, 'nch', 'hvt', _AXES, [4], ['ibias', 'gm']).write_env(
+        'ff', {key: val[:1] for key, val in _get_data(2).items()})
+    assert CharStorage(root, 'nch', 'hvt').env_list == ['ff']
+
+
+def test_unknown_flavor(tmp_path):
+    with pytest.raises(ValueError):
+        CharStorageWriter(str(tmp_path), 'nmos', 'lvt', _AXES, [4], ['ibias'])
+    with pytest.raises(ValueError):
+        CharStorage(str(tmp_path), 'nch', 'ulvt')
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from templates_cds_ff_mpt.drc.checker import DRCLiteChecker, summarize
+from templates_cds_ff_mpt.drc.index import find_close_pairs, get_gaps
+from templates_cds_ff_mpt.drc.shapes import ShapeSet
+
+
+def _brute_force_pairs(boxes, dist):
+    ans = set()
+    for i0, i1 in itertools.combinations(range(boxes.shape[0]), 2):
+        b0, b1 = boxes[i0], boxes[i1]
+        gap_x = max(b1[0] - b0[2], b0[0] - b1[2])
+        gap_y = max(b1[1] - b0[3], b0[1] - b1[3])
+        if gap_x < dist and gap_y < dist:
+            ans.add((i0, i1))
+    return ans
+
+
+def _random_boxes(rand, num, span, max_size):
+    xy = rand.randint(0, span, size=(num, 2))
+    wh = rand.randint(1, max_size, size=(num, 2))
+    return np.concatenate((xy, xy + wh), axis=1)
+
+
+@pytest.mark.parametrize('cell_size, max_entries', [(None, 50000000), (7, 50000000), (1000, 50000000),
+                                                    (3, 400)])
+def test_find_close_pairs(cell_size, max_entries):
+    rand = np.random.RandomState(0)
+    boxes = _random_boxes(rand, 300, 2000, 80)
+    for dist in (1, 10, 40):
+        idx0, idx1 = find_close_pairs(boxes, dist, cell_size=cell_size, max_entries=max_entries)
+        pairs = list(zip(idx0.tolist(), idx1.tolist()))
+        assert len(pairs) == len(set(pairs))
+        assert all(i0 < i1 for i0, i1 in pairs)
+        assert set(pairs) == _brute_force_pairs(boxes, dist)
+
+
+def test_find_close_pairs_small():
+    empty = np.empty((0, 4), dtype=np.int64)
+    assert find_close_pairs(empty, 10)[0].size == 0
+    assert find_close_pairs(np.array([[0, 0, 5, 5]]), 10)[0].size == 0
+    # touching boxes have zero gap; boxes exactly dist apart are not close.
+    boxes = np.array([[0, 0, 10, 10], [10, 0, 20, 10], [30, 0, 40, 10]])
+    idx0, idx1 = find_close_pairs(boxes, 10)
+    assert list(zip(idx0.tolist(), idx1.tolist())) == [(0, 1)]
+
+
+def test_get_gaps():
+    boxes = np.array([[0, 0, 10, 10], [15, -5, 20, 2], [2, 30, 4, 40]])
+    gap_x, gap_y = get_gaps(boxes, np.array([0, 0]), np.array([1, 2]))
+    assert gap_x.tolist() == [5, -4]
+    assert gap_y.tolist() == [-2, 20]
+
+
+def _rect(layer, xl, yb, xr, yt):
+    return dict(layer=layer, bbox=[[xl * 0.001, yb * 0.001], [xr * 0.001, yt * 0.001]])
+
+
+def _check(rect_list, inst_list=(), sub_list=()):
+    content_list = [(name, [], rects, [], []) for name, rects in sub_list]
+    content_list.append(('TOP', list(inst_list), rect_list, [], []))
+    shapes = ShapeSet.from_content_list(content_list)
+    return DRCLiteChecker().check(shapes), shapes
+
+
+def test_metal_spacing():
+    m1 = ('M1', 'drawing')
+    # parallel wires 20 apart, and collinear line ends 50 apart.
+    results, _ = _check([_rect(m1, 0, 0, 1000, 32), _rect(m1, 0, 52, 1000, 84),
+                         _rect(m1, 0, 500, 400, 532), _rect(m1, 450, 500, 1000, 532)])
+    assert sorted((v.rule, v.value, v.required) for v in results) == [('sp_min', 20.0, 32), ('sp_min', 50.0, 64)]
+    assert results[0].layer == m1
+
+    results, _ = _check([_rect(m1, 0, 0, 1000, 32), _rect(m1, 0, 64, 1000, 96),
+                         _rect(m1, 0, 500, 400, 532), _rect(m1, 464, 500, 1000, 532)])
+    assert results == []
+
+
+def test_min_length():
+    m2 = ('M2', 'drawing')
+    results, _ = _check([_rect(m2, 0, 0, 100, 32), _rect(m2, 1000, 0, 1100, 32), _rect(m2, 1100, 0, 1400, 32)])
+    assert [(v.rule, v.bbox, v.value, v.required) for v in results] == [('len_min', (0, 0, 100, 32), 100, 194)]
+
+
+def test_spy_rule_and_hierarchy():
+    od = ('Active', 'drawing')
+    sub_list = [('SUB', [_rect(od, 0, 0, 200, 40)])]
+    inst_list = [dict(cell='SUB', loc=(0, 0)), dict(cell='SUB', loc=(0.1, 0.045), orient='MY')]
+    results, shapes = _check([], inst_list=inst_list, sub_list=sub_list)
+    assert shapes.get_rects(od).tolist() == [[0, 0, 200, 40], [-100, 45, 100, 85]]
+    assert summarize(results) == {('od_spy', ('Active', '')): 1}
+    assert results[0].value == 5
+
+
+def test_via_dimension():
+    via = dict(id='M2_M1', loc=(0, 0), cut_width=0.001, cut_height=0.001, enc1=[0.1] * 4, enc2=[0.1] * 4)
+    shapes = ShapeSet.from_content_list([('TOP', [], [], [via], [])])
+    assert shapes.get_vias()['M2_M1'].shape == (1, 16)
+    counts = summarize(DRCLiteChecker().check(shapes))
+    assert counts[('via.dim', ('M2_M1', ''))] == 1
+
+
+def test_via_spacing_values():
+    enc = [0.04] * 4
+    via_list = [dict(id='M2_M1', loc=(0, 0), cut_width=0.032, cut_height=0.032, num_cols=3, sp_cols=0.030,
+                     enc1=enc, enc2=enc),
+                dict(id='M6_M5', loc=(1, 0), cut_width=0.042, cut_height=0.042, num_rows=3, num_cols=3,
+                     sp_rows=0.070, sp_cols=0.070, enc1=enc, enc2=enc)]
+    shapes = ShapeSet.from_content_list([('TOP', [], [], via_list, [])])
+    # via array rules are reported per via ID; cut to cut spacing is reported on the cut layer.
+    results = [v for v in DRCLiteChecker().check(shapes) if v.rule == 'via.sp' and v.layer[1] == '']
+    # a 3 x 3 array of 2x layer vias needs a 78 spacing, although 62 is enough for smaller arrays.
+    assert sorted((v.layer[0], v.value, v.required) for v in results) == [('M2_M1', 30, 42), ('M6_M5', 70, 78)]
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from templates_cds_ff_mpt.drc.coloring import LayerColoring, MPTColorEngine, get_mpt_layers
+from templates_cds_ff_mpt.drc.shapes import ShapeSet
+from templates_cds_ff_mpt.rules import DRCRuleTables
+from templates_cds_ff_mpt import config as tech_config
+
+
+def _wires(x_list, width=32, height=1000):
+    return np.array([[x, 0, x + width, height] for x in x_list])
+
+
+def _get_coloring():
+    return LayerColoring('1x', DRCRuleTables(tech_config))
+
+
+def test_get_mpt_layers():
+    assert get_mpt_layers() == {'M1': '1x', 'M2': '1x', 'M3': '1x'}
+
+
+def test_alternating_wires():
+    coloring = _get_coloring()
+    # 40 apart is below the same-color spacing of 48, 60 apart is not.
+    idx = coloring.add_shapes(_wires([0, 72, 144, 276]))
+    assert idx.tolist() == [0, 1, 2, 3]
+    colors = coloring.get_colors().tolist()
+    assert colors[0] != colors[1] != colors[2]
+    assert colors[3] == 0
+    assert coloring.get_odd_cycles() == []
+
+
+def test_touching_shapes_share_color():
+    coloring = _get_coloring()
+    coloring.add_shapes(_wires([0, 72]))
+    # a jog touching both wires merges them into one polygon that conflicts with itself.
+    coloring.add_shapes([[0, 500, 104, 532]])
+    colors = coloring.get_colors().tolist()
+    assert colors[0] == colors[1] == colors[2]
+    assert len(coloring.get_odd_cycles()) == 1
+
+
+def test_odd_cycle():
+    coloring = _get_coloring()
+    coloring.add_shapes([[0, 0, 32, 32], [70, 0, 102, 32], [35, 60, 67, 92]])
+    cycles = coloring.get_odd_cycles()
+    assert len(cycles) == 1
+    assert sorted(cycles[0]) == [0, 1, 2]
+
+
+def test_incremental_flip():
+    coloring = _get_coloring()
+    coloring.add_shapes(_wires([0, 216]))
+    assert coloring.get_colors().tolist() == [0, 0]
+    assert coloring.num_flips == 0
+
+    # the chain A - C - D - B forces A and B to different colors.
+    coloring.add_shapes(_wires([72, 144]))
+    a, b, c, d = coloring.get_colors().tolist()
+    assert a != c and c != d and d != b
+    assert coloring.num_flips == 1
+    assert coloring.num_shapes == 4
+
+    # a new wire that agrees with its colored neighbor does not flip anything.
+    coloring.add_shapes(_wires([288]))
+    assert coloring.get_colors().tolist()[4] != b
+    assert coloring.num_flips == 1
+
+
+def test_engine():
+    shapes = ShapeSet()
+    shapes.add_rects(('M1', 'drawing'), _wires([0, 72]))
+    shapes.add_rects(('M4', 'drawing'), _wires([0, 72]))
+    engine = MPTColorEngine()
+    assert engine.layers == ['M1', 'M2', 'M3']
+    idx_table = engine.add_shapes(shapes)
+    assert idx_table['M1'].tolist() == [0, 1]
+    assert idx_table['M2'].size == 0
+    assert engine.get_layer('M1').get_colors().tolist() == [0, 1]
+    assert engine.get_odd_cycles() == {}
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from templates_cds_ff_mpt.drc.density import DensityChecker, DensityMap, DensityRule, get_density_rules
+from templates_cds_ff_mpt.drc.shapes import ShapeSet
+
+
+def _brute_force_coverage(boxes, bbox, pixel):
+    nx = -(-(bbox[2] - bbox[0]) // pixel)
+    ny = -(-(bbox[3] - bbox[1]) // pixel)
+    cov = np.zeros((ny, nx))
+    for iy in range(ny):
+        py0 = bbox[1] + iy * pixel
+        for ix in range(nx):
+            px0 = bbox[0] + ix * pixel
+            for xl, yb, xr, yt in boxes:
+                dx = min(xr, px0 + pixel) - max(xl, px0)
+                dy = min(yt, py0 + pixel) - max(yb, py0)
+                if dx > 0 and dy > 0:
+                    cov[iy, ix] += dx * dy
+    return np.minimum(cov, pixel * pixel)
+
+
+def test_coverage_matches_brute_force():
+    rand = np.random.RandomState(0)
+    xy = rand.randint(-50, 900, size=(40, 2))
+    wh = rand.randint(1, 150, size=(40, 2))
+    boxes = np.concatenate((xy, xy + wh), axis=1)
+    bbox = (0, 0, 1000, 730)
+    dmap = DensityMap(boxes, bbox, 100)
+    assert dmap.shape == (8, 10)
+    assert dmap.pixel == 100
+    assert dmap.coverage == pytest.approx(_brute_force_coverage(boxes, bbox, 100))
+
+
+def test_window_density():
+    bbox = (0, 0, 400, 400)
+    # left half fully covered.
+    dmap = DensityMap([[0, 0, 200, 400]], bbox, 50)
+    xl, yb, density = dmap.get_window_density(200, 100)
+    assert xl.tolist() == [0, 100, 200]
+    assert yb.tolist() == [0, 100, 200]
+    assert density[0].tolist() == pytest.approx([1.0, 0.5, 0.0])
+    assert dmap.get_area(np.array([0]), np.array([0]), np.array([8]), np.array([8]))[0] == 200 * 400
+
+    # the window aligned to the right and top edges is always checked.
+    dmap = DensityMap([[400, 0, 450, 450]], (0, 0, 450, 450), 50)
+    xl, yb, density = dmap.get_window_density(200, 100)
+    assert xl.tolist() == [0, 100, 200, 250]
+    assert yb.tolist() == [0, 100, 200, 250]
+    assert density[0].tolist() == pytest.approx([0.0, 0.0, 0.0, 0.25])
+
+    # windows larger than the region shrink to the region.
+    dmap = DensityMap([[0, 0, 200, 400]], bbox, 50)
+    xl, yb, density = dmap.get_window_density(1000, 100)
+    assert xl.tolist() == [0] and yb.tolist() == [0]
+    assert density[0, 0] == pytest.approx(0.5)
+
+
+def test_empty_map():
+    dmap = DensityMap(np.empty((0, 4)), (0, 0, 100, 100), 30)
+    assert dmap.shape == (4, 4)
+    assert not np.any(dmap.coverage)
+
+
+def test_get_density_rules():
+    names = [rule.name for rule in get_density_rules()]
+    assert names == ['od_min_density', 'po_max_density', 'm1_sp_max']
+
+
+def test_checker():
+    shapes = ShapeSet()
+    shapes.add_rects(('Active', 'drawing'), [[0, 0, 100, 1000]])
+    shapes.add_rects(('Poly', 'drawing'), [[0, 0, 900, 1000]])
+    rules = [DensityRule('od_min', 'Active', 500, 500, min_density=0.1),
+             DensityRule('po_max', 'Poly', 1000, 500, max_density=0.8)]
+    results = DensityChecker(rules=rules, pixel=50).check(shapes, (0, 0, 1000, 1000))
+    summary = sorted((v.rule, v.bbox, round(v.value, 3), v.required) for v in results)
+    assert summary == [('od_min', (500, 0, 1000, 500), 0.0, 0.1), ('od_min', (500, 500, 1000, 1000), 0.0, 0.1),
+                       ('po_max', (0, 0, 1000, 1000), 0.9, 0.8)]
+
+
+def test_overlaps_counted_once():
+    # two overlapping shapes partially cover the same pixels.
+    shapes = ShapeSet()
+    shapes.add_rects(('Poly', 'drawing'), [[0, 0, 30, 100], [0, 0, 30, 100], [10, 50, 130, 100]])
+    bbox = (0, 0, 200, 100)
+    assert DensityMap(shapes.get_layer_rects('Poly'), bbox, 100).coverage.sum() > 30 * 100 + 120 * 50 - 20 * 50
+    dmap = DensityChecker(pixel=100).get_map(shapes, 'Poly', bbox)
+    assert dmap.coverage.tolist() == [[30 * 50 + 100 * 50, 30 * 50]]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from templates_cds_ff_mpt.drc.density import DensityMap
+from templates_cds_ff_mpt.drc.fill import (
+    FillGenerator, FillSpec, _expand_array, _get_free_regions, get_od_fill_spec, get_po_fill_spec,
+)
+from templates_cds_ff_mpt.drc.index import find_close_pairs, get_gaps
+from templates_cds_ff_mpt.drc.shapes import ShapeSet
+
+
+def test_free_regions_cover_mask():
+    rand = np.random.RandomState(0)
+    free = rand.uniform(size=(30, 40)) < 0.6
+    free[5:15, 10:30] = True
+    regions = _get_free_regions(free)
+    cover = np.zeros(free.shape, dtype=int)
+    for ix0, iy0, ix1, iy1 in regions:
+        cover[iy0:iy1, ix0:ix1] += 1
+    assert np.array_equal(cover, free.astype(int))
+    assert _get_free_regions(np.zeros((3, 3), dtype=bool)).shape == (0, 4)
+
+
+def test_fill_specs():
+    od_spec = get_od_fill_spec()
+    assert od_spec.layer == ('Active', 'dummy')
+    assert od_spec.w >= od_spec.w_min > 0
+    assert 0 < od_spec.target < od_spec.max_density <= 1
+    po_spec = get_po_fill_spec(target=1.0)
+    assert po_spec.layer == ('Poly', 'dummy')
+    assert po_spec.target < 1.0
+
+
+def _fill(blk_boxes, target):
+    spec = FillSpec(('Active', 'dummy'), 200, 100, 100, 50, 50, 60, target, y_grid=10, y_off=5)
+    shapes = ShapeSet()
+    shapes.add_rects(('Active', 'drawing'), blk_boxes)
+    bbox = (0, 0, 4000, 4000)
+    gen = FillGenerator(spec_list=[spec], window=2000, step=1000, pixel=50)
+    rect_list = gen.fill(shapes, bbox)
+    fill_boxes = np.concatenate([_expand_array(arr) for arr in rect_list], axis=0)
+    return spec, shapes, bbox, fill_boxes
+
+
+def test_fill_reaches_target():
+    blk = np.array([[1000, 1000, 2500, 1800]])
+    spec, shapes, bbox, fill_boxes = _fill(blk, 0.25)
+
+    # fill is added to the shape set, inside the cell, on the Y grid, and of legal size.
+    assert shapes.get_rects(spec.layer).shape[0] == fill_boxes.shape[0]
+    assert np.all(fill_boxes[:, :2] >= 0) and np.all(fill_boxes[:, 2:] <= 4000)
+    assert np.all((fill_boxes[:, 1] - spec.y_off) % spec.y_grid == 0)
+    assert np.all(fill_boxes[:, 2] - fill_boxes[:, 0] >= spec.w_min)
+    assert np.all(fill_boxes[:, 3] - fill_boxes[:, 1] == spec.h)
+
+    # fill keeps its spacing to blocking shapes and to other fill shapes.
+    gap_x = np.maximum(blk[0, 0] - fill_boxes[:, 2], fill_boxes[:, 0] - blk[0, 2])
+    gap_y = np.maximum(blk[0, 1] - fill_boxes[:, 3], fill_boxes[:, 1] - blk[0, 3])
+    assert np.all((gap_x >= spec.sp_other) | (gap_y >= spec.sp_other))
+    idx0, idx1 = find_close_pairs(fill_boxes, max(spec.spx, spec.spy))
+    gap_x, gap_y = get_gaps(fill_boxes, idx0, idx1)
+    assert np.all((gap_x >= spec.spx) | (gap_y >= spec.spy))
+
+    all_boxes = shapes.get_layer_rects('Active')
+    _, _, density = DensityMap(all_boxes, bbox, 50).get_window_density(2000, 1000)
+    assert np.all(density >= spec.target)
+
+
+def test_no_fill_when_dense():
+    spec = FillSpec(('Active', 'dummy'), 200, 100, 100, 50, 50, 60, 0.25)
+    shapes = ShapeSet()
+    shapes.add_rects(('Active', 'drawing'), [[0, 0, 4000, 4000]])
+    gen = FillGenerator(spec_list=[spec], window=2000, step=1000, pixel=50)
+    assert gen.fill(shapes, (0, 0, 4000, 4000)) == []
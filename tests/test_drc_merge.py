@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+import struct
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from templates_cds_ff_mpt.drc import merge as merge_module
+from templates_cds_ff_mpt.drc.merge import (MAX_POLYGON_POINTS, check_merge, merge_content, merge_content_list,
+                                            merge_rects, polygon_to_rects)
+from templates_cds_ff_mpt.gds import GDSLayerMap, GDSWriter, get_tech_layers
+
+_LAY = ('Nlvt', 'drawing')
+
+
+def _content(cell_name, inst_list=None, rect_list=None):
+    return cell_name, inst_list or [], rect_list or [], [], [], [], [], [], []
+
+
+def _rect(xl, yb, xr, yt, layer=_LAY, **kwargs):
+    ans = dict(layer=layer, bbox=[[xl, yb], [xr, yt]])
+    ans.update(kwargs)
+    return ans
+
+
+def _get_boxes(content, layer=_LAY):
+    # returns merged rectangles and polygons of content in resolution units.
+    rect_list = [tuple(int(round(v * 1000)) for v in rect['bbox'][0] + rect['bbox'][1])
+                 for rect in content[2] if tuple(rect['layer']) == layer]
+    poly_list = [[(int(round(x * 1000)), int(round(y * 1000))) for x, y in poly['points']]
+                 for poly in content[8] if tuple(poly['layer']) == layer]
+    return rect_list, poly_list
+
+
+def _staircase(num):
+    return np.array([[idx * 10, idx * 10, idx * 10 + 20, idx * 10 + 20] for idx in range(num)])
+
+
+def test_merge_l_shape():
+    boxes = np.array([[0, 0, 100, 50], [0, 50, 50, 100], [20, 20, 40, 40]])
+    rect_list, poly_list = merge_rects(boxes)
+    assert rect_list == []
+    assert len(poly_list) == 1
+    assert sorted(poly_list[0]) == [(0, 0), (0, 100), (50, 50), (50, 100), (100, 0), (100, 50)]
+    assert check_merge(boxes, rect_list, poly_list)
+
+
+def test_merge_touching_rects():
+    boxes = np.array([[0, 0, 100, 50], [100, 0, 200, 50]])
+    assert merge_rects(boxes) == ([(0, 0, 200, 50)], [])
+
+
+def test_check_merge_detects_errors():
+    boxes = np.array([[0, 0, 100, 50], [0, 50, 50, 100]])
+    assert not check_merge(boxes, [(0, 0, 100, 100)], [])
+    assert not check_merge(boxes, [(0, 0, 100, 50), (0, 40, 50, 100)], [])
+    assert not check_merge(boxes, [(0, 0, 100, 50)], [])
+
+
+def test_large_component_falls_back_to_rects():
+    boxes = _staircase(5000)
+    rect_list, poly_list = merge_rects(boxes)
+    assert poly_list == []
+    assert check_merge(boxes, rect_list, poly_list)
+
+    rect_list, poly_list = merge_rects(_staircase(100))
+    assert rect_list == [] and len(poly_list) == 1
+    assert len(poly_list[0]) == 400
+    assert len(poly_list[0]) <= MAX_POLYGON_POINTS
+
+    rect_list, poly_list = merge_rects(_staircase(100), max_points=399)
+    assert poly_list == []
+
+
+def test_polygon_to_rects():
+    points = [(0, 0), (100, 0), (100, 50), (50, 50), (50, 100), (0, 100)]
+    rect_list = polygon_to_rects(points)
+    assert check_merge(np.array(rect_list), [], [points])
+    assert polygon_to_rects(points[::-1]) == rect_list
+    with pytest.raises(ValueError):
+        polygon_to_rects([(0, 0), (100, 0), (50, 50)])
+
+
+def test_merge_content_arrays():
+    rect_list = [_rect(0, 0, 0.1, 0.1, arr_nx=3, arr_spx=0.1), _rect(0, 0, 0.1, 0.1, layer=('M1', 'drawing'))]
+    ans = merge_content(_content('CELL', rect_list=rect_list))
+    assert _get_boxes(ans) == ([(0, 0, 300, 100)], [])
+    assert _get_boxes(ans, layer=('M1', 'drawing')) == ([(0, 0, 100, 100)], [])
+
+
+def test_merge_abutting_sub_cells():
+    # two rows of different transistor blocks abut at y = 0.2; the upper row is mirrored.
+    row = _content('ROW', rect_list=[_rect(0, 0, 0.4, 0.2), _rect(0, 0, 0.4, 0.1, layer=('M1', 'drawing'))])
+    conn = _content('CONN', rect_list=[_rect(0, 0, 0.2, 0.3)])
+    top = _content('TOP', inst_list=[dict(cell='ROW', loc=(0, 0)),
+                                     dict(cell='CONN', loc=(0.1, 0.5), orient='MX'),
+                                     dict(cell='ROW', loc=(0.4, 0), num_cols=2, sp_cols=0.4)])
+    content_list = merge_content_list([row, conn, top])
+    assert [content[0] for content in content_list] == ['ROW', 'CONN', 'TOP']
+
+    new_row, new_conn, new_top = content_list
+    assert _get_boxes(new_row) == ([], [])
+    assert _get_boxes(new_row, layer=('M1', 'drawing')) == ([(0, 0, 400, 100)], [])
+    assert _get_boxes(new_conn) == ([], [])
+    assert new_top[1] == top[1]
+
+    rect_list, poly_list = _get_boxes(new_top)
+    assert rect_list == []
+    assert len(poly_list) == 1
+    assert sorted(poly_list[0]) == [(0, 0), (0, 200), (100, 200), (100, 500), (300, 200), (300, 500),
+                                    (1200, 0), (1200, 200)]
+
+
+def _count_shapes(content_list, layer=_LAY):
+    # returns the number of stored shapes, and the number of shapes after flattening.
+    table = {content[0]: content for content in content_list}
+
+    def get_flat_count(cell_name):
+        rect_list, poly_list = _get_boxes(table[cell_name], layer=layer)
+        ans = len(rect_list) + len(poly_list)
+        for inst in table[cell_name][1]:
+            ans += inst.get('num_rows', 1) * inst.get('num_cols', 1) * get_flat_count(inst['cell'])
+        return ans
+
+    num_stored = sum(len(rect_list) + len(poly_list)
+                     for rect_list, poly_list in (_get_boxes(content, layer=layer) for content in content_list))
+    return num_stored, get_flat_count(content_list[-1][0])
+
+
+def test_arrays_stay_hierarchical():
+    # a 50 x 50 array of spaced out leaf cells must not be flattened into 2500 shapes.
+    leaf = _content('LEAF', rect_list=[_rect(0, 0, 0.1, 0.1)])
+    top = _content('TOP', inst_list=[dict(cell='LEAF', loc=(0, 0), num_rows=50, num_cols=50, sp_rows=0.2,
+                                          sp_cols=0.2)])
+    new_leaf, new_top = merge_content_list([leaf, top])
+    assert _get_boxes(new_leaf) == ([(0, 0, 100, 100)], [])
+    assert _get_boxes(new_top) == ([], [])
+
+    # abutting array elements merge to a single rectangle per cell anyway, so nothing is moved.
+    top = _content('TOP', inst_list=[dict(cell='LEAF', loc=(0, 0), num_rows=50, num_cols=50, sp_rows=0.1,
+                                          sp_cols=0.1)])
+    new_leaf, new_top = merge_content_list([leaf, top])
+    assert _get_boxes(new_leaf) == ([(0, 0, 100, 100)], [])
+    assert _get_boxes(new_top) == ([], [])
+
+
+def test_shared_sub_cell_kept():
+    # ROW is used by two different parents, so its shapes must stay in ROW.
+    row = _content('ROW', rect_list=[_rect(0, 0, 0.4, 0.2)])
+    conn = _content('CONN', rect_list=[_rect(0, 0, 0.2, 0.3)])
+    mid = _content('MID', inst_list=[dict(cell='ROW', loc=(0, 0)), dict(cell='CONN', loc=(0, 0.2))])
+    top = _content('TOP', inst_list=[dict(cell='MID', loc=(0, 0)), dict(cell='ROW', loc=(0, 1))])
+    new_row, new_conn, new_mid, new_top = merge_content_list([row, conn, mid, top])
+    assert _get_boxes(new_row) == ([(0, 0, 400, 200)], [])
+    assert _get_boxes(new_conn) == ([(0, 0, 200, 300)], [])
+    assert _get_boxes(new_mid) == ([], [])
+    assert _get_boxes(new_top) == ([], [])
+
+
+def test_shape_count_not_increased():
+    leaf = _content('LEAF', rect_list=[_rect(0, 0, 0.1, 0.1), _rect(0.05, 0.1, 0.1, 0.2)])
+    cap = _content('CAP', rect_list=[_rect(0, 0, 0.3, 0.05), _rect(0.2, 0.05, 0.3, 0.1)])
+    row = _content('ROW', inst_list=[dict(cell='LEAF', loc=(0, 0), num_cols=3, sp_cols=0.1),
+                                     dict(cell='CAP', loc=(0, 0.2))],
+                   rect_list=[_rect(0.3, 0, 0.4, 0.25)])
+    top = _content('TOP', inst_list=[dict(cell='ROW', loc=(0, 0)), dict(cell='ROW', loc=(0, 1), orient='MX'),
+                                     dict(cell='LEAF', loc=(2, 2), num_rows=10, num_cols=10, sp_rows=0.5,
+                                          sp_cols=0.5)])
+    content_list = [leaf, cap, row, top]
+    num_in, flat_in = _count_shapes(content_list)
+    new_list = merge_content_list(content_list)
+    num_out, flat_out = _count_shapes(new_list)
+    assert num_out <= num_in
+    assert flat_out <= flat_in
+    # LEAF is also used by TOP, so it keeps its shapes; CAP only abuts inside ROW and is moved there.
+    rect_list, poly_list = _get_boxes(new_list[0])
+    assert rect_list == [] and len(poly_list) == 1
+    assert _get_boxes(new_list[1]) == ([], [])
+    assert _get_boxes(new_list[3]) == ([], [])
+
+
+def test_merge_content_list_check(monkeypatch):
+    top = _content('TOP', rect_list=[_rect(0, 0, 0.1, 0.1)])
+    monkeypatch.setattr(merge_module, 'merge_rects', lambda boxes: ([(0, 0, 50, 100)], []))
+    with pytest.raises(ValueError):
+        merge_content_list([top])
+    assert _get_boxes(merge_content_list([top], check=False)[0]) == ([(0, 0, 50, 100)], [])
+
+
+def _read_xy_sizes(fname):
+    with open(fname, 'rb') as f:
+        data = f.read()
+    idx = 0
+    ans = []
+    while idx < len(data):
+        size, rec_type = struct.unpack('>HH', data[idx:idx + 4])
+        if rec_type == 0x1003:
+            ans.append((size - 4) // 8)
+        idx += size
+    return ans
+
+
+def test_gds_merge_layers(tmp_path):
+    lay_map = GDSLayerMap({lay: (idx + 1, 0) for idx, lay in enumerate(sorted(get_tech_layers()))})
+    sub = _content('SUB', rect_list=[_rect(0, 0, 0.1, 0.1)])
+    top = _content('TOP', inst_list=[dict(cell='SUB', loc=(0, 0), num_cols=4, sp_cols=0.1)])
+    fname = str(tmp_path / 'out.gds')
+    with GDSWriter(fname, 'lib', lay_map, merge_layers=[_LAY]) as writer:
+        writer.write_content_list([sub, top])
+        assert writer.num_shapes == 1
+    # the array elements abut, but SUB already holds a single rectangle, so it is kept in SUB.
+    assert _read_xy_sizes(fname) == [5, 3]
+
+
+def test_gds_large_polygon(tmp_path):
+    lay_map = GDSLayerMap({lay: (idx + 1, 0) for idx, lay in enumerate(sorted(get_tech_layers()))})
+    # a rectilinear staircase of more than 10000 vertices.
+    num = 5000
+    points = [(0, 0)]
+    for idx in range(num):
+        points.append((idx * 10 + 20, idx * 10))
+        points.append((idx * 10 + 20, idx * 10 + 10))
+    points.append((num * 10 + 10, num * 10 + 10))
+    points.append((num * 10 + 10, num * 10 + 20))
+    points.append((0, num * 10 + 20))
+    fname = str(tmp_path / 'out.gds')
+    with GDSWriter(fname, 'lib', lay_map) as writer:
+        writer.begin_cell('TOP')
+        writer.add_polygon(_LAY, points)
+        writer.end_cell()
+        with pytest.raises(ValueError):
+            writer.begin_cell('BAD')
+            writer.add_polygon(_LAY, [(idx, idx * idx) for idx in range(10000)])
+    assert all(size <= 8191 for size in _read_xy_sizes(fname))
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import os
+from collections import Counter
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from templates_cds_ff_mpt.dse import (MasterCache, MasterReuseStats, get_worker_suffix, iter_cartesian_points,
+                                      iter_lhs_points)
+from templates_cds_ff_mpt.sweep import get_sweep_points
+
+_specs = dict(params=dict(lch=18e-9, seg_dict=dict(load=8, tail=8)),
+              swp_params={'seg_dict.load': [2, 4, 6], 'lch': [18e-9, 20e-9], 'seg_dict.tail': [4, 8, 12, 16, 20]})
+
+
+def test_master_cache_reuse_counting():
+    cache = MasterCache(2)
+    lookup = {}
+    for key, dt, top_level in (('a', 1.0, False), ('b', 2.0, True), ('c', 4.0, True)):
+        lookup[key] = key
+        cache.add(key, dt, top_level=top_level)
+    assert cache.stats.num_new == 3
+    assert cache.stats.gen_time == 6.0
+
+    cache.reuse('a')
+    cache.reuse('a')
+    assert cache.stats.num_reused == 2
+    assert cache.stats.saved_time == 2.0
+    assert cache.stats.reuse_rate == pytest.approx(0.4)
+
+    # 'a' was used most recently, so the oldest master 'b' is evicted.
+    cache.evict(lookup)
+    assert sorted(lookup.keys()) == ['a', 'c']
+    assert len(cache) == 2
+    assert cache.stats.num_evicted == 1
+
+    # reuse of a master the cache does not track is counted without saved time.
+    cache.reuse('x')
+    assert cache.stats.num_reused == 3
+    assert cache.stats.saved_time == 2.0
+
+
+def test_master_cache_keeps_children():
+    cache = MasterCache(2)
+    lookup = {}
+    # parent 'a' instantiates 'b', which is generated first.
+    for key, children in (('b', ()), ('a', ('b', )), ('c', ())):
+        lookup[key] = key
+        cache.add(key, 1.0, top_level=not children, children=children)
+    cache.reuse('a')
+    # 'b' is the oldest master, but 'a' still uses it, so 'c' is evicted instead.
+    cache.evict(lookup)
+    assert sorted(lookup.keys()) == ['a', 'b']
+
+    # once 'a' is evicted, 'b' is no longer referenced and can go as well.
+    for key in ('d', 'e'):
+        lookup[key] = key
+        cache.add(key, 1.0)
+    cache.evict(lookup)
+    assert sorted(lookup.keys()) == ['d', 'e']
+    assert cache.stats.num_evicted == 3
+
+
+def test_reuse_stats_arithmetic():
+    total = MasterReuseStats(1, 2, 1.0, 3.0, 0)
+    start = total.copy()
+    total += MasterReuseStats(3, 4, 2.0, 1.0, 5)
+    diff = total - start
+    assert (diff.num_new, diff.num_reused, diff.gen_time, diff.saved_time, diff.num_evicted) == (3, 4, 2.0, 1.0, 5)
+    assert start.num_new == 1
+    assert MasterReuseStats().reuse_rate == 0.0
+
+
+def test_cartesian_matches_sweep():
+    specs = dict(params=dict(a=0, b=0, c=5), swp_params=dict(a=[1, 2], b=[3, 4, 5]))
+    point_list = list(iter_cartesian_points(specs))
+    assert [(dict(swp), params) for swp, params in point_list] == get_sweep_points(specs)
+
+
+def test_dotted_names():
+    swp_values, params = next(iter_cartesian_points(_specs))
+    assert list(swp_values.keys()) == ['seg_dict.load', 'lch', 'seg_dict.tail']
+    assert params == dict(lch=18e-9, seg_dict=dict(load=2, tail=4))
+    assert _specs['params']['seg_dict'] == dict(load=8, tail=8)
+
+
+@pytest.mark.parametrize('num_points', [1, 7, 30, 31])
+def test_lhs_coverage(num_points):
+    point_list = list(iter_lhs_points(_specs, num_points, seed=3))
+    assert len(point_list) == num_points
+    for name, val_list in _specs['swp_params'].items():
+        counts = Counter(swp[name] for swp, _ in point_list)
+        assert set(counts.keys()) <= set(val_list)
+        if num_points >= len(val_list):
+            assert len(counts) == len(val_list)
+        num_list = [counts[val] for val in val_list]
+        assert max(num_list) - min(num_list) <= 1
+    assert list(iter_lhs_points(_specs, num_points, seed=3)) == point_list
+
+
+def test_lhs_no_points():
+    assert list(iter_lhs_points(_specs, 0)) == []
+    assert list(iter_lhs_points(_specs, -1)) == []
+
+
+def test_worker_suffix():
+    assert get_worker_suffix() == '_w%d' % os.getpid()
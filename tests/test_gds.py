@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import struct
+import warnings
+
+import pytest
+
+from templates_cds_ff_mpt.gds import GDSLayerMap, GDSWriter, get_tech_layers
+
+
+def _read_records(fname):
+    with open(fname, 'rb') as f:
+        data = f.read()
+    rec_list = []
+    idx = 0
+    while idx < len(data):
+        size, rec_type = struct.unpack('>HH', data[idx:idx + 4])
+        rec_list.append((rec_type, data[idx + 4:idx + size]))
+        idx += size
+    return rec_list
+
+
+def _get_lay_map():
+    lay_list = sorted(get_tech_layers())
+    return GDSLayerMap({lay: (idx + 1, 0) for idx, lay in enumerate(lay_list)})
+
+
+def _content(cell_name, inst_list=None, rect_list=None, path_list=None, blockage_list=None, polygon_list=None):
+    return (cell_name, inst_list or [], rect_list or [], [], [], path_list or [], blockage_list or [], [],
+            polygon_list or [])
+
+
+def test_write_shapes(tmp_path):
+    fname = str(tmp_path / 'out.gds')
+    rect = dict(layer=('M1', 'drawing'), bbox=[[0, 0], [0.1, 0.2]], arr_nx=2, arr_spx=0.5)
+    path = dict(layer=('M2', 'drawing'), width=0.05, points=[(0, 0), (1, 0), (1, 1)], end_style='extend')
+    poly = dict(layer=('M1', 'drawing'), points=[(0, 0), (0.3, 0), (0.3, 0.1), (0, 0.1)])
+    sub = _content('SUB', rect_list=[rect], path_list=[path], polygon_list=[poly])
+    top = _content('TOP', inst_list=[dict(cell='SUB', loc=(1.0, 2.0))])
+    with GDSWriter(fname, 'lib', _get_lay_map()) as writer:
+        writer.write_content_list([sub, top])
+        assert writer.num_shapes == 4
+        assert not writer.undefined_cells
+
+    rec_list = _read_records(fname)
+    types = [rec_type for rec_type, _ in rec_list]
+    assert types.count(0x0800) == 3
+    assert types.count(0x0900) == 1
+    width = [struct.unpack('>i', data)[0] for rec_type, data in rec_list if rec_type == 0x0F03]
+    assert width == [50]
+    path_type = [struct.unpack('>h', data)[0] for rec_type, data in rec_list if rec_type == 0x2102]
+    assert path_type == [2]
+    sref_xy = [struct.unpack('>2i', data) for rec_type, data in rec_list if rec_type == 0x1003 and len(data) == 8]
+    assert sref_xy == [(1000, 2000)]
+
+
+def test_short_content(tmp_path):
+    fname = str(tmp_path / 'out.gds')
+    rect = dict(layer=('M1', 'drawing'), bbox=[[0, 0], [0.1, 0.2]])
+    with GDSWriter(fname, 'lib', _get_lay_map()) as writer:
+        writer.write_content(('CELL', [], [rect], [], []))
+        assert writer.num_shapes == 1
+
+
+def test_blockage_raises(tmp_path):
+    fname = str(tmp_path / 'out.gds')
+    blockage = dict(layer='M1', btype='routing', points=[(0, 0), (1, 0), (1, 1)])
+    with GDSWriter(fname, 'lib', _get_lay_map()) as writer:
+        with pytest.raises(ValueError):
+            writer.write_content(_content('CELL', blockage_list=[blockage]))
+
+
+def test_undefined_cell_warns(tmp_path):
+    fname = str(tmp_path / 'out.gds')
+    writer = GDSWriter(fname, 'lib', _get_lay_map())
+    writer.write_content(_content('TOP', inst_list=[dict(cell='MISSING', loc=(0, 0))]))
+    assert writer.undefined_cells == {'MISSING'}
+    with warnings.catch_warnings(record=True) as warn_list:
+        warnings.simplefilter('always')
+        writer.close()
+    assert len(warn_list) == 1
+    assert 'MISSING' in str(warn_list[0].message)
+
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import copy
+
+import pytest
+
+from templates_cds_ff_mpt import config
+from templates_cds_ff_mpt.layers import MOSLayerTable, get_prim_flavors
+
+
+def test_prim_flavors(tmp_path):
+    flavors = get_prim_flavors()
+    assert {'standard', 'svt', 'lvt', 'hvt', '18'} <= flavors
+
+    for cell_name in ('nmos4_a', 'pmos4_b', 'res_standard'):
+        (tmp_path / cell_name).mkdir()
+    assert get_prim_flavors(str(tmp_path)) == {'a', 'b'}
+    assert get_prim_flavors(str(tmp_path / 'missing')) is None
+
+
+def test_layer_info_matches_config():
+    table = MOSLayerTable(config, get_prim_flavors())
+    mos_config = config['mos']
+    for mos_type, thres_table in mos_config['thres_layers'].items():
+        imp_table = mos_config['imp_layers'][mos_type]
+        assert table.get_implant_layers(mos_type) == tuple(imp_table.keys())
+        for threshold, lay_table in thres_table.items():
+            expected = [(lay, purp, enc[0], enc[1]) for (lay, purp), enc in imp_table.items()]
+            expected += [(lay, purp, enc[0], enc[1]) for (lay, purp), enc in lay_table.items()]
+            assert list(table.get_layer_info(mos_type, threshold)) == expected
+            assert table.get_threshold_layers(mos_type, threshold) == tuple(lay_table.keys())
+    assert table.missing_flavors == ['18']
+
+
+def test_invalid_keys():
+    table = MOSLayerTable(config)
+    assert table.missing_flavors == []
+    with pytest.raises(ValueError):
+        table.get_layer_info('nch', '18')
+    with pytest.raises(ValueError):
+        table.get_threshold_layers('nmos', 'svt')
+    with pytest.raises(ValueError):
+        table.get_implant_layers('nmos')
+
+
+def test_config_errors():
+    with pytest.raises(ValueError):
+        MOSLayerTable(config, prim_flavors={'svt'})
+
+    bad_config = copy.deepcopy(config)
+    bad_config['mos']['thres_layers']['nmos'] = bad_config['mos']['thres_layers']['nch']
+    with pytest.raises(ValueError):
+        MOSLayerTable(bad_config)
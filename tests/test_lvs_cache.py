@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+import struct
+
+import pytest
+
+from templates_cds_ff_mpt.gds import GDSLayerMap, GDSWriter
+from templates_cds_ff_mpt.verification.lvs_cache import (
+    LVSCellInfo, LVSResultCache, IncrementalLVS, hash_layout_file, hash_netlist_file,
+)
+
+
+def _write_gds(fname, monkeypatch, date, width=0.1):
+    stamp = struct.pack('>6h', *date)
+    monkeypatch.setattr(GDSWriter, '_timestamp', staticmethod(lambda: stamp))
+    rect = dict(layer=('M1', 'drawing'), bbox=[[0, 0], [width, 0.2]])
+    with GDSWriter(fname, 'lib', GDSLayerMap({('M1', 'drawing'): (1, 0)})) as writer:
+        writer.write_content_list([('TOP', [], [rect], [], [], [], [], [], [])])
+
+
+def _write_cdl(fname, date, device='MM0 d g s b nch_lvt l=20n w=100n'):
+    with open(fname, 'w') as f:
+        f.write('* Generated for: PVS\n* Generated on: %s\n*\n.SUBCKT TOP d g s b\n*.PININFO d:B g:I\n'
+                '%s\n.ENDS\n' % (date, device))
+
+
+def _make_cell(tmp_path, monkeypatch, date, width=0.1):
+    layout_file = str(tmp_path / 'TOP.gds')
+    netlist_file = str(tmp_path / 'TOP.cdl')
+    _write_gds(layout_file, monkeypatch, date, width=width)
+    _write_cdl(netlist_file, '%d/%d/%d' % date[:3])
+    return LVSCellInfo('TOP', layout_file, netlist_file)
+
+
+def test_hash_layout_ignores_dates(tmp_path, monkeypatch):
+    fname = str(tmp_path / 'a.gds')
+    _write_gds(fname, monkeypatch, (2020, 1, 1, 0, 0, 0))
+    h0 = hash_layout_file(fname)
+    _write_gds(fname, monkeypatch, (2021, 6, 7, 8, 9, 10))
+    assert hash_layout_file(fname) == h0
+    _write_gds(fname, monkeypatch, (2021, 6, 7, 8, 9, 10), width=0.2)
+    assert hash_layout_file(fname) != h0
+
+
+def test_hash_layout_non_gds(tmp_path):
+    fname = tmp_path / 'a.oas'
+    fname.write_bytes(b'%SEMI-OASIS\r\n')
+    h0 = hash_layout_file(str(fname))
+    fname.write_bytes(b'%SEMI-OASIS\r\n\x01')
+    assert hash_layout_file(str(fname)) != h0
+
+
+def test_hash_netlist_ignores_comments(tmp_path):
+    fname = str(tmp_path / 'a.cdl')
+    _write_cdl(fname, 'Mon Jan  1 00:00:00 2020')
+    h0 = hash_netlist_file(fname)
+    _write_cdl(fname, 'Tue Feb  2 11:11:11 2021')
+    assert hash_netlist_file(fname) == h0
+    _write_cdl(fname, 'Tue Feb  2 11:11:11 2021', device='MM0 d g s b nch_lvt l=20n w=200n')
+    assert hash_netlist_file(fname) != h0
+
+    with open(fname, 'w') as f:
+        f.write('.SUBCKT TOP d g s b\n*.PININFO d:O g:I\nMM0 d g s b nch_lvt l=20n w=100n\n.ENDS\n')
+    assert hash_netlist_file(fname) != h0
+
+
+def test_reexport_is_cache_hit(tmp_path, monkeypatch):
+    rule_file = tmp_path / 'lvs.rul'
+    rule_file.write_text('rules\n')
+    report = tmp_path / 'lvs.rpt'
+    report.write_text('CORRECT\n')
+    calls = []
+
+    def run_lvs(cell_name):
+        calls.append(cell_name)
+        return True, str(report)
+
+    work_dir = tmp_path / 'work'
+    work_dir.mkdir()
+    lvs = IncrementalLVS(run_lvs, LVSResultCache(str(tmp_path / 'cache'), [str(rule_file)]))
+    info = _make_cell(work_dir, monkeypatch, (2020, 1, 1, 0, 0, 0))
+    assert lvs.run({'TOP': info})['TOP'][2] is False
+
+    info = _make_cell(work_dir, monkeypatch, (2020, 1, 2, 3, 4, 5))
+    clean, _, hit = lvs.run({'TOP': info})['TOP']
+    assert clean and hit
+    assert calls == ['TOP']
+
+    info = _make_cell(work_dir, monkeypatch, (2020, 1, 2, 3, 4, 5), width=0.3)
+    assert lvs.run({'TOP': info})['TOP'][2] is False
+    assert calls == ['TOP', 'TOP']
+
+
+def test_bottom_up_order_cycle():
+    table = {'A': LVSCellInfo('A', '', '', children=['B']), 'B': LVSCellInfo('B', '', '', children=['A'])}
+    with pytest.raises(ValueError):
+        IncrementalLVS.get_bottom_up_order(table)
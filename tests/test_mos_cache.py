@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from templates_cds_ff_mpt.mos.cache import MOSInfoCache, freeze_params
+
+_tech_config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tech_config.yaml')
+
+
+class _Counter(object):
+    def __init__(self):
+        self.num_calls = 0
+
+    def __call__(self):
+        self.num_calls += 1
+        return [self.num_calls]
+
+
+def test_freeze_params():
+    val = dict(b=[1, dict(c={2, 3})], a=(4, 5))
+    frozen = freeze_params(val)
+    assert frozen == freeze_params(dict(a=[4, 5], b=(1, dict(c={3, 2}))))
+    hash(frozen)
+    with pytest.raises(TypeError):
+        freeze_params(dict(a=bytearray(b'x')))
+
+
+def test_generations():
+    cache = MOSInfoCache(max_generations=2)
+    fun = _Counter()
+    row_a = ('mos', 18, 4, 'nch', 'standard', 4, ())
+    row_b = ('mos', 18, 4, 'pch', 'standard', 4, ())
+    conn = ('ds', 18, 4)
+
+    cache.start_generation()
+    cache.get(row_a, fun)
+    cache.get(conn, fun)
+    diff = cache.end_generation()
+    assert diff.added == {row_a, conn}
+    assert (diff.num_hits, diff.num_misses) == (0, 2)
+
+    # only row_b changes in the second generation.
+    cache.start_generation()
+    assert cache.get(row_a, fun) == [1]
+    cache.get(row_b, fun)
+    diff = cache.end_generation()
+    assert diff.added == {row_b}
+    assert diff.removed == {conn}
+    assert diff.reused == {row_a}
+    assert diff.get_changed_rows() == {(18, 4, 'pch', 'standard', 4)}
+    assert (diff.num_hits, diff.num_misses) == (1, 1)
+    assert fun.num_calls == 3
+
+    # conn has been unused for two generations and is dropped.
+    cache.start_generation()
+    cache.end_generation()
+    assert len(cache) == 2
+    cache.start_generation()
+    cache.end_generation()
+    assert len(cache) == 0
+
+
+def test_max_entries():
+    cache = MOSInfoCache(max_entries=2)
+    fun = _Counter()
+    cache.get(('a', ), fun)
+    cache.get(('b', ), fun)
+    cache.get(('a', ), fun)
+    cache.get(('c', ), fun)
+    assert len(cache) == 2
+    # 'b' was the least recently used entry.
+    cache.get(('a', ), fun)
+    assert fun.num_calls == 3
+    cache.get(('b', ), fun)
+    assert fun.num_calls == 4
+
+
+def test_cached_info_matches_uncached():
+    pytest.importorskip('bag')
+    pytest.importorskip('abs_templates_ec')
+    from bag.io import read_yaml
+    from templates_cds_ff_mpt.tech import TechInfoCDSFFMPT
+
+    tech_info = TechInfoCDSFFMPT(read_yaml(_tech_config_path), tech_config_path=_tech_config_path)
+    mos_tech = tech_info.mos_tech
+    cache = mos_tech.info_cache
+    args_list = [(18, 4, 'nch', 'standard', 4), (18, 6, 'pch', 'lvt', 8)]
+    try:
+        cache.enabled = False
+        expected = [(mos_tech.get_mos_info(*args), mos_tech.get_sub_info(*args)) for args in args_list]
+
+        cache.enabled = True
+        cache.clear()
+        for _ in range(2):
+            cache.start_generation()
+            for args, (mos_info, sub_info) in zip(args_list, expected):
+                cur_mos = mos_tech.get_mos_info(*args)
+                assert cur_mos == mos_info
+                assert mos_tech.get_sub_info(*args) == sub_info
+                # callers get their own copy, so modifying it does not change the cache.
+                cur_mos['layout_info']['test_entry'] = 1
+            cache.end_generation()
+        assert len(cache) == 2 * len(args_list)
+    finally:
+        cache.enabled = False
+        cache.clear()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import gc
+import tracemalloc
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from templates_cds_ff_mpt.mos.shapes import MOSShapeBuffer
+
+
+def _expand_rects(rect_arrays):
+    ans = set()
+    for layer, xl, yb, xr, yt, nx, spx in rect_arrays:
+        for idx in range(nx):
+            ans.add((layer, xl + idx * spx, yb, xr + idx * spx, yt))
+    return ans
+
+
+def test_uniform_rects_become_array():
+    shapes = MOSShapeBuffer(0.001)
+    xl_list = [0, 100, 200, 300, 400]
+    shapes.add_rects('M1', xl_list, 10, [xl + 20 for xl in xl_list], 50)
+    shapes.add_rect('M1', 200, 10, 220, 50)
+    assert shapes.num_added == 6
+    assert list(shapes.iter_rect_arrays()) == [('M1', 0, 10, 20, 50, 5, 100)]
+
+
+def test_irregular_rects_keep_all_shapes():
+    shapes = MOSShapeBuffer(0.001)
+    expected = set()
+    for xl in (0, 100, 200, 350, 500, 650, 700):
+        shapes.add_rect('M2', xl, 0, xl + 30, 40)
+        expected.add(('M2', xl, 0, xl + 30, 40))
+    # same X positions with a different height are a separate group.
+    shapes.add_rect('M2', 100, 0, 130, 60)
+    expected.add(('M2', 100, 0, 130, 60))
+
+    rect_arrays = list(shapes.iter_rect_arrays())
+    assert _expand_rects(rect_arrays) == expected
+    assert len(rect_arrays) < len(expected)
+
+
+def test_via_array():
+    enc = [2, 2, 3, 3]
+    shapes = MOSShapeBuffer(0.001)
+    shapes.add_vias('V1', [0, 50, 100], 20, enc, enc, 10, 10)
+    shapes.add_vias('V1', 50, 20, enc, enc, 10, 10)
+    assert shapes.num_added == 4
+    assert list(shapes.iter_via_arrays()) == [('V1', 0, 20, 1, 0, enc, enc, 10, 10, 3, 50)]
+
+
+def test_many_shapes_memory():
+    # 100k rectangles in 100 rows of 1000 fingers.
+    num_rows, num_cols = 100, 1000
+    xl = np.arange(num_cols) * 90
+    gc.collect()
+    num_objects = len(gc.get_objects())
+    tracemalloc.start()
+    try:
+        shapes = MOSShapeBuffer(0.001)
+        for row in range(num_rows):
+            shapes.add_rects('M1', xl, row * 200, xl + 20, row * 200 + 100)
+        mem_used = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert shapes.num_added == num_rows * num_cols
+    # 32 bytes per record, with at most a factor of 2 of spare capacity.  A BBox object per
+    # shape would take several hundred bytes, and each one would be tracked by the GC.
+    assert mem_used < 64 * num_rows * num_cols + 100000
+    assert len(gc.get_objects()) - num_objects < 1000
+    assert len(list(shapes.iter_rect_arrays())) == num_rows
+
+
+def test_flush():
+    pytest.importorskip('bag')
+
+    class _RecordTemplate(object):
+        def __init__(self):
+            self.rects = []
+            self.vias = []
+
+        def add_rect(self, layer, bbox, nx=1, spx=0, unit_mode=False):
+            self.rects.append((layer, (bbox.left_unit, bbox.bottom_unit, bbox.right_unit, bbox.top_unit), nx,
+                               spx))
+
+        def add_via_primitive(self, via_id, loc, num_rows=1, sp_rows=0, enc1=None, enc2=None, cut_width=0,
+                              cut_height=0, nx=1, spx=0, unit_mode=False):
+            self.vias.append((via_id, tuple(loc), nx, spx))
+
+    enc = [2, 2, 3, 3]
+    shapes = MOSShapeBuffer(0.001)
+    shapes.add_rects('M1', [0, 100, 200], 10, [20, 120, 220], 50)
+    shapes.add_vias('V1', [0, 50], 20, enc, enc, 10, 10)
+    template = _RecordTemplate()
+    assert shapes.flush(template) == 2
+    assert template.rects == [('M1', (0, 10, 20, 50), 3, 100)]
+    assert template.vias == [('V1', (0, 20), 2, 50)]
+    assert shapes.num_added == 0
+    assert list(shapes.iter_rect_arrays()) == []
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+
+import pytest
+
+from templates_cds_ff_mpt.verification.pipeline import (
+    StubChecker, VerificationPipeline, get_job_cpus, get_rcx_params,
+)
+
+
+class _Recorder(object):
+    """Wraps a checker, recording start/end events and the peak number of CPUs in use."""
+
+    def __init__(self, stage, fun, events, lock, usage):
+        self._stage = stage
+        self._fun = fun
+        self._events = events
+        self._lock = lock
+        self._usage = usage
+
+    def __call__(self, cell_name, num_cpus):
+        with self._lock:
+            self._events.append((self._stage, 'start', cell_name))
+            self._usage['cur'] += num_cpus
+            self._usage['peak'] = max(self._usage['peak'], self._usage['cur'])
+        try:
+            return self._fun(cell_name, num_cpus)
+        finally:
+            with self._lock:
+                self._usage['cur'] -= num_cpus
+                self._events.append((self._stage, 'end', cell_name))
+
+
+def _make_pipeline(tmp_path, num_cpus, lvs_fail=()):
+    events = []
+    lock = threading.Lock()
+    usage = dict(cur=0, peak=0)
+
+    def gen_fun(cell_name):
+        time.sleep(0.01)
+        with lock:
+            events.append(('gen', 'end', cell_name))
+        return cell_name.lower()
+
+    lvs = StubChecker(lambda name: 0.02, fail_cells=lvs_fail, log_dir=str(tmp_path))
+    rcx = StubChecker(lambda name: 0.02, log_dir=str(tmp_path))
+    pipe = VerificationPipeline(gen_fun, _Recorder('lvs', lvs, events, lock, usage),
+                                rcx_fun=_Recorder('rcx', rcx, events, lock, usage), num_cpus=num_cpus,
+                                max_lvs_cpus=2, max_rcx_cpus=4)
+    return pipe, events, usage
+
+
+def _get_cells(events, stage, kind):
+    return [name for ev_stage, ev_kind, name in events if ev_stage == stage and ev_kind == kind]
+
+
+def test_get_job_cpus():
+    assert get_job_cpus(0, 3, 4) == 0
+    assert get_job_cpus(8, 1, 4) == 4
+    assert get_job_cpus(8, 4, 4) == 2
+    assert get_job_cpus(3, 10, 4) == 1
+    assert get_job_cpus(5, 0, 8) == 5
+
+
+def test_get_rcx_params():
+    params = dict(distributed_processing=dict(multi_cpu=1, hosts=['a']))
+    ans = get_rcx_params(params, 6)
+    assert ans['distributed_processing'] == dict(multi_cpu=6, hosts=['a'])
+    assert params['distributed_processing']['multi_cpu'] == 1
+
+
+def test_stub_checker(tmp_path):
+    checker = StubChecker(lambda name: 0.0, fail_cells=['BAD'], log_dir=str(tmp_path))
+    ok, log_file = checker('GOOD', 3)
+    assert ok
+    with open(log_file) as f:
+        assert f.read() == 'cpus: 3\n'
+    assert checker('BAD', 1)[0] is False
+
+
+def test_ordering(tmp_path):
+    cells = ['C%d' % idx for idx in range(6)]
+    pipe, events, _ = _make_pipeline(tmp_path, 4)
+    results = pipe.run(cells)
+
+    assert _get_cells(events, 'gen', 'end') == cells
+    assert [res.cell_name for res in results] == cells
+    assert all(res.success for res in results)
+    assert [res.gen_value for res in results] == [name.lower() for name in cells]
+    for name in cells:
+        gen_end = events.index(('gen', 'end', name))
+        lvs_start = events.index(('lvs', 'start', name))
+        lvs_end = events.index(('lvs', 'end', name))
+        rcx_start = events.index(('rcx', 'start', name))
+        assert gen_end < lvs_start < lvs_end < rcx_start
+    # checking overlaps generation: the first LVS starts before the last cell is generated.
+    assert events.index(('lvs', 'start', cells[0])) < events.index(('gen', 'end', cells[-1]))
+    assert pipe.stats['gen']['busy_time'] >= 0.0
+    assert 0.0 < pipe.stats['lvs']['utilization'] <= 1.0
+
+
+@pytest.mark.parametrize('num_cpus', [1, 3])
+def test_cpu_limit(tmp_path, num_cpus):
+    cells = ['C%d' % idx for idx in range(8)]
+    pipe, _, usage = _make_pipeline(tmp_path, num_cpus)
+    results = pipe.run(cells)
+    assert all(res.success for res in results)
+    assert 1 <= usage['peak'] <= num_cpus
+    assert usage['cur'] == 0
+
+
+def test_lvs_failure_skips_rcx(tmp_path):
+    cells = ['A', 'B', 'C']
+    pipe, events, _ = _make_pipeline(tmp_path, 2, lvs_fail=['B'])
+    results = pipe.run(cells)
+    assert [res.success for res in results] == [True, False, True]
+    assert results[1].lvs[0] is False and results[1].rcx is None
+    assert not results[1].error
+    assert sorted(_get_cells(events, 'rcx', 'start')) == ['A', 'C']
+
+
+def test_error_propagation(tmp_path):
+    def gen_fun(cell_name):
+        if cell_name == 'B':
+            raise ValueError('bad params')
+        return cell_name
+
+    def lvs_fun(cell_name, num_cpus):
+        if cell_name == 'C':
+            raise RuntimeError('license')
+        return True, ''
+
+    pipe = VerificationPipeline(gen_fun, lvs_fun, num_cpus=2)
+    results = pipe.run(['A', 'B', 'C'])
+    assert [res.success for res in results] == [True, False, False]
+    assert results[1].error == 'gen: ValueError: bad params'
+    assert results[1].lvs is None
+    assert results[2].error == 'lvs: RuntimeError: license'
+    assert results[0].rcx is None
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from templates_cds_ff_mpt.verification.rcx_netlist import (
+    parse_value, iter_netlist, read_netlist, min_cap_filter, kind_filter, net_filter, get_net_caps,
+)
+
+_SPICE = b'''* DSPF header
+.SUBCKT INV in out VDD VSS
+MM0 out in VSS VSS nch_lvt l=20n
+* split transistor parameters
++ w=100n nfin=4
+XI0 in out VDD VSS buf
+R1 in in#1 12.5
+C1 out VSS 1.5f
+C2 out in c=0.2f $X=1 $Y=2
+C3 in VSS 1e-19
+.ENDS
+'''
+
+_SPECTRE = b'''simulator lang=spectre
+// extracted view
+subckt INV in out VDD VSS
+M0 (out in VSS VSS) nch_lvt l=20n w=100n
+M1 (out in VDD VDD) pch_svt_mac l=20n \\
+    w=200n
+I0 (in out) buf
+R0 (in in_1) resistor r=20
+C0 (out VSS) capacitor c=3f
+ends INV
+'''
+
+
+@pytest.mark.parametrize('token, val', [('1.5f', 1.5e-15), ('2meg', 2e6), ('3MEG', 3e6), ('10', 10.0),
+                                        ('.5u', 0.5e-6), ('1e-3k', 1.0), ('4ohm', 4.0), ('abc', None)])
+def test_parse_value(token, val):
+    if val is None:
+        assert parse_value(token) is None
+    else:
+        assert parse_value(token) == pytest.approx(val)
+
+
+def test_spice_elements():
+    elems = list(iter_netlist(_SPICE.splitlines(True)))
+    assert [(elem.kind, elem.name) for elem in elems] == [
+        ('M', 'MM0'), ('X', 'XI0'), ('R', 'R1'), ('C', 'C1'), ('C', 'C2'), ('C', 'C3')]
+    mos = elems[0]
+    assert mos.nodes == ('out', 'in', 'VSS', 'VSS')
+    assert mos.model == 'nch_lvt'
+    assert mos.params == dict(l='20n', w='100n', nfin='4')
+    assert mos.subckt == 'INV'
+    assert elems[2].value == pytest.approx(12.5)
+    assert elems[4].value == pytest.approx(0.2e-15)
+    assert all(elem.is_parasitic for elem in elems[2:])
+
+
+def test_spectre_elements():
+    elems = list(iter_netlist(_SPECTRE.splitlines(True)))
+    assert [(elem.kind, elem.name, elem.model) for elem in elems] == [
+        ('M', 'M0', 'nch_lvt'), ('M', 'M1', 'pch_svt_mac'), ('X', 'I0', 'buf'), ('R', 'R0', 'resistor'),
+        ('C', 'C0', 'capacitor')]
+    assert elems[1].params == dict(l='20n', w='200n')
+    assert elems[1].value is None
+    assert elems[3].value == pytest.approx(20.0)
+    assert elems[4].value == pytest.approx(3e-15)
+    assert elems[0].subckt == 'INV'
+
+
+@pytest.mark.parametrize('use_mmap', [True, False])
+def test_read_netlist_filters(tmp_path, use_mmap):
+    fname = tmp_path / 'a.dspf'
+    fname.write_bytes(_SPICE)
+    caps = list(read_netlist(str(fname), filters=[kind_filter('C'), min_cap_filter(1e-17)], use_mmap=use_mmap))
+    assert [elem.name for elem in caps] == ['C1', 'C2']
+    on_in = list(read_netlist(str(fname), filters=[net_filter(['in#1'])], use_mmap=use_mmap))
+    assert [elem.name for elem in on_in] == ['R1']
+
+
+def test_read_empty_netlist(tmp_path):
+    fname = tmp_path / 'empty.dspf'
+    fname.write_bytes(b'')
+    assert list(read_netlist(str(fname))) == []
+
+
+def test_get_net_caps():
+    table = get_net_caps(iter_netlist(_SPICE.splitlines(True)))
+    assert table['out'] == pytest.approx((1.5e-15, 0.2e-15))
+    assert table['in'] == pytest.approx((1e-19, 0.2e-15))
+    assert 'VSS' not in table
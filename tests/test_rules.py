@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from templates_cds_ff_mpt import config as tech_config
+from templates_cds_ff_mpt.rules import DRCRuleTables, LengthRule, WidthTable
+
+_LEN_CONFIG = dict(w_list=[50, 100, float('inf')], w_al_list=[[3000, 40], [5000, 30], [0, 20]],
+                   md_list=[80, 400], md_al_list=[[8000, 60], [4000, 50]])
+
+
+def _get_min_length_scalar(rule_config, w_unit):
+    """The scalar len_min rule of TechInfoConfig, used as reference."""
+    l_unit = 0
+    for w, (area, len_min) in zip(rule_config['w_list'], rule_config['w_al_list']):
+        if w_unit <= w:
+            l_unit = max(len_min, -(-area // w_unit))
+            break
+    for max_dim, (area, len_min) in zip(reversed(rule_config['md_list']), reversed(rule_config['md_al_list'])):
+        if max(w_unit, l_unit) > max_dim:
+            return l_unit
+        l_unit = max(l_unit, len_min, -(-area // w_unit))
+    return -(-l_unit // 2) * 2
+
+
+def _get_width_scalar(rule_config, w_unit):
+    for w, sp in zip(rule_config['w_list'], rule_config['sp_list']):
+        if w_unit <= w:
+            return sp
+    raise ValueError('width too large')
+
+
+def test_width_table():
+    table = WidthTable([10, 20, 30], [1, 2, 3])
+    assert table.max_width == 30
+    assert list(table.lookup([1, 10, 11, 20, 30])) == [1, 1, 2, 2, 3]
+    assert table.lookup(15) == 2
+    with pytest.raises(ValueError):
+        table.lookup([5, 31])
+    with pytest.raises(ValueError):
+        WidthTable([10, 10], [1, 2])
+    with pytest.raises(ValueError):
+        WidthTable([10, 20], [1])
+
+
+def test_length_rule_matches_scalar():
+    rule = LengthRule(_LEN_CONFIG)
+    widths = np.arange(1, 600)
+    expected = [_get_min_length_scalar(_LEN_CONFIG, int(w)) for w in widths]
+    assert list(rule.lookup(widths)) == expected
+
+
+def test_tech_tables_match_scalar():
+    tables = DRCRuleTables(tech_config)
+    widths = np.arange(1, 2000, 7)
+    for lay_type, rule_config in tech_config['len_min'].items():
+        expected = [_get_min_length_scalar(rule_config, int(w)) for w in widths]
+        assert list(tables.get_min_length_array(lay_type, widths)) == expected
+        assert tables.get_min_length(lay_type, 40) == _get_min_length_scalar(rule_config, 40)
+    for lay_type, rule_config in tech_config['sp_min'].items():
+        expected = [_get_width_scalar(rule_config, int(w)) for w in widths]
+        assert list(tables.get_min_space_array(lay_type, widths)) == expected
+        assert tables.get_min_space(lay_type, 50) == _get_width_scalar(rule_config, 50)
+        sc_config = tech_config['sp_sc_min'][lay_type]
+        assert tables.get_min_space(lay_type, 50, same_color=True) == _get_width_scalar(sc_config, 50)
+        le_config = tech_config['sp_le_min'][lay_type]
+        assert tables.get_min_line_end_space(lay_type, 50) == _get_width_scalar(le_config, 50)
+        assert list(tables.get_min_line_end_space_array(lay_type, widths[:3])) == \
+            [_get_width_scalar(le_config, int(w)) for w in widths[:3]]
+
+
+def test_scalar_lookup_memoized():
+    tables = DRCRuleTables(tech_config)
+    assert tables.get_min_space('4', 120) == 72
+    assert ('sp_min', '4', 120) in tables._memo
+    assert tables.get_max_width('4') == float('inf')
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from templates_cds_ff_mpt.sim.corners import CornerInfo, CornerSetup, ModelInfo
+from templates_cds_ff_mpt.sim.scheduler import SimJob, SimBackend
+from templates_cds_ff_mpt.sim.cache import SimResultCache, CachedSimBackend, get_sim_key, format_report
+
+
+def _get_corner(name, section, temp):
+    model = ModelInfo('models.scs', 'models.scs', section, 'All', 'Global', True)
+    return CornerInfo(name, True, dict(temperature=temp), [model])
+
+
+class _CountBackend(SimBackend):
+    def __init__(self, value):
+        self.num_runs = 0
+        self._value = value
+
+    def run(self, job):
+        self.num_runs += 1
+        return self._value
+
+
+def test_sim_key():
+    tt = _get_corner('tt', 'tt', '25')
+    key = get_sim_key('netlist', tt, dict(dc={}))
+    assert get_sim_key('netlist', _get_corner('tt_copy', 'tt', '25'), dict(dc={})) == key
+    assert get_sim_key('netlist2', tt, dict(dc={})) != key
+    assert get_sim_key('netlist', _get_corner('tt', 'tt', '85'), dict(dc={})) != key
+    assert get_sim_key('netlist', _get_corner('tt', 'ff', '25'), dict(dc={})) != key
+    assert get_sim_key('netlist', tt, dict(ac={})) != key
+
+    # the model include order changes the simulation, so it changes the key.
+    models = [ModelInfo('models.scs', 'models.scs', section, 'All', 'Global', True) for section in ('tt', 'mc')]
+    corner = CornerInfo('tt', True, dict(temperature='25'), models)
+    corner_rev = CornerInfo('tt', True, dict(temperature='25'), models[::-1])
+    assert get_sim_key('netlist', corner, dict(dc={})) != get_sim_key('netlist', corner_rev, dict(dc={}))
+
+
+def test_hits_and_persistence(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    cache = SimResultCache(cache_dir)
+    assert cache.get('k1', sweep='swp') is None
+    cache.put('k1', dict(gain=10.0))
+    assert cache.get('k1', sweep='swp') == dict(gain=10.0)
+    assert cache.get_report() == dict(swp=dict(hits=1, misses=1))
+    assert format_report(cache.get_report()) == ['swp: 1 hits, 1 misses (50.0% hit rate)']
+
+    cache2 = SimResultCache(cache_dir)
+    assert len(cache2) == 1
+    assert cache2.get('k1') == dict(gain=10.0)
+
+
+def test_eviction(tmp_path):
+    cache = SimResultCache(str(tmp_path), max_bytes=2500)
+    for idx in range(5):
+        cache.put('k%d' % idx, b'x' * 1000)
+    assert cache.total_bytes <= 2500
+    assert cache.get('k4') is not None
+    assert cache.get('k0') is None
+
+
+def test_put_error_removes_temp_file(tmp_path, monkeypatch):
+    cache = SimResultCache(str(tmp_path))
+
+    def fail_replace(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(os, 'replace', fail_replace)
+    with pytest.raises(OSError):
+        cache.put('k1', dict(gain=10.0))
+    assert os.listdir(str(tmp_path)) == []
+    assert len(cache) == 0
+
+
+def test_cached_none_result(tmp_path):
+    netlist = str(tmp_path / 'netlist.scs')
+    with open(netlist, 'w') as f:
+        f.write('M0 d g s b nch\n')
+    setup = CornerSetup([_get_corner('tt', 'tt', '25')])
+    backend = _CountBackend(None)
+    cache = SimResultCache(str(tmp_path / 'cache'))
+    cached_backend = CachedSimBackend(backend, cache, setup)
+    job = SimJob('tb', 'tt', params=dict(netlist=netlist, sweep='swp'))
+    assert cached_backend.run(job) is None
+    assert cached_backend.run(job) is None
+    assert backend.num_runs == 1
+    assert cache.get_report() == dict(swp=dict(hits=1, misses=1))
+    assert os.listdir(str(tmp_path / 'cache'))
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+import shutil
+
+from templates_cds_ff_mpt.sim.corners import get_corner_setup
+
+_sdb_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'corners_setup.sdb')
+
+
+def test_parse_corners():
+    setup = get_corner_setup(_sdb_file)
+    assert setup.get_corner_names()[:5] == ['tt', 'ff', 'ss', 'sf', 'fs']
+    assert '_default' not in setup.get_corner_names()
+    assert '_default' in setup.get_corner_names(enabled_only=False)
+
+    tt = setup['tt']
+    assert tt.temperature == 25.0
+    assert [section for _, section in tt.model_sections] == ['tt']
+    assert setup['ff_hot'].temperature == 65.0
+    assert setup.get_corners_by_section('ff') == ['ff', 'ff_hot']
+    assert setup.get_corners_by_section('unknown') == []
+
+    setup2 = pickle.loads(pickle.dumps(setup))
+    assert setup2['ff_hot'].model_sections == setup['ff_hot'].model_sections
+
+
+def test_reparse_on_change(tmp_path):
+    fname = str(tmp_path / 'corners.sdb')
+    shutil.copy(_sdb_file, fname)
+    setup = get_corner_setup(fname)
+    assert get_corner_setup(fname) is setup
+
+    with open(fname, 'r') as f:
+        content = f.read()
+    with open(fname, 'w') as f:
+        f.write(content.replace('<value>65</value>', '<value>125</value>'))
+    stat = os.stat(fname)
+    os.utime(fname, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    new_setup = get_corner_setup(fname)
+    assert new_setup is not setup
+    assert new_setup['ff_hot'].temperature == 125.0
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+
+from templates_cds_ff_mpt.sim.monitor import SimJobMonitor, get_stub_sim_command
+
+
+def _run_job(monitor, cmd, **kwargs):
+    async def _run():
+        job_id = monitor.submit(cmd, **kwargs)
+        return await monitor.wait(job_id)
+
+    return asyncio.run(_run())
+
+
+def test_result_file_does_not_end_job(tmp_path):
+    result_file = str(tmp_path / 'result.txt')
+    monitor = SimJobMonitor(update_timeout=0)
+    result = _run_job(monitor, get_stub_sim_command(0.5, result_file=result_file), result_file=result_file)
+    assert result.success
+    assert result.returncode == 0
+    assert result.runtime >= 0.5
+    with open(result_file, 'r') as f:
+        assert f.read() == 'part\nrest\n'
+
+
+def test_failed_process(tmp_path):
+    result_file = str(tmp_path / 'result.txt')
+    monitor = SimJobMonitor(update_timeout=0)
+    result = _run_job(monitor, get_stub_sim_command(0.1, result_file=result_file, returncode=3),
+                      result_file=result_file)
+    assert result.returncode == 3
+    assert not result.success
+
+    result = _run_job(monitor, get_stub_sim_command(0.1), result_file=result_file)
+    assert result.returncode == 0
+    assert not result.success
+
+
+def test_done_file_with_lingering_process(tmp_path):
+    result_file = str(tmp_path / 'result.txt')
+    done_file = str(tmp_path / 'done')
+    monitor = SimJobMonitor(update_timeout=0, linger_timeout=0.5, file_poll=0.01)
+    cmd = get_stub_sim_command(0.2, result_file=result_file, done_file=done_file, linger=30)
+    t0 = time.time()
+    result = _run_job(monitor, cmd, result_file=result_file, done_file=done_file)
+    assert time.time() - t0 < 10
+    assert result.completed
+    assert result.returncode is None
+    assert result.success
+    with open(result_file, 'r') as f:
+        assert f.read() == 'part\nrest\n'
+
+
+def test_done_marker_does_not_kill_exiting_process(tmp_path):
+    done_file = str(tmp_path / 'done')
+    monitor = SimJobMonitor(update_timeout=0, linger_timeout=10, file_poll=0.01)
+    result = _run_job(monitor, get_stub_sim_command(0.1, done_file=done_file, linger=0.3, returncode=0),
+                      done_file=done_file)
+    assert result.completed
+    assert result.returncode == 0
+    assert result.success
+
+    result = _run_job(monitor, get_stub_sim_command(0.1, done_file=done_file, linger=0.3, returncode=2),
+                      done_file=done_file)
+    assert result.returncode == 2
+    assert not result.success
+
+
+def test_done_log_line():
+    monitor = SimJobMonitor(update_timeout=0, linger_timeout=0.2)
+    cmd = get_stub_sim_command(0.1, log_line='spectre completes with 0 errors', linger=30)
+    t0 = time.time()
+    result = _run_job(monitor, cmd, done_pattern=r'completes with 0 errors')
+    assert time.time() - t0 < 10
+    assert result.completed
+    assert result.success
+
+
+def test_cancel_and_concurrency():
+    monitor = SimJobMonitor(max_workers=2, update_timeout=0, cancel_timeout=1)
+
+    async def _run():
+        id_list = [monitor.submit(get_stub_sim_command(0.3)) for _ in range(4)]
+        slow_id = monitor.submit(get_stub_sim_command(30))
+        await asyncio.sleep(0.1)
+        assert monitor.cancel(slow_id)
+        results = [result async for result in monitor.as_completed(id_list + [slow_id])]
+        return results
+
+    t0 = time.time()
+    results = asyncio.run(_run())
+    elapsed = time.time() - t0
+    by_id = {result.job_id: result for result in results}
+    assert all(by_id[job_id].success for job_id in range(4))
+    assert by_id[4].cancelled
+    assert not by_id[4].success
+    # 4 jobs of 0.3 seconds on 2 workers take at least 2 rounds.
+    assert 0.6 <= elapsed < 10
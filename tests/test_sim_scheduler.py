@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+
+import pytest
+
+from templates_cds_ff_mpt.sim.corners import get_corner_setup
+from templates_cds_ff_mpt.sim.scheduler import (
+    SimJob, SimBackend, FakeSimBackend, RuntimeModel, CornerScheduler, expand_jobs
+)
+
+_sdb_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'corners_setup.sdb')
+
+
+class _RecordBackend(SimBackend):
+    """Records the job start order, and fails the first num_fail attempts of each job."""
+
+    def __init__(self, num_fail=0):
+        self.order = []
+        self._num_fail = num_fail
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def run(self, job):
+        with self._lock:
+            self.order.append(job.key)
+            num = self._attempts[job.key] = self._attempts.get(job.key, 0) + 1
+        if num <= self._num_fail:
+            raise RuntimeError('attempt %d failed' % num)
+        return job.key
+
+
+def test_runtime_model():
+    model = RuntimeModel(default=2.0, alpha=0.5)
+    job = SimJob('tb', 'tt')
+    assert model.estimate(job) == 2.0
+    model.update(job, 4.0)
+    model.update(job, 2.0)
+    assert model.estimate(job) == 3.0
+    # other corners of the same testbench use the testbench average
+    assert model.estimate(SimJob('tb', 'ff')) == 3.0
+
+
+def test_longest_first():
+    model = RuntimeModel()
+    for corner, runtime in (('tt', 1.0), ('ff', 5.0), ('ss', 3.0)):
+        model.update(SimJob('tb', corner), runtime)
+    backend = _RecordBackend()
+    sched = CornerScheduler(backend, max_workers=1, runtime_model=model)
+    result_list = sched.run(expand_jobs(['tb'], ['tt', 'ff', 'ss']))
+    assert backend.order == [('tb', 'ff'), ('tb', 'ss'), ('tb', 'tt')]
+    # results are in job order
+    assert [result.value for result in result_list] == [('tb', 'tt'), ('tb', 'ff'), ('tb', 'ss')]
+    assert all(result.success for result in result_list)
+
+
+def test_retries():
+    sched = CornerScheduler(_RecordBackend(num_fail=1), max_workers=2, max_retries=1)
+    result_list = sched.run(expand_jobs(['a', 'b'], ['tt']))
+    assert all(result.success and result.attempts == 2 for result in result_list)
+    assert sched.stats['num_retries'] == 2
+
+    sched = CornerScheduler(_RecordBackend(num_fail=2), max_workers=2, max_retries=1)
+    result_list = sched.run(expand_jobs(['a'], ['tt']))
+    assert not result_list[0].success
+    assert result_list[0].value is None
+    assert 'attempt 2 failed' in result_list[0].error
+
+
+def test_fake_backend_saturates_pool():
+    backend = FakeSimBackend(lambda job: 0.05, seed=0)
+    sched = CornerScheduler(backend, max_workers=4)
+    result_list = sched.run(expand_jobs(['a', 'b'], ['tt', 'ff', 'ss', 'sf']))
+    assert all(result.success for result in result_list)
+    assert sched.stats['wall_time'] < 0.05 * 8
+    assert sched.stats['utilization'] > 0.5
+
+
+def test_expand_corner_jobs():
+    setup = get_corner_setup(_sdb_file)
+    sched = CornerScheduler(_RecordBackend(), max_workers=1)
+    job_list = sched.expand_corner_jobs(['tb'], setup)
+    assert [job.corner for job in job_list] == setup.get_corner_names()
+    with pytest.raises(ValueError):
+        sched.expand_corner_jobs(['tb'], setup, corners=['nonexistent'])
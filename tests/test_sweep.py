@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+from templates_cds_ff_mpt.sweep import get_sweep_points, rename_sub_cells, get_sub_cell_suffix
+
+
+def _get_content(top_name, sub_w):
+    sub_rect = dict(layer=('M1', 'drawing'), bbox=[[0, 0], [sub_w, 10]])
+    sub = ('SUB', [], [sub_rect], [], [], [], [], [], [])
+    inst_list = [dict(lib='lib', cell='SUB', view='layout', name='X0', loc=[0, 0]),
+                 dict(lib='BAG_prim', cell='nmos4_standard', view='layout', name='X1', loc=[0, 0])]
+    top = (top_name, inst_list, [], [], [], [], [], [], [])
+    return [sub, top]
+
+
+def test_sweep_points_order():
+    specs = dict(params=dict(a=0, b=0, c=5), swp_params=dict(a=[1, 2], b=[3, 4]))
+    point_list = get_sweep_points(specs)
+    assert [swp for swp, _ in point_list] == [dict(a=1, b=3), dict(a=1, b=4), dict(a=2, b=3), dict(a=2, b=4)]
+    assert all(params['c'] == 5 for _, params in point_list)
+    assert specs['params'] == dict(a=0, b=0, c=5)
+
+
+def test_distinct_sub_cells():
+    content_list = []
+    for name, sub_w in (('AMP_0', 10), ('AMP_1', 20)):
+        orig = _get_content(name, sub_w)
+        content_list.extend(rename_sub_cells(orig, name, get_sub_cell_suffix(name)))
+        # the original content is not modified
+        assert orig[1][1][0]['cell'] == 'SUB'
+
+    cells = {content[0]: content for content in content_list}
+    assert len(cells) == len(content_list) == 4
+    assert cells['SUB_AMP_0'][2][0]['bbox'][1][0] == 10
+    assert cells['SUB_AMP_1'][2][0]['bbox'][1][0] == 20
+    for name in ('AMP_0', 'AMP_1'):
+        inst_list = cells[name][1]
+        assert inst_list[0]['cell'] == 'SUB_' + name
+        # cells outside the content list keep their names
+        assert inst_list[1]['cell'] == 'nmos4_standard'
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+
+import pytest
+
+pytest.importorskip('bag')
+pytest.importorskip('abs_templates_ec')
+
+from bag.io import read_yaml
+
+from templates_cds_ff_mpt import tech as tech_module
+from templates_cds_ff_mpt.tech import TechInfoCDSFFMPT, get_tech_key, get_tech_info, get_tech_config_path
+
+_tech_config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tech_config.yaml')
+
+
+def test_tech_key_uses_effective_params():
+    params = dict(layout=dict(a=1, b=[1, 2]), other=dict(x=1.5, y='z'))
+    reordered = dict(other=dict(y='z', x=1.5), layout=dict(b=[1, 2], a=1))
+    key = get_tech_key(params)
+    assert get_tech_key(reordered) == key
+
+    with_classes = dict(layout=dict(a=1, b=[1, 2], mos_tech_class=object(), laygo_tech_class=None,
+                                    res_tech_class=None),
+                        other=dict(x=1.5, y='z'))
+    assert get_tech_key(with_classes) == key
+
+    changed = dict(layout=dict(a=2, b=[1, 2]), other=dict(x=1.5, y='z'))
+    assert get_tech_key(changed) != key
+
+
+def test_pickle_by_reference():
+    process_params = read_yaml(_tech_config_path)
+    key = get_tech_key(process_params)
+    tech_info = TechInfoCDSFFMPT(process_params, tech_config_path=_tech_config_path)
+    assert tech_info.tech_key == key
+    assert get_tech_info(_tech_config_path) is tech_info
+    assert pickle.loads(pickle.dumps(tech_info)) is tech_info
+    assert pickle.loads(pickle.dumps(tech_info.mos_tech)) is tech_info.mos_tech
+
+
+def test_explicit_bag_config(tmp_path, monkeypatch):
+    bag_config = tmp_path / 'bag_config.yaml'
+    bag_config.write_text('tech_config_path: %s\n' % _tech_config_path)
+    monkeypatch.delenv('BAG_CONFIG_PATH', raising=False)
+    assert get_tech_config_path() is None
+    assert get_tech_config_path(str(bag_config)) == _tech_config_path
+    assert get_tech_info(bag_config_path=str(bag_config)).tech_key == get_tech_key(read_yaml(_tech_config_path))
+
+
+def test_cache_bounded(monkeypatch):
+    monkeypatch.setattr(tech_module, '_max_tech_info', 2)
+    monkeypatch.setattr(tech_module, '_tech_info_cache', type(tech_module._tech_info_cache)())
+    info_list = []
+    for idx in range(3):
+        process_params = read_yaml(_tech_config_path)
+        process_params['test_index'] = idx
+        info_list.append(TechInfoCDSFFMPT(process_params, tech_config_path=_tech_config_path))
+    assert list(tech_module._tech_info_cache.values()) == info_list[1:]